@@ -1,11 +1,31 @@
 """
 ASGI config for Bibliandria project.
+
+Bajo ASGI las peticiones se resuelven con ``bibliandria.urls_asgi``, que
+sirve las vistas de lectura asíncronas de ``biblioteca.vistas_async``.
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bibliandria.settings')
+# Sin conexiones persistentes a la base de datos (ver DATABASES en settings)
+os.environ.setdefault('BIBLIANDRIA_ASGI', '1')
+
+URLCONF_ASGI = 'bibliandria.urls_asgi'
+
+
+class BibliandriaASGIHandler(ASGIHandler):
+    """``ASGIHandler`` que resuelve cada petición con ``URLCONF_ASGI``"""
+
+    def create_request(self, scope, body_file):
+        request, respuesta_error = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = URLCONF_ASGI
+        return request, respuesta_error
+
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+application = BibliandriaASGIHandler()
@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'biblioteca.perfilado.PerfiladoMiddleware',
+    'biblioteca.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +51,23 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Perfilado de peticiones (biblioteca/perfilado.py): cabecera Server-Timing
+# y registro en biblioteca.perfilado de las que superan el umbral. Va el
+# primero para medir también el resto de middleware.
+PERFILADO = os.environ.get('BIBLIANDRIA_PERFILADO') == '1'
+PERFILADO_UMBRAL_MS = int(os.environ.get('BIBLIANDRIA_PERFILADO_UMBRAL_MS', 500))
+PERFILADO_CONSULTAS_LENTAS = 5
+
+# Métricas para Prometheus en /metrics (biblioteca/metricas.py). Cada worker
+# suma sus contadores a METRICAS_DB cada METRICAS_INTERVALO segundos; con
+# None (por defecto) están desactivadas y solo las activa la configuración de
+# producción. /metrics solo responde a las IP de METRICAS_IPS. En producción
+# METRICAS_LOG_MEDIA es el log de nginx con los bytes de media servidos.
+METRICAS_DB = None
+METRICAS_INTERVALO = 10
+METRICAS_IPS = ['127.0.0.1', '::1']
+METRICAS_LOG_MEDIA = None
+
 ROOT_URLCONF = 'bibliandria.urls'
 
 TEMPLATES = [
@@ -73,13 +92,64 @@ WSGI_APPLICATION = 'bibliandria.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Conexiones persistentes con comprobación de salud al reutilizarlas. Bajo
+# ASGI cada petición corre en un hilo nuevo y la conexión no se reutilizaría
+# (quedaría abierta hasta que se recogiera el hilo): bibliandria/asgi.py
+# define BIBLIANDRIA_ASGI y se cierra al terminar cada petición.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 0 if os.environ.get('BIBLIANDRIA_ASGI') else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Segundos que sqlite3 espera por un bloqueo antes de fallar
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMA aplicados a cada conexión nueva de SQLite (biblioteca/sqlite.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 20000,          # ms, igual que OPTIONS['timeout']
+    'cache_size': -32000,           # KiB (negativo): 32 MB de caché de páginas
+    'mmap_size': 268435456,         # 256 MB leídos con mmap
+    'temp_store': 'memory',         # tablas temporales (ORDER BY, DISTINCT) en memoria
+}
+
+# Escrituras diferidas (biblioteca/escrituras.py): las vistas dejan aquí las
+# escrituras de poca prioridad y procesar_escrituras las aplica en lote. Si
+# el escritor no está en marcha se escriben directamente. Con None (por
+# defecto) se escribe siempre directamente; la activa la configuración de
+# producción.
+COLA_ESCRITURAS = None
+
+
+# Cachés
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# 'fragmentos' guarda el HTML de las tarjetas de libro (biblioteca/fragmentos.py).
+# En desarrollo vive en memoria; en producción conviene FileBasedCache o
+# DatabaseCache para que la compartan todos los procesos. Subir VERSION
+# descarta todas las tarjetas cacheadas (p. ej. al cambiar su plantilla).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragmentos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'TIMEOUT': 60 * 60 * 24 * 7,
+        'VERSION': 1,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -102,6 +172,10 @@ AUTH_PASSWORD_VALIDATORS = [
 # Custom User Model
 AUTH_USER_MODEL = 'biblioteca.Usuario'
 
+# Correo (recordatorios de préstamos). En desarrollo se muestra por consola.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Bibliandria <no-responder@bibliandria.local>'
+
 # Login/Logout URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
@@ -127,6 +201,20 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Hojas de estilo de cada versión de la interfaz, en orden. En producción
+# (biblioteca.estaticos.AlmacenEstaticos) se sirven unidas en un solo fichero.
+_CSS_COMUN = [
+    'vendor/bootstrap/css/bootstrap.min.css',
+    'vendor/bootstrap-icons/bootstrap-icons.min.css',
+    'css/styles.css',
+    'css/skins.css',
+]
+PAQUETES_CSS = {
+    'normal': _CSS_COMUN,
+    'no-usable': _CSS_COMUN + ['css/no_usable.css'],
+    'no-accesible': _CSS_COMUN + ['css/no_accesible.css'],
+}
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
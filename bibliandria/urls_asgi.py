@@ -0,0 +1,11 @@
+"""
+URLconf de la aplicación ASGI: igual que ``urls.py`` pero con las vistas
+asíncronas de ``biblioteca.urls_async`` por delante.
+"""
+from django.urls import path, include
+
+from . import urls
+
+urlpatterns = [
+    path('', include('biblioteca.urls_async')),
+] + urls.urlpatterns
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto
+from .models import Usuario, Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto, Tarea
 
 
 @admin.register(Usuario)
@@ -75,3 +75,11 @@ class SolicitudContactoAdmin(admin.ModelAdmin):
     list_filter = ['estado', 'fecha_creacion']
     search_fields = ['visitante__username', 'bibliotecario__username', 'mensaje']
     date_hierarchy = 'fecha_creacion'
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    """Administración de la cola de tareas en segundo plano"""
+    list_display = ['id', 'tipo', 'estado', 'intentos', 'trabajador', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['tipo', 'estado']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_fin']
@@ -0,0 +1,499 @@
+"""
+API JSON de Bibliandria.
+
+Mismas reglas de acceso que las vistas HTML: cada usuario gestiona sus
+libros, préstamos, deseos y solicitudes, y solo puede leer los libros de
+bibliotecas públicas. La autenticación es la de la sesión de Django (las
+escrituras necesitan la cabecera ``X-CSRFToken``).
+
+Los listados se paginan por cursor con ``KeysetPaginator`` (``?despues=``,
+``?antes=``, ``?limite=``) y todas las respuestas aceptan
+``?fields=titulo,autor``. Cada ``Serializador`` sabe qué columnas y qué
+relaciones necesita cada campo, así que los campos pedidos deciden
+también el ``select_related`` y el ``only`` de la consulta.
+"""
+import json
+from functools import wraps
+
+from django.forms import modelform_factory
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .busqueda import aplicar_busqueda
+from .escrituras import guardar_solicitud
+from .forms import BusquedaLibroForm, LibroForm, ListaDeseosForm, PrestamoForm, ResenaForm, SolicitudContactoForm
+from .models import Libro, ListaDeseos, Prestamo, Resena, SolicitudContacto, Usuario
+from .paginacion import CursorInvalido, KeysetPaginator, sin_cursor
+
+
+LIMITE_POR_DEFECTO = 24
+LIMITE_MAXIMO = 100
+
+
+class ErrorAPI(Exception):
+    """Error que se devuelve al cliente como ``{"error": ...}``"""
+
+    def __init__(self, estado, mensaje, detalles=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+        self.detalles = detalles
+
+
+def _json(datos, estado=200):
+    return JsonResponse(datos, status=estado, json_dumps_params={'ensure_ascii': False})
+
+
+def _error(estado, mensaje, detalles=None):
+    datos = {'error': mensaje}
+    if detalles:
+        datos['detalles'] = detalles
+    return _json(datos, estado)
+
+
+def api(*metodos):
+    """Autenticación, métodos permitidos y errores en JSON"""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return _error(401, 'Autenticación requerida.')
+            if request.method not in metodos:
+                respuesta = _error(405, f'Método {request.method} no permitido.')
+                respuesta['Allow'] = ', '.join(metodos)
+                return respuesta
+            try:
+                return vista(request, *args, **kwargs)
+            except ErrorAPI as exc:
+                return _error(exc.estado, exc.mensaje, exc.detalles)
+            except Http404:
+                return _error(404, 'No encontrado.')
+        return envoltura
+    return decorador
+
+
+# ====== SERIALIZACIÓN ======
+
+class Campo:
+    """
+    Un campo de la respuesta. ``columnas`` son los campos del modelo que
+    necesita (con ``__`` para los de una relación) y ``valor`` cómo
+    obtenerlo; por defecto, el atributo del mismo nombre.
+    """
+
+    def __init__(self, *columnas, valor=None):
+        self.columnas = columnas
+        self.valor = valor
+
+
+class Serializador:
+    """Convierte instancias de un modelo en diccionarios con los campos pedidos"""
+
+    def __init__(self, **campos):
+        self.campos = campos
+
+    def elegir(self, request):
+        """Campos pedidos con ``?fields=`` (todos si no se indica)"""
+        pedidos = [nombre.strip() for nombre in request.GET.get('fields', '').split(',') if nombre.strip()]
+        if not pedidos:
+            return list(self.campos)
+        desconocidos = [nombre for nombre in pedidos if nombre not in self.campos]
+        if desconocidos:
+            raise ErrorAPI(400, 'Campos desconocidos: ' + ', '.join(desconocidos), {
+                'disponibles': list(self.campos),
+            })
+        return pedidos
+
+    def preparar(self, queryset, nombres, extra=()):
+        """Limita la consulta a las columnas y relaciones de ``nombres``"""
+        columnas = set(extra)
+        for nombre in nombres:
+            columnas.update(self.campos[nombre].columnas)
+        relaciones = {columna.rsplit('__', 1)[0] for columna in columnas if '__' in columna}
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        return queryset.only(*columnas)
+
+    def serializar(self, obj, nombres):
+        datos = {}
+        for nombre in nombres:
+            campo = self.campos[nombre]
+            datos[nombre] = campo.valor(obj) if campo.valor else getattr(obj, nombre)
+        return datos
+
+
+def _resena(libro):
+    resena = getattr(libro, 'resena', None)
+    if resena is None:
+        return None
+    return {
+        'puntuacion': resena.puntuacion,
+        'comentario': resena.comentario,
+        'fecha_lectura': resena.fecha_lectura,
+    }
+
+
+LIBRO = Serializador(
+    id=Campo('id'),
+    titulo=Campo('titulo'),
+    autor=Campo('autor'),
+    isbn=Campo('isbn'),
+    editorial=Campo('editorial'),
+    año_publicacion=Campo('año_publicacion'),
+    descripcion=Campo('descripcion'),
+    numero_paginas=Campo('numero_paginas'),
+    estado=Campo('estado'),
+    formato=Campo('formato'),
+    portada=Campo('portada', valor=lambda libro: libro.portada.url if libro.portada else None),
+    fecha_agregado=Campo('fecha_agregado'),
+    fecha_modificado=Campo('fecha_modificado'),
+    propietario=Campo('propietario__username', valor=lambda libro: libro.propietario.username),
+    resena=Campo('resena__puntuacion', 'resena__comentario', 'resena__fecha_lectura', valor=_resena),
+)
+
+RESENA = Serializador(
+    libro=Campo('libro_id', valor=lambda resena: resena.libro_id),
+    puntuacion=Campo('puntuacion'),
+    comentario=Campo('comentario'),
+    fecha_lectura=Campo('fecha_lectura'),
+    fecha_modificacion=Campo('fecha_modificacion'),
+)
+
+PRESTAMO = Serializador(
+    id=Campo('id'),
+    libro=Campo('libro_id', valor=lambda prestamo: prestamo.libro_id),
+    libro_titulo=Campo('libro__titulo', valor=lambda prestamo: prestamo.libro.titulo),
+    nombre_prestatario=Campo('nombre_prestatario'),
+    fecha_prestamo=Campo('fecha_prestamo'),
+    fecha_devolucion_esperada=Campo('fecha_devolucion_esperada'),
+    fecha_devolucion_real=Campo('fecha_devolucion_real'),
+    notas=Campo('notas'),
+    dias_retraso=Campo('fecha_devolucion_real', 'fecha_devolucion_esperada'),
+)
+
+DESEO = Serializador(
+    id=Campo('id'),
+    titulo=Campo('titulo'),
+    autor=Campo('autor'),
+    isbn=Campo('isbn'),
+    notas=Campo('notas'),
+    prioridad=Campo('prioridad'),
+    fecha_agregado=Campo('fecha_agregado'),
+)
+
+SOLICITUD = Serializador(
+    id=Campo('id'),
+    visitante=Campo('visitante__username', valor=lambda solicitud: solicitud.visitante.username),
+    bibliotecario=Campo('bibliotecario__username', valor=lambda solicitud: solicitud.bibliotecario.username),
+    libro=Campo('libro_id', valor=lambda solicitud: solicitud.libro_id),
+    libro_titulo=Campo('libro__titulo', valor=lambda solicitud: solicitud.libro and solicitud.libro.titulo),
+    mensaje=Campo('mensaje'),
+    estado=Campo('estado'),
+    fecha_creacion=Campo('fecha_creacion'),
+)
+
+BIBLIOTECA = Serializador(
+    username=Campo('username'),
+    nombre=Campo('first_name', 'last_name', valor=lambda usuario: usuario.get_full_name()),
+    num_libros=Campo('num_libros'),
+)
+
+
+# ====== PETICIONES Y RESPUESTAS ======
+
+def _datos(request):
+    """Cuerpo JSON de la petición como diccionario"""
+    try:
+        datos = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ErrorAPI(400, 'El cuerpo de la petición no es JSON válido.')
+    if not isinstance(datos, dict):
+        raise ErrorAPI(400, 'El cuerpo de la petición debe ser un objeto JSON.')
+    return datos
+
+
+def _validar(formulario, datos, instancia=None):
+    """
+    Valida ``datos`` con un ModelForm. Los campos que no vienen en
+    ``datos`` conservan su valor actual (o el valor por defecto al crear).
+    """
+    # La portada solo se sube desde la web (multipart)
+    campos = [campo for campo in formulario._meta.fields if campo != 'portada']
+    desconocidos = sorted(set(datos) - set(campos))
+    if desconocidos:
+        raise ErrorAPI(400, 'Campos no editables: ' + ', '.join(desconocidos), {'editables': list(campos)})
+    if instancia is not None:
+        actuales = {campo: getattr(instancia, campo) for campo in campos}
+    else:
+        # Los campos omitidos toman el valor por defecto del modelo, como en la web
+        modelo = formulario._meta.model
+        actuales = {
+            campo: modelo._meta.get_field(campo).get_default()
+            for campo in campos if modelo._meta.get_field(campo).has_default()
+        }
+    datos = {**actuales, **datos}
+    datos = {campo: '' if valor is None else valor for campo, valor in datos.items()}
+    form = formulario(data=datos, instance=instancia)
+    if not form.is_valid():
+        raise ErrorAPI(400, 'Datos no válidos.', {
+            campo: [error['message'] for error in errores]
+            for campo, errores in form.errors.get_json_data().items()
+        })
+    return form
+
+
+def _objeto(request, serializador, obj, estado=200):
+    return _json(serializador.serializar(obj, serializador.elegir(request)), estado)
+
+
+def _listado(request, serializador, queryset, orden, extra=()):
+    """
+    Página de un listado con los enlaces a la siguiente y la anterior.
+    ``queryset`` no debe venir de un manager de relación (``usuario.libros``):
+    Django leería la clave ajena diferida por ``only()`` fila a fila.
+    """
+    nombres = serializador.elegir(request)
+    try:
+        limite = min(max(int(request.GET.get('limite', LIMITE_POR_DEFECTO)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        raise ErrorAPI(400, 'El parámetro limite debe ser un número.')
+
+    columnas_orden = [campo.lstrip('-') for campo in orden if campo.lstrip('-') not in ('rango', 'similitud')]
+    queryset = serializador.preparar(queryset, nombres, extra=tuple(extra) + tuple(columnas_orden))
+    paginador = KeysetPaginator(queryset, orden=orden, por_pagina=limite)
+    try:
+        pagina = paginador.pagina(despues=request.GET.get('despues'), antes=request.GET.get('antes'))
+    except CursorInvalido:
+        raise ErrorAPI(400, 'Cursor no válido.')
+
+    def enlace(parametro, cursor):
+        if cursor is None:
+            return None
+        parametros = sin_cursor(request.GET)
+        parametros[parametro] = cursor
+        return f'{request.path}?{parametros.urlencode()}'
+
+    return _json({
+        'resultados': [serializador.serializar(obj, nombres) for obj in pagina],
+        'siguiente': enlace('despues', pagina.cursor_siguiente),
+        'anterior': enlace('antes', pagina.cursor_anterior),
+    })
+
+
+def _sin_contenido():
+    return HttpResponse(status=204)
+
+
+# ====== BIBLIOTECAS ======
+
+@api('GET')
+def bibliotecas(request):
+    """Bibliotecas públicas"""
+    usuarios = Usuario.objects.filter(biblioteca_publica=True, rol='bibliotecario').exclude(id=request.user.id)
+    return _listado(request, BIBLIOTECA, usuarios, ('id',))
+
+
+@api('GET')
+def biblioteca_libros(request, username):
+    """Libros de una biblioteca pública o propia, con ``?query=`` y ``?modo=`` como en la web"""
+    if username == request.user.username:
+        usuario = request.user
+    else:
+        usuario = get_object_or_404(Usuario.objects.only('pk', 'biblioteca_publica'), username=username)
+        if not usuario.biblioteca_publica:
+            raise ErrorAPI(403, 'Esta biblioteca es privada.')
+    return _libros(request, Libro.objects.filter(propietario=usuario))
+
+
+def _libros(request, libros):
+    libros, orden, _ = aplicar_busqueda(libros, BusquedaLibroForm(request.GET))
+    return _listado(request, LIBRO, libros, orden)
+
+
+# ====== LIBROS ======
+
+@api('GET', 'POST')
+def libros(request):
+    """Libros del usuario; POST añade uno"""
+    if request.method == 'POST':
+        libro = _validar(LibroForm, _datos(request)).save(commit=False)
+        libro.propietario = request.user
+        libro.save()
+        return _objeto(request, LIBRO, libro, estado=201)
+    return _libros(request, Libro.objects.filter(propietario=request.user))
+
+
+def _libro_visible(request, pk, nombres=()):
+    consulta = LIBRO.preparar(
+        Libro.objects.all(), nombres, extra=('propietario_id', 'propietario__biblioteca_publica')
+    )
+    libro = get_object_or_404(consulta, pk=pk)
+    if libro.propietario_id != request.user.pk and not libro.propietario.biblioteca_publica:
+        raise ErrorAPI(403, 'No tienes permiso para ver este libro.')
+    return libro
+
+
+def _libro_propio(request, pk):
+    libro = get_object_or_404(Libro, pk=pk)
+    if libro.propietario_id != request.user.pk:
+        raise ErrorAPI(403, 'No tienes permiso para modificar este libro.')
+    return libro
+
+
+@api('GET', 'PATCH', 'DELETE')
+def libro(request, pk):
+    if request.method == 'GET':
+        nombres = LIBRO.elegir(request)
+        return _json(LIBRO.serializar(_libro_visible(request, pk, nombres), nombres))
+
+    libro = _libro_propio(request, pk)
+    if request.method == 'DELETE':
+        libro.delete()
+        return _sin_contenido()
+    libro = _validar(LibroForm, _datos(request), instancia=libro).save()
+    return _objeto(request, LIBRO, libro)
+
+
+# ====== RESEÑAS ======
+
+@api('GET', 'PUT', 'DELETE')
+def resena(request, libro_pk):
+    """La reseña de un libro; PUT la crea o la sustituye"""
+    if request.method == 'GET':
+        libro = _libro_visible(request, libro_pk)
+        resena = get_object_or_404(RESENA.preparar(Resena.objects.all(), RESENA.elegir(request)), libro=libro)
+        return _objeto(request, RESENA, resena)
+
+    libro = _libro_propio(request, libro_pk)
+    actual = Resena.objects.filter(libro=libro).first()
+    if request.method == 'DELETE':
+        if actual is None:
+            raise Http404
+        actual.delete()
+        return _sin_contenido()
+
+    resena = _validar(ResenaForm, _datos(request), instancia=actual).save(commit=False)
+    resena.libro = libro
+    resena.save()
+    return _objeto(request, RESENA, resena, estado=200 if actual else 201)
+
+
+# ====== PRÉSTAMOS ======
+
+# En la API un préstamo se devuelve con PATCH {"fecha_devolucion_real": ...}
+PrestamoAPIForm = modelform_factory(
+    Prestamo, form=PrestamoForm, fields=PrestamoForm._meta.fields + ['fecha_devolucion_real'],
+)
+
+
+@api('GET', 'POST')
+def libro_prestamos(request, libro_pk):
+    """Historial de préstamos de un libro propio; POST registra uno"""
+    libro = _libro_propio(request, libro_pk)
+    if request.method == 'POST':
+        prestamo = _validar(PrestamoForm, _datos(request)).save(commit=False)
+        prestamo.libro = libro
+        prestamo.save()
+        return _objeto(request, PRESTAMO, prestamo, estado=201)
+    return _listado(request, PRESTAMO, Prestamo.objects.filter(libro=libro), ('-fecha_prestamo', '-id'))
+
+
+@api('GET')
+def prestamos(request):
+    """Préstamos de todos los libros del usuario; ``?activos=1`` solo los abiertos"""
+    prestamos = Prestamo.objects.filter(libro__propietario=request.user)
+    if request.GET.get('activos') in ('1', 'true'):
+        prestamos = prestamos.filter(fecha_devolucion_real__isnull=True)
+    return _listado(request, PRESTAMO, prestamos, ('-fecha_prestamo', '-id'))
+
+
+@api('GET', 'PATCH', 'DELETE')
+def prestamo(request, pk):
+    prestamo = get_object_or_404(Prestamo.objects.select_related('libro'), pk=pk)
+    if prestamo.libro.propietario_id != request.user.pk:
+        raise ErrorAPI(403, 'No tienes permiso.')
+
+    if request.method == 'DELETE':
+        prestamo.delete()
+        return _sin_contenido()
+    if request.method == 'PATCH':
+        prestamo = _validar(PrestamoAPIForm, _datos(request), instancia=prestamo).save()
+    return _objeto(request, PRESTAMO, prestamo)
+
+
+# ====== LISTA DE DESEOS ======
+
+@api('GET', 'POST')
+def deseos(request):
+    if request.method == 'POST':
+        deseo = _validar(ListaDeseosForm, _datos(request)).save(commit=False)
+        deseo.usuario = request.user
+        deseo.save()
+        return _objeto(request, DESEO, deseo, estado=201)
+    return _listado(
+        request, DESEO, ListaDeseos.objects.filter(usuario=request.user), ('-prioridad', '-fecha_agregado', '-id')
+    )
+
+
+@api('GET', 'PATCH', 'DELETE')
+def deseo(request, pk):
+    deseo = get_object_or_404(ListaDeseos, pk=pk, usuario=request.user)
+    if request.method == 'DELETE':
+        deseo.delete()
+        return _sin_contenido()
+    if request.method == 'PATCH':
+        deseo = _validar(ListaDeseosForm, _datos(request), instancia=deseo).save()
+    return _objeto(request, DESEO, deseo)
+
+
+# ====== SOLICITUDES DE CONTACTO ======
+
+@api('GET', 'POST')
+def solicitudes(request):
+    """
+    Solicitudes recibidas (o enviadas con ``?tipo=enviadas``). POST con
+    ``{"libro": id, "mensaje": ...}`` escribe al propietario de un libro;
+    se guarda como en la web (``escrituras.guardar_solicitud``) y, si queda
+    en la cola de escrituras, se responde 202 sin ``id``.
+    """
+    if request.method == 'POST':
+        datos = _datos(request)
+        try:
+            libro_pk = int(datos.pop('libro'))
+        except (KeyError, TypeError, ValueError):
+            raise ErrorAPI(400, 'Indica el libro de la solicitud.', {'libro': ['Este campo es obligatorio.']})
+        libro = _libro_visible(request, libro_pk)
+        if libro.propietario_id == request.user.pk:
+            raise ErrorAPI(400, 'No puedes enviarte una solicitud a ti mismo.')
+        solicitud = _validar(SolicitudContactoForm, datos).save(commit=False)
+        solicitud.visitante = request.user
+        solicitud.bibliotecario_id = libro.propietario_id
+        solicitud.libro = libro
+        guardada = guardar_solicitud(solicitud)
+        return _objeto(request, SOLICITUD, solicitud, estado=201 if guardada else 202)
+
+    if request.GET.get('tipo') == 'enviadas':
+        solicitudes = SolicitudContacto.objects.filter(visitante=request.user)
+    else:
+        solicitudes = SolicitudContacto.objects.filter(bibliotecario=request.user)
+    return _listado(request, SOLICITUD, solicitudes, ('-fecha_creacion', '-id'))
+
+
+class EstadoSolicitudForm(SolicitudContactoForm):
+    class Meta(SolicitudContactoForm.Meta):
+        fields = ['estado']
+
+
+@api('GET', 'PATCH')
+def solicitud(request, pk):
+    """Una solicitud enviada o recibida; el bibliotecario cambia su ``estado`` con PATCH"""
+    solicitud = get_object_or_404(
+        SolicitudContacto.objects.select_related('visitante', 'bibliotecario', 'libro'), pk=pk
+    )
+    if request.user.pk not in (solicitud.visitante_id, solicitud.bibliotecario_id):
+        raise Http404
+    if request.method == 'PATCH':
+        if solicitud.bibliotecario_id != request.user.pk:
+            raise ErrorAPI(403, 'Solo el bibliotecario puede cambiar el estado.')
+        solicitud = _validar(EstadoSolicitudForm, _datos(request), instancia=solicitud).save()
+    return _objeto(request, SOLICITUD, solicitud)
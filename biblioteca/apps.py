@@ -1,7 +1,22 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class BibliotecaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'biblioteca'
     verbose_name = 'Biblioteca Personal'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receptores)
+        from .busqueda import asegurar_indice_fts
+        from .escrituras import ultimo_acceso_diferido
+        from .sqlite import aplicar_pragmas
+        connection_created.connect(aplicar_pragmas)
+        # El último acceso se escribe en diferido (escrituras.py)
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(ultimo_acceso_diferido, dispatch_uid='ultimo_acceso_diferido')
+        # Las migraciones que reconstruyen biblioteca_libro borran los triggers
+        post_migrate.connect(asegurar_indice_fts, sender=self)
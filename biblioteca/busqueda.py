@@ -0,0 +1,266 @@
+"""
+Búsqueda de libros a través del índice de texto completo (SQLite FTS5).
+
+La tabla virtual ``biblioteca_libro_fts`` se crea en la migración 0002 y
+se mantiene sincronizada con ``biblioteca_libro`` mediante triggers, por
+lo que cualquier ruta de guardado o borrado (formularios, admin,
+``bulk_create``, borrados en cascada) actualiza el índice.
+
+SQLite reconstruye la tabla al aplicar muchos cambios de esquema y con
+ello pierde los triggers, así que ``asegurar_indice_fts`` los vuelve a
+crear después de cada ``migrate``.
+"""
+import re
+import unicodedata
+
+from django.db import connection, connections
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Greatest
+
+from .paginacion import CursorInvalido, KeysetPaginator
+
+
+TABLA_FTS = 'biblioteca_libro_fts'
+CAMPOS_FTS = 'titulo, autor, editorial, descripcion, isbn'
+
+SQL_TABLA_FTS = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        {CAMPOS_FTS},
+        content='biblioteca_libro',
+        content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+"""
+
+SQL_TRIGGERS_FTS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON biblioteca_libro BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, {CAMPOS_FTS})
+        VALUES (new.id, new.titulo, new.autor, new.editorial, new.descripcion, new.isbn);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON biblioteca_libro BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {CAMPOS_FTS})
+        VALUES ('delete', old.id, old.titulo, old.autor, old.editorial, old.descripcion, old.isbn);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF {CAMPOS_FTS} ON biblioteca_libro BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {CAMPOS_FTS})
+        VALUES ('delete', old.id, old.titulo, old.autor, old.editorial, old.descripcion, old.isbn);
+        INSERT INTO {TABLA_FTS}(rowid, {CAMPOS_FTS})
+        VALUES (new.id, new.titulo, new.autor, new.editorial, new.descripcion, new.isbn);
+    END
+    """,
+]
+
+# Guiones entre dígitos (ISBN escritos como 978-84-...)
+_GUION_ISBN = re.compile(r'(?<=\d)-(?=\d)')
+_TOKEN = re.compile(r'\w+')
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+_NO_ISBN = re.compile(r'[^0-9X]+')
+
+# Similitud mínima (Jaccard de trigramas con el título o con el autor) para
+# aparecer en la búsqueda aproximada
+UMBRAL_SIMILITUD = 0.4
+
+
+def normalizar(texto):
+    """
+    Clave de comparación: minúsculas, sin tildes ni signos y con los
+    espacios colapsados ("García Márquez" -> "garcia marquez").
+    """
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', sin_tildes.lower()).strip()
+
+
+def normalizar_isbn(isbn):
+    """
+    Clave de comparación de un ISBN: solo dígitos (y la X final del
+    ISBN-10), con los ISBN-10 convertidos a ISBN-13. Devuelve '' si no
+    parece un ISBN.
+    """
+    if not isbn:
+        return ''
+    limpio = _NO_ISBN.sub('', str(isbn).upper())
+    if len(limpio) == 10 and limpio[:9].isdigit():
+        cuerpo = '978' + limpio[:9]
+        suma = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(cuerpo))
+        return cuerpo + str((10 - suma % 10) % 10)
+    if len(limpio) == 13 and limpio.isdigit():
+        return limpio
+    return ''
+
+
+def trigramas(texto_normalizado):
+    """
+    Trigramas de cada palabra, rellenada como en pg_trgm (dos espacios
+    delante y uno detrás) para que el principio de palabra pese más.
+    """
+    resultado = set()
+    for palabra in texto_normalizado.split():
+        relleno = f'  {palabra} '
+        for i in range(len(relleno) - 2):
+            resultado.add(relleno[i:i + 3])
+    return resultado
+
+
+def fts_disponible():
+    """El índice FTS5 solo existe sobre SQLite"""
+    return connection.vendor == 'sqlite'
+
+
+def asegurar_indice_fts(using='default', **kwargs):
+    """
+    Crea la tabla FTS y sus triggers si faltan. Si algún trigger se había
+    perdido, reconstruye el índice desde ``biblioteca_libro``.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'biblioteca_libro'"
+        )
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f'{TABLA_FTS}_%'],
+        )
+        if cursor.fetchone()[0] == len(SQL_TRIGGERS_FTS):
+            return
+        cursor.execute(SQL_TABLA_FTS)
+        for sql in SQL_TRIGGERS_FTS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def expresion_fts(query):
+    """
+    Convierte el texto del usuario en una expresión MATCH segura: cada
+    palabra se cita (para neutralizar la sintaxis de FTS5) y se busca
+    como prefijo. Devuelve None si no queda ninguna palabra.
+    """
+    tokens = _TOKEN.findall(_GUION_ISBN.sub('', query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def buscar_libros(libros, query):
+    """
+    Filtra el queryset ``libros`` por ``query`` y lo anota con ``rango``
+    (BM25 de FTS5: cuanto más bajo, más relevante).
+    """
+    if not fts_disponible():
+        return libros.filter(
+            Q(titulo__icontains=query) |
+            Q(autor__icontains=query) |
+            Q(editorial__icontains=query) |
+            Q(isbn__icontains=query)
+        ).annotate(rango=RawSQL('0', ()))
+
+    expresion = expresion_fts(query)
+    if expresion is None:
+        return libros.none().annotate(rango=RawSQL('0', ()))
+
+    return libros.extra(
+        tables=[TABLA_FTS],
+        where=[
+            f'{TABLA_FTS}.rowid = biblioteca_libro.id',
+            f'{TABLA_FTS} MATCH %s',
+        ],
+        params=[expresion],
+    ).annotate(rango=RawSQL(f'{TABLA_FTS}.rank', ()))
+
+
+def _jaccard(comunes, consulta, campo):
+    """``comunes / |consulta ∪ campo|`` con el número de trigramas guardado del campo"""
+    return Cast(comunes, FloatField()) / (Value(consulta) + F(campo) - F(comunes))
+
+
+def buscar_libros_aproximado(libros, query, umbral=UMBRAL_SIMILITUD):
+    """
+    Búsqueda tolerante a tildes y erratas sobre título y autor.
+
+    Los candidatos salen del índice ``(trigrama, libro, campo)`` y se
+    puntúan en la propia consulta, sin recorrer los libros en Python. La
+    ``similitud`` (entre 0 y 1) es el índice de Jaccard de los trigramas de
+    ``query`` con los del título o con los del autor, el mayor de los dos.
+    Es simétrica: un título largo que contiene los trigramas de la
+    consulta, pero muchos más, no se parece a ella.
+    """
+    consulta = trigramas(normalizar(query))
+    if not consulta:
+        return libros.none().annotate(similitud=Value(0.0, output_field=FloatField()))
+
+    return libros.filter(
+        trigramas__trigrama__in=consulta
+    ).annotate(
+        # campo vale 0 en el título y 1 en el autor (ver TrigramaLibro)
+        comunes_autor=Sum('trigramas__campo'),
+        comunes_titulo=Count('trigramas') - F('comunes_autor'),
+    ).annotate(
+        similitud=Greatest(
+            _jaccard('comunes_titulo', len(consulta), 'trigramas_titulo'),
+            _jaccard('comunes_autor', len(consulta), 'trigramas_autor'),
+        ),
+    ).filter(similitud__gte=umbral)
+
+
+# Orden de las listas de libros sin búsqueda: los añadidos más recientemente
+ORDEN_RECIENTES = ('-fecha_agregado', '-id')
+
+
+def aplicar_busqueda(libros, form):
+    """
+    Aplica a ``libros`` la búsqueda de un ``BusquedaLibroForm`` (modo por
+    palabras con FTS5 o aproximado con trigramas). Devuelve ``(libros,
+    orden, query)``; sin búsqueda, ``query`` es ``''`` y el orden es
+    ``ORDEN_RECIENTES``.
+    """
+    if not (form.is_valid() and form.cleaned_data.get('query')):
+        return libros, ORDEN_RECIENTES, ''
+    query = form.cleaned_data['query']
+    if form.cleaned_data.get('modo') == 'aproximada':
+        # Índice de trigramas, ordenado por similitud
+        return buscar_libros_aproximado(libros, query), ('-similitud', '-id'), query
+    # Índice FTS5, ordenado por relevancia (BM25)
+    return buscar_libros(libros, query), ('rango', 'id'), query
+
+
+def _paginador_busqueda(libros, form, por_pagina, total):
+    libros, orden, query = aplicar_busqueda(libros, form)
+    # ``total`` (p. ej. el contador desnormalizado) solo vale sin búsqueda
+    return KeysetPaginator(libros, orden=orden, por_pagina=por_pagina, total=None if query else total), query
+
+
+def paginar_busqueda(libros, form, parametros, por_pagina, total=None):
+    """
+    Búsqueda y paginación por cursor de las listas de libros de la web.
+    ``parametros`` es ``request.GET``; un cursor no válido lleva a la
+    primera página. Devuelve ``(pagina, query)``.
+    """
+    paginador, query = _paginador_busqueda(libros, form, por_pagina, total)
+    try:
+        pagina = paginador.pagina(despues=parametros.get('despues'), antes=parametros.get('antes'))
+    except CursorInvalido:
+        pagina = paginador.pagina()
+    return pagina, query
+
+
+async def apaginar_busqueda(libros, form, parametros, por_pagina, total=None):
+    """Como ``paginar_busqueda`` con el ORM asíncrono, con el total ya calculado"""
+    paginador, query = _paginador_busqueda(libros, form, por_pagina, total)
+    try:
+        pagina = await paginador.apagina(despues=parametros.get('despues'), antes=parametros.get('antes'))
+    except CursorInvalido:
+        pagina = await paginador.apagina()
+    await paginador.atotal()
+    return pagina, query
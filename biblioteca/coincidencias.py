@@ -0,0 +1,135 @@
+"""
+Deseos que ya están en alguna biblioteca pública.
+
+Un deseo coincide con un libro público de otro usuario si los dos tienen
+el mismo ISBN normalizado (``normalizar_isbn``: los ISBN-10 pasan a 13) o,
+si no, el mismo título y autor normalizados (``normalizar``). Las claves
+se guardan en las propias filas de ``Libro`` y ``ListaDeseos``, con índice,
+así que emparejar un lote cuesta una consulta.
+
+Se empareja al vuelo, solo con lo que cambia: al guardar o crear en bloque
+libros y deseos (``save()`` y ``bulk_create`` de sus modelos) y al hacer
+pública una biblioteca. El resultado queda en ``CoincidenciaDeseo``, que
+``lista_deseos`` y ``home`` leen sin consultar nada por cada deseo.
+"""
+from collections import defaultdict
+
+from django.db.models import Prefetch, Q
+
+from .models import CoincidenciaDeseo, Libro, ListaDeseos
+
+
+# Claves que entran en cada consulta (límite de parámetros de SQLite)
+LOTE = 400
+
+# Coincidencias que se muestran en el inicio
+MAX_INICIO = 6
+
+
+def _trozos(elementos):
+    elementos = list(elementos)
+    for inicio in range(0, len(elementos), LOTE):
+        yield elementos[inicio:inicio + LOTE]
+
+
+def _filtro_claves(objetos):
+    """Filas con el ISBN o el título de alguno de ``objetos``; el autor se comprueba después"""
+    isbns = {objeto.isbn_normalizado for objeto in objetos if objeto.isbn_normalizado}
+    titulos = {objeto.titulo_normalizado for objeto in objetos}
+    return Q(isbn_normalizado__in=isbns) | Q(titulo_normalizado__in=titulos)
+
+
+def parejas(deseos, libros):
+    """
+    Coincidencias entre ``deseos`` y ``libros`` (públicos), primero por
+    ISBN y después por título y autor. Nunca con un libro del propio
+    usuario del deseo.
+    """
+    por_isbn = defaultdict(list)
+    por_titulo = defaultdict(list)
+    for libro in libros:
+        if libro.isbn_normalizado:
+            por_isbn[libro.isbn_normalizado].append(libro)
+        por_titulo[libro.titulo_normalizado, libro.autor_normalizado].append(libro)
+
+    resultado = []
+    for deseo in deseos:
+        vistos = set()
+        candidatos = [('isbn', libro) for libro in por_isbn.get(deseo.isbn_normalizado, ())]
+        candidatos += [
+            ('titulo', libro)
+            for libro in por_titulo.get((deseo.titulo_normalizado, deseo.autor_normalizado), ())
+        ]
+        for criterio, libro in candidatos:
+            if libro.pk in vistos or libro.propietario_id == deseo.usuario_id:
+                continue
+            vistos.add(libro.pk)
+            resultado.append(CoincidenciaDeseo(deseo_id=deseo.pk, libro_id=libro.pk, criterio=criterio))
+    return resultado
+
+
+def emparejar_deseos(deseos, reemplazar=False):
+    """Busca en las bibliotecas públicas los ``deseos`` recién creados o editados"""
+    deseos = [deseo for deseo in deseos if deseo.pk]
+    if reemplazar:
+        CoincidenciaDeseo.objects.filter(deseo__in=deseos).delete()
+    for trozo in _trozos(deseos):
+        libros = Libro.objects.filter(_filtro_claves(trozo), publico=True).order_by().only(
+            'id', 'propietario_id', 'isbn_normalizado', 'titulo_normalizado', 'autor_normalizado',
+        )
+        CoincidenciaDeseo.objects.bulk_create(parejas(trozo, libros), ignore_conflicts=True)
+
+
+def emparejar_libros(libros, reemplazar=False):
+    """Busca en las listas de deseos los ``libros`` recién creados, editados o hechos públicos"""
+    libros = [libro for libro in libros if libro.pk]
+    if reemplazar:
+        CoincidenciaDeseo.objects.filter(libro__in=libros).delete()
+    for trozo in _trozos(libro for libro in libros if libro.publico):
+        deseos = ListaDeseos.objects.filter(_filtro_claves(trozo)).order_by().only(
+            'id', 'usuario_id', 'isbn_normalizado', 'titulo_normalizado', 'autor_normalizado',
+        )
+        CoincidenciaDeseo.objects.bulk_create(parejas(deseos, trozo), ignore_conflicts=True)
+
+
+def biblioteca_cambiada(usuario):
+    """Al cambiar la privacidad de una biblioteca sus libros entran o salen"""
+    if not usuario.biblioteca_publica:
+        CoincidenciaDeseo.objects.filter(libro__propietario=usuario).delete()
+        return
+    libros = usuario.libros.only(
+        'id', 'propietario_id', 'publico', 'isbn_normalizado', 'titulo_normalizado', 'autor_normalizado',
+    )
+    emparejar_libros(libros.iterator(chunk_size=LOTE))
+
+
+# ====== LECTURA ======
+
+def _disponibles(*campos):
+    return CoincidenciaDeseo.objects.filter(libro__publico=True).select_related(
+        'libro__propietario'
+    ).only(
+        *campos,
+        'deseo',
+        'criterio',
+        'libro__titulo',
+        'libro__propietario__username',
+        'libro__propietario__first_name',
+        'libro__propietario__last_name',
+    )
+
+
+def prefetch_disponibles():
+    """``Prefetch`` de las coincidencias vigentes de una lista de deseos (una consulta)"""
+    return Prefetch(
+        'coincidencias',
+        queryset=_disponibles().order_by('criterio', 'libro_id'),
+        to_attr='disponibles',
+    )
+
+
+def disponibles_inicio(usuario):
+    """Las coincidencias de los deseos más prioritarios de ``usuario``"""
+    return _disponibles('deseo__titulo', 'deseo__autor').select_related('deseo').filter(
+        deseo__usuario=usuario,
+    ).order_by('-deseo__prioridad', '-deseo__fecha_agregado', 'libro_id')[:MAX_INICIO]
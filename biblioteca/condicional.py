@@ -0,0 +1,183 @@
+"""
+Validadores para GET condicional (ETag / Last-Modified).
+
+Las páginas de biblioteca y de detalle de libro se sirven con
+``Cache-Control: private, no-cache``: el navegador siempre revalida y, si
+su copia sigue vigente, recibe un 304 tras una sola consulta agregada en
+lugar de volver a renderizar la página.
+
+El ETag resume todo lo que cambia el HTML: la última modificación de los
+libros (las reseñas y los préstamos actualizan la del suyo, ver
+``signals.py``), los libros parecidos del detalle, la privacidad y el
+nombre del propietario, la versión de interfaz de la sesión, el usuario
+que mira y los parámetros de la URL. Es débil porque el token CSRF
+enmascarado cambia en cada render.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Libro, Usuario
+
+
+def _etag(request, *partes):
+    """ETag débil con las partes comunes a todas las páginas"""
+    usuario = request.user
+    material = repr((
+        partes,
+        usuario.pk,
+        usuario.get_full_name(),
+        request.session.get('version', 'normal'),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        request.GET.urlencode(),
+    ))
+    return 'W/"{}"'.format(hashlib.md5(material.encode()).hexdigest())
+
+
+def _condicional(request):
+    """Solo GET/HEAD sin mensajes pendientes (un 304 no los mostraría)"""
+    return request.method in ('GET', 'HEAD') and not len(messages.get_messages(request))
+
+
+def _memorizar(funcion):
+    """Calcula los validadores una sola vez por petición"""
+    @wraps(funcion)
+    def envoltura(request, *args, **kwargs):
+        if not hasattr(request, '_validadores'):
+            request._validadores = funcion(request, *args, **kwargs) if _condicional(request) else None
+        return request._validadores
+    return envoltura
+
+
+# ====== BIBLIOTECA ======
+
+def _consulta_biblioteca(username):
+    # Los libros borrados no dejan fecha_modificado: cuenta también la del
+    # último borrado (ver signals.libro_borrado)
+    return Usuario.objects.filter(username=username).annotate(
+        ultima=Greatest(
+            Coalesce(Max('libros__fecha_modificado'), 'fecha_registro'),
+            Coalesce('fecha_libro_borrado', 'fecha_registro'),
+        ),
+    ).values(
+        'pk', 'biblioteca_publica', 'first_name', 'last_name', 'num_libros', 'ultima',
+    )
+
+
+def _validadores_biblioteca(request, datos):
+    if datos is None:
+        return None
+    if not datos['biblioteca_publica'] and datos['pk'] != request.user.pk:
+        # Redirige con un mensaje: no se cachea
+        return None
+    return _etag(request, 'biblioteca', sorted(datos.items())), datos['ultima']
+
+
+@_memorizar
+def validadores_biblioteca(request, username):
+    """``(etag, ultima_modificacion)`` de ``ver_biblioteca`` o None"""
+    return _validadores_biblioteca(request, _consulta_biblioteca(username).first())
+
+
+async def avalidadores_biblioteca(request, username):
+    return _validadores_biblioteca(request, await _consulta_biblioteca(username).afirst())
+
+
+def etag_biblioteca(request, username):
+    validadores = validadores_biblioteca(request, username)
+    return validadores and validadores[0]
+
+
+def ultima_modificacion_biblioteca(request, username):
+    validadores = validadores_biblioteca(request, username)
+    return validadores and validadores[1]
+
+
+# ====== LIBRO ======
+
+def _consulta_libro(pk):
+    # Versión de los libros parecidos: cambia al recalcular la lista (ids
+    # nuevos), al editarse uno de ellos o al dejar de ser público
+    visibles = Q(recomendaciones__recomendado__publico=True)
+    return Libro.objects.filter(pk=pk).annotate(
+        recomendaciones_id=Max('recomendaciones__id'),
+        recomendaciones_visibles=Count('recomendaciones', filter=visibles),
+        recomendaciones_modificado=Max('recomendaciones__recomendado__fecha_modificado', filter=visibles),
+    ).values(
+        'fecha_modificado',
+        'propietario_id',
+        'propietario__biblioteca_publica',
+        'propietario__username',
+        'propietario__first_name',
+        'propietario__last_name',
+        'recomendaciones_id',
+        'recomendaciones_visibles',
+        'recomendaciones_modificado',
+    )
+
+
+def _validadores_libro(request, datos):
+    if datos is None:
+        return None
+    if not datos['propietario__biblioteca_publica'] and datos['propietario_id'] != request.user.pk:
+        return None
+    return _etag(request, 'libro', sorted(datos.items())), datos['fecha_modificado']
+
+
+@_memorizar
+def validadores_libro(request, pk):
+    """``(etag, ultima_modificacion)`` de ``libro_detalle`` o None"""
+    return _validadores_libro(request, _consulta_libro(pk).first())
+
+
+async def avalidadores_libro(request, pk):
+    return _validadores_libro(request, await _consulta_libro(pk).afirst())
+
+
+def etag_libro(request, pk):
+    validadores = validadores_libro(request, pk)
+    return validadores and validadores[0]
+
+
+def ultima_modificacion_libro(request, pk):
+    validadores = validadores_libro(request, pk)
+    return validadores and validadores[1]
+
+
+# ====== VISTAS ASÍNCRONAS ======
+
+def condicion_async(validadores):
+    """
+    Equivalente a ``condition`` para vistas asíncronas. ``validadores``
+    es una corrutina como ``avalidadores_biblioteca``: los de ``condition``
+    consultan con el ORM síncrono y no se pueden llamar desde el bucle.
+    La vista debe recibir ``request.user`` ya resuelto.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            etag = ultima = None
+            if _condicional(request):
+                resultado = await validadores(request, *args, **kwargs)
+                if resultado:
+                    etag, fecha = resultado
+                    ultima = int(fecha.timestamp()) if fecha else None
+
+            respuesta = get_conditional_response(request, etag=etag, last_modified=ultima)
+            if respuesta is None:
+                respuesta = await vista(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if ultima and not respuesta.has_header('Last-Modified'):
+                    respuesta.headers['Last-Modified'] = http_date(ultima)
+                if etag:
+                    respuesta.headers.setdefault('ETag', etag)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,76 @@
+"""
+Contadores desnormalizados de ``Usuario``.
+
+Se mantienen de forma incremental con expresiones ``F()`` (un UPDATE
+atómico, sin leer el valor) desde las señales de ``signals.py``. Si
+alguna ruta los descuadra (``bulk_create`` de otros modelos, SQL a mano),
+el comando ``recount`` los recalcula desde cero.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Usuario, Libro, Prestamo, ListaDeseos, SolicitudContacto
+
+
+CONTADORES = ['num_libros', 'num_deseos', 'num_prestamos_activos', 'num_solicitudes_pendientes']
+
+
+def ajustar(usuario_id, fijar=None, **deltas):
+    """
+    ``ajustar(5, num_libros=1)`` -> ``UPDATE ... SET num_libros = num_libros + 1``
+
+    ``fijar`` son otros campos que se asignan en el mismo UPDATE.
+    """
+    cambios = {campo: F(campo) + delta for campo, delta in deltas.items() if delta}
+    if cambios and fijar:
+        cambios.update(fijar)
+    if usuario_id and cambios:
+        Usuario.objects.filter(pk=usuario_id).update(**cambios)
+
+
+def _conteo(queryset, campo_usuario):
+    """Subconsulta correlacionada con el número de filas de cada usuario"""
+    subconsulta = queryset.filter(**{campo_usuario: OuterRef('pk')}).order_by().values(
+        campo_usuario
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(subconsulta, output_field=IntegerField()), 0)
+
+
+def recontar(usuarios=None):
+    """
+    Recalcula todos los contadores con un único UPDATE. ``usuarios``
+    limita el recálculo a un queryset o lista de ids.
+    """
+    objetivo = Usuario.objects.all()
+    if usuarios is not None:
+        objetivo = objetivo.filter(pk__in=usuarios)
+    return objetivo.update(
+        num_libros=_conteo(Libro.objects.all(), 'propietario'),
+        num_deseos=_conteo(ListaDeseos.objects.all(), 'usuario'),
+        num_prestamos_activos=_conteo(
+            Prestamo.objects.filter(fecha_devolucion_real__isnull=True), 'libro__propietario'
+        ),
+        num_solicitudes_pendientes=_conteo(
+            SolicitudContacto.objects.filter(estado='pendiente'), 'bibliotecario'
+        ),
+    )
+
+
+def descuadres():
+    """Usuarios cuyos contadores no coinciden con los datos reales"""
+    anotados = Usuario.objects.annotate(
+        real_libros=_conteo(Libro.objects.all(), 'propietario'),
+        real_deseos=_conteo(ListaDeseos.objects.all(), 'usuario'),
+        real_prestamos=_conteo(
+            Prestamo.objects.filter(fecha_devolucion_real__isnull=True), 'libro__propietario'
+        ),
+        real_solicitudes=_conteo(
+            SolicitudContacto.objects.filter(estado='pendiente'), 'bibliotecario'
+        ),
+    )
+    return anotados.filter(
+        ~Q(num_libros=F('real_libros')) |
+        ~Q(num_deseos=F('real_deseos')) |
+        ~Q(num_prestamos_activos=F('real_prestamos')) |
+        ~Q(num_solicitudes_pendientes=F('real_solicitudes'))
+    )
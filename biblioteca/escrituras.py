@@ -0,0 +1,264 @@
+"""
+Escrituras diferidas: muchas escrituras pequeñas, un solo escritor.
+
+SQLite admite un único escritor a la vez, aun en modo WAL. Las escrituras
+frecuentes y de poca prioridad (solicitudes de contacto, último acceso y
+los contadores que arrastran) no se hacen en la petición: ``diferir``
+deja cada una en un fichero JSON en ``settings.COLA_ESCRITURAS`` y el
+comando ``procesar_escrituras`` las aplica en lote, en una transacción
+por intervalo. Así solo hay un proceso compitiendo por el bloqueo de
+escritura en lugar de todos los workers.
+
+Garantías:
+
+- Durabilidad: el fichero se escribe, se sincroniza con ``fsync`` y se
+  mueve con ``os.replace`` a ``pendientes/`` antes de que la petición
+  responda. Si el servidor cae, la escritura sigue ahí.
+- Una sola vez: la clave de cada escritura (el nombre de su fichero) se
+  guarda en ``EscrituraAplicada`` en la misma transacción que el lote.
+- Escritura directa como alternativa: sin ``COLA_ESCRITURAS``, si el
+  escritor no ha dado señales de vida en ``ESCRITOR_INACTIVO`` segundos o
+  si no se puede escribir el fichero, ``diferir`` devuelve False y quien
+  llama escribe en la base de datos como siempre.
+
+Lo diferido tarda hasta un intervalo en verse: solo se difiere lo que
+quien lo escribe no necesita leer enseguida.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.db import OperationalError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .contadores import ajustar
+from .models import EscrituraAplicada, Libro, SolicitudContacto, Usuario
+
+
+logger = logging.getLogger(__name__)
+
+# Sin latido del escritor durante este tiempo se escribe directamente
+ESCRITOR_INACTIVO = 30
+
+# Días que se conservan las claves de escrituras aplicadas
+DIAS_CLAVES = 2
+
+
+def directorio():
+    ruta = getattr(settings, 'COLA_ESCRITURAS', None)
+    return Path(ruta) if ruta else None
+
+
+def escritor_activo():
+    base = directorio()
+    if base is None:
+        return False
+    try:
+        return time.time() - (base / 'latido').stat().st_mtime < ESCRITOR_INACTIVO
+    except OSError:
+        return False
+
+
+def latido():
+    """Lo llama el escritor en cada vuelta para que las vistas difieran"""
+    base = directorio()
+    for carpeta in ('pendientes', 'tmp', 'fallidas'):
+        (base / carpeta).mkdir(parents=True, exist_ok=True)
+    (base / 'latido').touch()
+
+
+def _sincronizar_directorio(ruta):
+    descriptor = os.open(ruta, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def diferir(tipo, **datos):
+    """
+    Deja la escritura en la cola de forma duradera. Devuelve False si no
+    se ha podido y hay que escribir directamente.
+    """
+    if tipo not in APLICADORES or not escritor_activo():
+        return False
+    base = directorio()
+    # El nombre ordena por tiempo y sirve de clave única
+    clave = '{}-{}-{}'.format(time.time_ns(), os.getpid(), uuid.uuid4().hex[:12])
+    temporal = base / 'tmp' / f'{clave}.json'
+    contenido = json.dumps({'tipo': tipo, 'datos': datos}, default=str).encode()
+    try:
+        with open(temporal, 'wb') as fichero:
+            fichero.write(contenido)
+            fichero.flush()
+            os.fsync(fichero.fileno())
+        os.replace(temporal, base / 'pendientes' / f'{clave}.json')
+        _sincronizar_directorio(base / 'pendientes')
+    except OSError:
+        logger.exception('No se pudo diferir la escritura %s: se escribe directamente', tipo)
+        temporal.unlink(missing_ok=True)
+        return False
+    return True
+
+
+# ====== ESCRITURAS DIFERIBLES ======
+
+def guardar_solicitud(solicitud):
+    """
+    Guarda una solicitud de contacto nueva, en diferido si se puede.
+    Devuelve False si ha quedado en la cola (todavía no tiene ``pk``).
+    """
+    diferida = diferir(
+        'solicitud',
+        visitante_id=solicitud.visitante_id,
+        bibliotecario_id=solicitud.bibliotecario_id,
+        libro_id=solicitud.libro_id,
+        mensaje=solicitud.mensaje,
+        fecha_creacion=solicitud.fecha_creacion.isoformat(),
+    )
+    if not diferida:
+        solicitud.save()
+    return not diferida
+
+
+def ultimo_acceso_diferido(sender, user, **kwargs):
+    """Sustituye a ``update_last_login`` en la señal ``user_logged_in``"""
+    ahora = timezone.now()
+    if diferir('ultimo_acceso', usuario_id=user.pk, fecha=ahora.isoformat()):
+        user.last_login = ahora
+    else:
+        update_last_login(sender, user, **kwargs)
+
+
+def _aplicar_solicitudes(lista):
+    usuarios = set(Usuario.objects.filter(
+        pk__in={d['visitante_id'] for d in lista} | {d['bibliotecario_id'] for d in lista}
+    ).values_list('pk', flat=True))
+    libros = set(Libro.objects.filter(
+        pk__in={d['libro_id'] for d in lista if d['libro_id']}
+    ).values_list('pk', flat=True))
+
+    solicitudes = []
+    for datos in lista:
+        if datos['visitante_id'] not in usuarios or datos['bibliotecario_id'] not in usuarios:
+            # El usuario se borró mientras tanto: la solicitud se habría borrado con él
+            continue
+        solicitudes.append(SolicitudContacto(
+            visitante_id=datos['visitante_id'],
+            bibliotecario_id=datos['bibliotecario_id'],
+            # Como on_delete=SET_NULL si el libro ya no existe
+            libro_id=datos['libro_id'] if datos['libro_id'] in libros else None,
+            mensaje=datos['mensaje'],
+            # La hora de la petición, no la del lote
+            fecha_creacion=datetime.fromisoformat(datos['fecha_creacion']),
+        ))
+
+    # Un solo INSERT; bulk_create no emite post_save: los contadores se ajustan sumados
+    SolicitudContacto.objects.bulk_create(solicitudes)
+    pendientes = Counter(solicitud.bibliotecario_id for solicitud in solicitudes)
+    for bibliotecario_id, total in pendientes.items():
+        ajustar(bibliotecario_id, num_solicitudes_pendientes=total)
+
+
+def _aplicar_ultimos_accesos(lista):
+    ultimos = {}
+    for datos in lista:
+        fecha = datetime.fromisoformat(datos['fecha'])
+        ultimos[datos['usuario_id']] = max(fecha, ultimos.get(datos['usuario_id'], fecha))
+    for usuario_id, fecha in ultimos.items():
+        Usuario.objects.filter(
+            Q(last_login__isnull=True) | Q(last_login__lt=fecha), pk=usuario_id,
+        ).update(last_login=fecha)
+
+
+APLICADORES = {
+    'solicitud': _aplicar_solicitudes,
+    'ultimo_acceso': _aplicar_ultimos_accesos,
+}
+
+
+# ====== ESCRITOR (comando procesar_escrituras) ======
+
+def _leer(ruta):
+    with open(ruta, 'rb') as fichero:
+        escritura = json.load(fichero)
+    if escritura.get('tipo') not in APLICADORES:
+        raise ValueError(f'Tipo de escritura desconocido: {escritura.get("tipo")}')
+    return escritura
+
+
+def _apartar(ruta, motivo):
+    logger.error('Escritura %s apartada en fallidas/: %s', ruta.name, motivo)
+    os.replace(ruta, directorio() / 'fallidas' / ruta.name)
+
+
+def _aplicar(escrituras):
+    """Aplica ``{clave: escritura}`` en una transacción"""
+    with transaction.atomic():
+        # Lo primero es escribir: la transacción toma el bloqueo de
+        # escritura (esperando busy_timeout) antes de leer nada
+        EscrituraAplicada.objects.bulk_create(EscrituraAplicada(clave=clave) for clave in escrituras)
+        por_tipo = defaultdict(list)
+        for escritura in escrituras.values():
+            por_tipo[escritura['tipo']].append(escritura['datos'])
+        for tipo, lista in por_tipo.items():
+            APLICADORES[tipo](lista)
+
+
+def aplicar_pendientes(lote=500):
+    """
+    Aplica hasta ``lote`` escrituras pendientes en una transacción y
+    devuelve cuántos ficheros se han procesado. Si el lote falla por un
+    dato (no por el bloqueo), se aplican de una en una y las que fallan
+    se apartan en ``fallidas/``.
+    """
+    pendientes = directorio() / 'pendientes'
+    rutas = sorted(pendientes.glob('*.json'))[:lote]
+    if not rutas:
+        return 0
+
+    escrituras = {}
+    for ruta in rutas:
+        try:
+            escrituras[ruta.stem] = _leer(ruta)
+        except (OSError, ValueError) as exc:
+            _apartar(ruta, exc)
+
+    ya_aplicadas = set(EscrituraAplicada.objects.filter(
+        clave__in=list(escrituras)
+    ).values_list('clave', flat=True))
+    nuevas = {clave: e for clave, e in escrituras.items() if clave not in ya_aplicadas}
+
+    if nuevas:
+        try:
+            _aplicar(nuevas)
+        except OperationalError:
+            # Base de datos bloqueada: los ficheros siguen ahí para la próxima vuelta
+            raise
+        except Exception:
+            logger.exception('Falló un lote de %s escrituras: se aplican de una en una', len(nuevas))
+            for clave, escritura in nuevas.items():
+                try:
+                    _aplicar({clave: escritura})
+                except OperationalError:
+                    raise
+                except Exception as exc:
+                    _apartar(pendientes / f'{clave}.json', exc)
+
+    for clave in escrituras:
+        (pendientes / f'{clave}.json').unlink(missing_ok=True)
+    return len(rutas)
+
+
+def purgar_claves():
+    """Borra las claves de escrituras aplicadas hace más de ``DIAS_CLAVES`` días"""
+    limite = timezone.now() - timedelta(days=DIAS_CLAVES)
+    return EscrituraAplicada.objects.filter(fecha__lt=limite).delete()[0]
@@ -0,0 +1,150 @@
+"""
+Paquetes de CSS por versión de la interfaz y almacenamiento de estáticos.
+
+Cada versión (``normal``, ``no-usable``, ``no-accesible``) carga una sola
+hoja de estilos: ``AlmacenEstaticos`` une y minimiza en ``collectstatic``
+los ficheros de ``settings.PAQUETES_CSS`` (Bootstrap e iconos incluidos,
+servidos desde ``static/vendor/``) en ``css/paquetes/<versión>.css``. Como
+almacenamiento de manifiesto añade al nombre de cada fichero el hash de
+su contenido, así que el servidor web puede cachearlos para siempre, y
+deja junto a cada uno su versión ``.gz`` (y ``.br`` si está instalado
+``brotli``) para servirla sin comprimir en cada petición.
+
+Sin ``AlmacenEstaticos`` (en desarrollo) la etiqueta ``{% hojas_estilo %}``
+enlaza los ficheros del paquete por separado.
+"""
+import gzip
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # Sin brotli solo se generan los .gz
+    brotli = None
+
+
+# Tipos de fichero que merece la pena comprimir (las fuentes WOFF ya lo están)
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+
+_URL = re.compile(r'''url\(\s*(['"]?)(.*?)\1\s*\)''')
+_CHARSET = re.compile(r'@charset\s+(["\']).*?\1\s*;')
+_IMPORT = re.compile(r'@import\s+[^;]+;')
+_TOKENS = re.compile(
+    r'''(?P<cadena>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')'''
+    r'|(?P<licencia>/\*!.*?\*/)'
+    r'|(?P<comentario>/\*.*?\*/)',
+    re.S,
+)
+
+
+def ruta_paquete(version):
+    return f'css/paquetes/{version}.css'
+
+
+def minimizar_css(css):
+    """
+    Quita comentarios (salvo los ``/*! ... */`` de licencia) y espacios
+    sobrantes sin tocar el contenido de las cadenas.
+    """
+    apartados = []
+
+    def apartar(coincidencia):
+        if coincidencia.group('comentario'):
+            return ' '
+        texto = coincidencia.group()
+        if coincidencia.group('licencia'):
+            texto += '\n'
+        apartados.append(texto)
+        return f'\x00{len(apartados) - 1}\x00'
+
+    css = _TOKENS.sub(apartar, css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r' ?([{};,>]) ?', r'\1', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\x00(\d+)\x00', lambda c: apartados[int(c.group(1))], css)
+
+
+def _reubicar_urls(css, origen, destino):
+    """Reescribe las ``url()`` relativas de ``origen`` para que sirvan desde ``destino``"""
+    carpeta_origen = posixpath.dirname(origen)
+    carpeta_destino = posixpath.dirname(destino)
+
+    def reubicar(coincidencia):
+        comilla, url = coincidencia.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', url, re.I):
+            return coincidencia.group()
+        ruta = posixpath.normpath(posixpath.join(carpeta_origen, url))
+        return f'url({comilla}{posixpath.relpath(ruta, carpeta_destino)}{comilla})'
+
+    return _URL.sub(reubicar, css)
+
+
+def unir_css(ficheros, destino):
+    """
+    Une ``[(ruta, contenido)]`` en una sola hoja minimizada para ``destino``.
+    ``@charset`` e ``@import`` solo valen al principio de la hoja, así que
+    se quitan de cada fichero y se ponen una vez delante.
+    """
+    importaciones = []
+    partes = []
+    for ruta, css in ficheros:
+        css = _CHARSET.sub('', css)
+        importaciones += _IMPORT.findall(css)
+        css = _IMPORT.sub('', css)
+        partes.append(_reubicar_urls(css, ruta, destino))
+    return '@charset "UTF-8";' + ''.join(importaciones) + minimizar_css('\n'.join(partes))
+
+
+def comprimir(contenido):
+    """Devuelve ``{extensión: contenido comprimido}`` con lo que reduzca el tamaño"""
+    versiones = {'.gz': gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versiones['.br'] = brotli.compress(contenido, quality=11)
+    return {ext: datos for ext, datos in versiones.items() if len(datos) < len(contenido)}
+
+
+class AlmacenEstaticos(ManifestStaticFilesStorage):
+    """
+    ``ManifestStaticFilesStorage`` que además construye los paquetes de
+    CSS antes de calcular los hashes y precomprime los ficheros con hash.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+
+        for version in settings.PAQUETES_CSS:
+            yield self._construir_paquete(version, paths)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(COMPRIMIBLES):
+                self._precomprimir(nombre)
+
+    def _construir_paquete(self, version, paths):
+        destino = ruta_paquete(version)
+        ficheros = []
+        for ruta in settings.PAQUETES_CSS[version]:
+            with self.open(ruta) as fichero:
+                ficheros.append((ruta, fichero.read().decode()))
+        contenido = unir_css(ficheros, destino)
+        if self.exists(destino):
+            self.delete(destino)
+        self._save(destino, ContentFile(contenido.encode()))
+        # Como si se hubiera recopilado: el manifiesto le pone su hash
+        paths[destino] = (self, destino)
+        return destino, destino, True
+
+    def _precomprimir(self, nombre):
+        with self.open(nombre) as fichero:
+            contenido = fichero.read()
+        for extension, datos in comprimir(contenido).items():
+            if self.exists(nombre + extension):
+                self.delete(nombre + extension)
+            self._save(nombre + extension, ContentFile(datos))
@@ -0,0 +1,196 @@
+"""
+Exportación de la biblioteca de un usuario.
+
+Los libros se recorren con ``iterator(chunk_size=...)``: cada trozo trae
+sus reseñas (``select_related``) y sus préstamos (un ``prefetch`` por
+trozo), así que la memoria no depende del tamaño de la biblioteca y la
+respuesta empieza a enviarse en cuanto se lee el primer trozo.
+
+Formatos:
+
+- ``csv``: un libro por fila con las columnas de ``importacion.CAMPOS``
+  (se puede volver a importar), la reseña y los préstamos en JSON.
+- ``jsonl``: un objeto JSON por libro, con la reseña y los préstamos
+  anidados. También se puede volver a importar.
+- ``marc``: registros en formato MARC legible (``.mrk``), para llevar el
+  catálogo a programas de bibliotecas.
+"""
+import csv
+import io
+import json
+
+from django.utils import timezone
+
+from .importacion import CAMPOS
+
+
+TAMANO_TROZO = 1000
+
+# Filas que se acumulan antes de enviar un bloque al cliente
+FILAS_POR_BLOQUE = 200
+
+# formato -> (tipo MIME, extensión)
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'marc': ('text/plain; charset=utf-8', 'mrk'),
+}
+
+COLUMNAS_CSV = CAMPOS + [
+    'fecha_agregado', 'resena_puntuacion', 'resena_comentario', 'resena_fecha_lectura', 'prestamos',
+]
+
+
+def libros_exportables(usuario):
+    """Libros de ``usuario`` con su reseña y sus préstamos, leídos por trozos"""
+    return usuario.libros.select_related('resena').prefetch_related('prestamos').order_by(
+        'fecha_agregado', 'id'
+    ).iterator(chunk_size=TAMANO_TROZO)
+
+
+def nombre_fichero(usuario, formato):
+    return 'biblioteca-{}-{}.{}'.format(
+        usuario.username, timezone.localdate().isoformat(), FORMATOS[formato][1]
+    )
+
+
+def _fecha(valor):
+    return valor.isoformat() if valor else None
+
+
+def _resena(libro):
+    resena = getattr(libro, 'resena', None)
+    if resena is None:
+        return None
+    return {
+        'puntuacion': resena.puntuacion,
+        'comentario': resena.comentario,
+        'fecha_lectura': _fecha(resena.fecha_lectura),
+    }
+
+
+def _prestamos(libro):
+    return [
+        {
+            'nombre_prestatario': prestamo.nombre_prestatario,
+            'fecha_prestamo': _fecha(prestamo.fecha_prestamo),
+            'fecha_devolucion_esperada': _fecha(prestamo.fecha_devolucion_esperada),
+            'fecha_devolucion_real': _fecha(prestamo.fecha_devolucion_real),
+            'notas': prestamo.notas,
+        }
+        for prestamo in libro.prestamos.all()
+    ]
+
+
+def _en_bloques(lineas):
+    """Agrupa las líneas para no enviar cada una en una escritura aparte"""
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque)
+            bloque.clear()
+    if bloque:
+        yield ''.join(bloque)
+
+
+# ====== CSV ======
+
+def _lineas_csv(libros):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def linea(fila):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerow(fila)
+        return buffer.getvalue()
+
+    yield linea(COLUMNAS_CSV)
+    for libro in libros:
+        resena = _resena(libro) or {}
+        prestamos = _prestamos(libro)
+        yield linea(
+            [getattr(libro, campo) for campo in CAMPOS] + [
+                _fecha(libro.fecha_agregado),
+                resena.get('puntuacion'),
+                resena.get('comentario'),
+                resena.get('fecha_lectura'),
+                json.dumps(prestamos, ensure_ascii=False) if prestamos else '',
+            ]
+        )
+
+
+# ====== JSON LINES ======
+
+def _lineas_jsonl(libros):
+    for libro in libros:
+        objeto = {campo: getattr(libro, campo) for campo in CAMPOS}
+        objeto['fecha_agregado'] = _fecha(libro.fecha_agregado)
+        objeto['resena'] = _resena(libro)
+        objeto['prestamos'] = _prestamos(libro)
+        yield json.dumps(objeto, ensure_ascii=False) + '\n'
+
+
+# ====== MARC ======
+
+def _subcampo(codigo, valor):
+    # '$' separa subcampos en el formato legible: se escapa como en MarcEdit
+    return '${}{}'.format(codigo, str(valor).replace('$', '{dollar}'))
+
+
+def _registro_marc(libro):
+    campos = [
+        '=LDR  00000nam a2200000 a 4500',
+        f'=001  {libro.pk}',
+        '=005  {}'.format(timezone.localtime(libro.fecha_modificado).strftime('%Y%m%d%H%M%S.0')),
+    ]
+    if libro.isbn:
+        campos.append('=020  \\\\' + _subcampo('a', libro.isbn))
+    campos.append('=100  1\\' + _subcampo('a', libro.autor))
+    campos.append('=245  10' + _subcampo('a', libro.titulo))
+    if libro.editorial or libro.año_publicacion:
+        campos.append('=264  \\1' + ''.join(
+            _subcampo(codigo, valor)
+            for codigo, valor in (('b', libro.editorial), ('c', libro.año_publicacion))
+            if valor
+        ))
+    if libro.numero_paginas:
+        campos.append('=300  \\\\' + _subcampo('a', f'{libro.numero_paginas} p.'))
+    if libro.descripcion:
+        campos.append('=520  \\\\' + _subcampo('a', ' '.join(libro.descripcion.split())))
+    # Campos locales (59X): estado, formato, reseña y préstamos
+    campos.append('=590  \\\\' + _subcampo('a', f'{libro.get_estado_display()}. {libro.get_formato_display()}.'))
+    resena = _resena(libro)
+    if resena:
+        campos.append('=591  \\\\' + _subcampo('a', f'{resena["puntuacion"]}/5') + (
+            _subcampo('b', ' '.join(resena['comentario'].split())) if resena['comentario'] else ''
+        ))
+    for prestamo in _prestamos(libro):
+        campos.append('=592  \\\\' + ''.join(
+            _subcampo(codigo, prestamo[clave])
+            for codigo, clave in (
+                ('a', 'nombre_prestatario'),
+                ('b', 'fecha_prestamo'),
+                ('c', 'fecha_devolucion_real'),
+            )
+            if prestamo[clave]
+        ))
+    return '\n'.join(campos) + '\n\n'
+
+
+def _lineas_marc(libros):
+    for libro in libros:
+        yield _registro_marc(libro)
+
+
+GENERADORES = {
+    'csv': _lineas_csv,
+    'jsonl': _lineas_jsonl,
+    'marc': _lineas_marc,
+}
+
+
+def exportar(usuario, formato):
+    """Generador con el contenido del fichero de exportación, por bloques"""
+    return _en_bloques(GENERADORES[formato](libros_exportables(usuario)))
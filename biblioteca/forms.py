@@ -1,8 +1,16 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from .busqueda import normalizar_isbn
 from .models import Usuario, Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto
 
 
+def validar_isbn(isbn):
+    """Admite un ISBN-10 (con X como dígito de control) o un ISBN-13"""
+    if isbn and not normalizar_isbn(isbn):
+        raise forms.ValidationError('Introduce un ISBN de 10 o 13 dígitos.', code='invalid')
+    return isbn
+
+
 class RegistroForm(UserCreationForm):
     """Formulario de registro de usuario"""
     email = forms.EmailField(required=True, label='Email')
@@ -79,6 +87,9 @@ class LibroForm(forms.ModelForm):
             'formato': forms.Select(attrs={'class': 'form-control', 'required': True}),
         }
 
+    def clean_isbn(self):
+        return validar_isbn(self.cleaned_data['isbn'])
+
 
 class ResenaForm(forms.ModelForm):
     """Formulario para añadir/editar reseñas"""
@@ -134,6 +145,9 @@ class ListaDeseosForm(forms.ModelForm):
             'prioridad': forms.Select(attrs={'class': 'form-control'}),
         }
 
+    def clean_isbn(self):
+        return validar_isbn(self.cleaned_data['isbn'])
+
 
 class SolicitudContactoForm(forms.ModelForm):
     """Formulario para enviar solicitudes de contacto"""
@@ -151,11 +165,46 @@ class SolicitudContactoForm(forms.ModelForm):
 
 class BusquedaLibroForm(forms.Form):
     """Formulario para búsqueda de libros"""
+    MODOS = [
+        ('texto', 'Texto completo'),
+        ('aproximada', 'Aproximada (tolera erratas)'),
+    ]
+    
     query = forms.CharField(
         max_length=200,
         required=False,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Buscar por título, ISBN o autor...'
+            'placeholder': 'Buscar por título, autor, editorial, ISBN...'
+        })
+    )
+    modo = forms.ChoiceField(
+        choices=MODOS,
+        required=False,
+        label='Modo de búsqueda',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+
+class ImportarLibrosForm(forms.Form):
+    """Formulario para importar libros desde un fichero"""
+    FORMATOS = [
+        ('auto', 'Detectar por la extensión'),
+        ('csv', 'CSV (incluida la exportación de Goodreads)'),
+        ('json', 'JSON o JSON Lines'),
+    ]
+    
+    archivo = forms.FileField(
+        label='Archivo',
+        help_text='CSV con columnas titulo, autor, isbn... o la exportación CSV de Goodreads',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.json,.jsonl,.ndjson,text/csv,application/json',
         })
     )
+    formato = forms.ChoiceField(
+        choices=FORMATOS,
+        initial='auto',
+        label='Formato',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
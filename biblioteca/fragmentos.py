@@ -0,0 +1,59 @@
+"""
+Caché de fragmentos HTML de las tarjetas de libro.
+
+Cada tarjeta se guarda ya renderizada en la caché ``fragmentos`` con una
+clave que incluye ``fecha_modificado``: cualquier ``save()`` del libro
+(``auto_now``) cambia la clave, así que no hace falta invalidar nada a
+mano y las entradas antiguas simplemente caducan. Para descartar todas
+las tarjetas tras cambiar su plantilla basta con subir ``VERSION`` en la
+configuración de la caché.
+"""
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .metricas import contar_cache
+
+
+ALIAS_CACHE = 'fragmentos'
+PLANTILLA_TARJETA = 'biblioteca/parciales/tarjeta_libro.html'
+
+
+def clave_tarjeta(libro, version, es_propietario):
+    """Clave de la tarjeta de ``libro`` para una versión de la interfaz"""
+    return 'tarjeta:{}:{}:{}:{}'.format(
+        libro.pk,
+        int(libro.fecha_modificado.timestamp() * 1_000_000),
+        version or 'normal',
+        int(bool(es_propietario)),
+    )
+
+
+def tarjetas(request, libros, es_propietario=False):
+    """
+    Devuelve ``[(libro, html)]`` para los libros de una página. Las
+    tarjetas cacheadas se recuperan con un solo ``get_many`` y solo se
+    renderizan (y guardan con ``set_many``) las que faltan.
+    """
+    cache = caches[ALIAS_CACHE]
+    version = request.session.get('version', 'normal')
+    claves = [clave_tarjeta(libro, version, es_propietario) for libro in libros]
+    cacheadas = cache.get_many(claves)
+    contar_cache(ALIAS_CACHE, len(cacheadas), len(claves) - len(cacheadas))
+
+    resultado = []
+    nuevas = {}
+    for libro, clave in zip(libros, claves):
+        html = cacheadas.get(clave)
+        if html is None:
+            html = render_to_string(
+                PLANTILLA_TARJETA,
+                {'libro': libro, 'es_propietario': es_propietario},
+                request=request,
+            )
+            nuevas[clave] = html
+        resultado.append((libro, mark_safe(html)))
+
+    if nuevas:
+        cache.set_many(nuevas)
+    return resultado
@@ -0,0 +1,276 @@
+"""
+Importación masiva de libros desde ficheros CSV o JSON.
+
+El fichero se lee fila a fila (nunca entero en memoria) y cada fila se
+valida con las reglas de ``LibroForm``. Los libros válidos que no están
+ya en la biblioteca del usuario (mismo ISBN, o mismo título y autor) se
+insertan por lotes con ``bulk_create``, cada lote en su transacción.
+
+Formatos admitidos:
+
+- CSV con los nombres de campo de ``Libro`` (``titulo``, ``autor``,
+  ``isbn``...) o sus equivalentes en inglés.
+- La exportación CSV de Goodreads (se detecta por sus columnas).
+- JSON: un array de objetos o un objeto por línea (JSON Lines), con las
+  mismas claves que el CSV.
+"""
+import csv
+import io
+import json
+import re
+
+from django.db import transaction
+
+from .busqueda import normalizar, normalizar_isbn
+from .forms import LibroForm
+from .models import Libro
+
+
+TAMANO_LOTE = 500
+
+CAMPOS = ['titulo', 'autor', 'isbn', 'editorial', 'año_publicacion', 'descripcion',
+          'numero_paginas', 'estado', 'formato']
+
+# Nombres alternativos de columna -> campo de Libro
+ALIAS = {
+    'title': 'titulo',
+    'título': 'titulo',
+    'author': 'autor',
+    'isbn13': 'isbn',
+    'publisher': 'editorial',
+    'year': 'año_publicacion',
+    'ano_publicacion': 'año_publicacion',
+    'anio_publicacion': 'año_publicacion',
+    'description': 'descripcion',
+    'descripción': 'descripcion',
+    'pages': 'numero_paginas',
+    'paginas': 'numero_paginas',
+}
+
+# Columnas de la exportación de Goodreads
+GOODREADS = {
+    'Title': 'titulo',
+    'Author': 'autor',
+    'Publisher': 'editorial',
+    'Number of Pages': 'numero_paginas',
+}
+ENCUADERNACIONES_GOODREADS = {
+    'hardcover': 'tapa_dura',
+    'paperback': 'tapa_blanda',
+    'mass market paperback': 'bolsillo',
+    'kindle edition': 'ebook',
+    'ebook': 'ebook',
+    'audiobook': 'audiolibro',
+    'audible audio': 'audiolibro',
+    'audio cd': 'audiolibro',
+}
+
+# Goodreads exporta los ISBN como fórmulas de hoja de cálculo: ="8437604575"
+_FORMULA = re.compile(r'^="?(.*?)"?$')
+_NO_ISBN = re.compile(r'[^0-9Xx]+')
+
+# Tope del búfer del lector JSON: un objeto más grande se considera un error
+MAX_OBJETO_JSON = 1024 * 1024
+
+
+class ErrorImportacion(ValueError):
+    """El fichero no se puede leer en el formato indicado"""
+
+
+class ResultadoImportacion:
+    """Recuento de la importación y errores por fila"""
+
+    # Solo se guardan los primeros errores; el resto se cuenta
+    MAX_ERRORES = 200
+
+    def __init__(self):
+        self.leidas = 0
+        self.creados = 0
+        self.duplicados = 0
+        self.num_errores = 0
+        self.errores = []
+
+    def error(self, fila, mensaje):
+        self.num_errores += 1
+        if len(self.errores) < self.MAX_ERRORES:
+            self.errores.append((fila, mensaje))
+
+    @property
+    def errores_omitidos(self):
+        return self.num_errores - len(self.errores)
+
+
+# ====== LECTURA ======
+
+def abrir_texto(binario):
+    """Envuelve un fichero binario (p. ej. una subida) para leerlo como UTF-8"""
+    return io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+
+
+def detectar_formato(formato, nombre):
+    if formato != 'auto':
+        return formato
+    if nombre.lower().endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    return 'csv'
+
+
+def filas_csv(texto):
+    """``(número de línea, dict)`` de cada fila; detecta la exportación de Goodreads"""
+    lector = csv.DictReader(texto)
+    try:
+        columnas = lector.fieldnames or []
+    except csv.Error as exc:
+        raise ErrorImportacion(f'CSV no válido: {exc}') from exc
+    goodreads = 'Book Id' in columnas and 'Title' in columnas
+    try:
+        for fila in lector:
+            yield lector.line_num, (_mapear_goodreads(fila) if goodreads else _mapear(fila))
+    except csv.Error as exc:
+        raise ErrorImportacion(f'CSV no válido en la línea {lector.line_num}: {exc}') from exc
+
+
+def filas_json(texto, tamano=64 * 1024):
+    """
+    ``(número de objeto, dict)`` de un array JSON o de JSON Lines, leyendo
+    el texto por trozos y decodificando un objeto cada vez.
+    """
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    agotado = False
+    numero = 0
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if not buffer:
+            if agotado:
+                return
+            trozo = texto.read(tamano)
+            agotado = not trozo
+            buffer = trozo
+            continue
+        try:
+            objeto, fin = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError as exc:
+            # Objeto incompleto: se lee otro trozo
+            trozo = '' if agotado else texto.read(tamano)
+            if not trozo or len(buffer) > MAX_OBJETO_JSON:
+                raise ErrorImportacion(f'JSON no válido tras el objeto {numero}: {exc.msg}') from exc
+            buffer += trozo
+            continue
+        numero += 1
+        buffer = buffer[fin:]
+        yield numero, _mapear(objeto) if isinstance(objeto, dict) else None
+
+
+def _mapear(fila):
+    datos = {}
+    for columna, valor in fila.items():
+        if columna is None:
+            continue
+        clave = columna.strip().lower()
+        campo = ALIAS.get(clave, clave)
+        if campo in CAMPOS and valor not in (None, ''):
+            datos[campo] = str(valor).strip()
+    return datos
+
+
+def _mapear_goodreads(fila):
+    datos = {campo: fila[columna].strip() for columna, campo in GOODREADS.items() if fila.get(columna)}
+    isbn = _FORMULA.sub(r'\1', fila.get('ISBN13') or '') or _FORMULA.sub(r'\1', fila.get('ISBN') or '')
+    if isbn:
+        datos['isbn'] = isbn
+    año = fila.get('Original Publication Year') or fila.get('Year Published')
+    if año:
+        datos['año_publicacion'] = año.strip()
+    formato = ENCUADERNACIONES_GOODREADS.get((fila.get('Binding') or '').strip().lower())
+    if formato:
+        datos['formato'] = formato
+    return datos
+
+
+# ====== VALIDACIÓN E INSERCIÓN ======
+
+def _opciones(campo):
+    """Acepta tanto la clave como la etiqueta de las opciones ('Tapa Dura')"""
+    return {normalizar(etiqueta): clave for clave, etiqueta in Libro._meta.get_field(campo).choices}
+
+
+def _preparar(datos, opciones):
+    if 'isbn' in datos:
+        datos['isbn'] = _NO_ISBN.sub('', datos['isbn']).upper()
+    for campo in ('estado', 'formato'):
+        valor = datos.get(campo)
+        if valor is None:
+            datos[campo] = Libro._meta.get_field(campo).default
+        else:
+            datos[campo] = opciones[campo].get(normalizar(valor), valor)
+    return datos
+
+
+def importar(usuario, texto, formato='csv', lote=TAMANO_LOTE, progreso=None):
+    """
+    Importa en la biblioteca de ``usuario`` los libros del fichero de
+    texto ``texto``. ``progreso(resultado)`` se llama tras cada lote.
+    Devuelve un ``ResultadoImportacion``.
+    """
+    resultado = ResultadoImportacion()
+    filas = filas_json(texto) if formato == 'json' else filas_csv(texto)
+    opciones = {campo: _opciones(campo) for campo in ('estado', 'formato')}
+
+    # Claves de los libros que ya tiene el usuario
+    isbns = set()
+    titulos = set()
+    for isbn, titulo, autor in Libro.objects.filter(propietario=usuario).values_list(
+        'isbn', 'titulo_normalizado', 'autor_normalizado'
+    ).iterator(chunk_size=5000):
+        if isbn:
+            isbns.add(normalizar_isbn(isbn))
+        titulos.add((titulo, autor))
+
+    pendientes = []
+
+    def guardar():
+        with transaction.atomic():
+            Libro.objects.bulk_create(pendientes)
+        resultado.creados += len(pendientes)
+        pendientes.clear()
+        if progreso:
+            progreso(resultado)
+
+    for numero, datos in filas:
+        resultado.leidas += 1
+        if datos is None:
+            resultado.error(numero, 'La fila no es un objeto JSON')
+            continue
+
+        form = LibroForm(data=_preparar(datos, opciones))
+        if not form.is_valid():
+            resultado.error(numero, '; '.join(
+                f'{form.fields[campo].label if campo in form.fields else campo}: {" ".join(mensajes)}'
+                for campo, mensajes in form.errors.items()
+            ))
+            continue
+
+        libro = form.save(commit=False)
+        libro.propietario = usuario
+        clave_isbn = normalizar_isbn(libro.isbn)
+        clave_titulo = (normalizar(libro.titulo), normalizar(libro.autor))
+        # Con ISBN solo cuenta el ISBN: otra edición del mismo título no es un duplicado
+        if clave_isbn:
+            duplicado = clave_isbn in isbns
+        else:
+            duplicado = clave_titulo in titulos
+        if duplicado:
+            resultado.duplicados += 1
+            continue
+        if clave_isbn:
+            isbns.add(clave_isbn)
+        titulos.add(clave_titulo)
+
+        pendientes.append(libro)
+        if len(pendientes) >= lote:
+            guardar()
+
+    if pendientes:
+        guardar()
+    return resultado
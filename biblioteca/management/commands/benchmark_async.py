@@ -0,0 +1,390 @@
+import asyncio
+import http.client
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from biblioteca.models import Libro, Usuario
+
+from .query_budget import Command as QueryBudgetCommand
+
+
+# Una subida lenta manda TROZOS_SUBIDA trozos de TAMANO_TROZO bytes
+TROZOS_SUBIDA = 16
+TAMANO_TROZO = 4096
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) de una lista ya ordenada"""
+    indice = min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+class Resultado:
+    """Latencias y errores de una tanda de peticiones"""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.latencias = []
+        self.errores = 0
+        self.segundos = 0
+        self.subidas = 0
+
+    @property
+    def por_segundo(self):
+        return len(self.latencias) / self.segundos if self.segundos else 0
+
+    def fila(self):
+        ms = sorted(latencia * 1000 for latencia in self.latencias)
+        return '{:<6} {:>10} {:>7.1f} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.1f} {:>7} {:>7}'.format(
+            self.nombre, len(ms), self.por_segundo, statistics.median(ms),
+            percentil(ms, 95), percentil(ms, 99), ms[-1], self.errores, self.subidas,
+        )
+
+
+async def cargar(transporte, urls, peticiones, concurrencia, subidas=0, segundos_subida=0):
+    """
+    Lanza ``peticiones`` GET repartidos entre ``concurrencia`` clientes
+    que piden las ``urls`` en rueda. La latencia se mide desde que el
+    cliente hace la petición, así que incluye el tiempo en cola. Mientras
+    tanto, ``subidas`` clientes más envían formularios que tardan
+    ``segundos_subida`` en llegar, como quien sube una portada con mala
+    conexión; sus peticiones no se cuentan en las latencias.
+    """
+    resultado = Resultado(transporte.nombre)
+    pendientes = iter(range(peticiones))
+    terminado = False
+
+    async def cliente():
+        for n in pendientes:
+            inicio = time.perf_counter()
+            try:
+                estado = await transporte.peticion(urls[n % len(urls)])
+            except Exception:
+                estado = None
+            resultado.latencias.append(time.perf_counter() - inicio)
+            if estado is None or estado >= 400:
+                resultado.errores += 1
+
+    async def cliente_lento():
+        while not terminado:
+            await transporte.subida(reverse('mapa_web'), segundos_subida)
+            resultado.subidas += 1
+
+    lentos = [asyncio.ensure_future(cliente_lento()) for _ in range(subidas)]
+    if lentos:
+        # Que las subidas ocupen el servidor antes de medir
+        await asyncio.sleep(min(segundos_subida / 4, 0.5))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    resultado.segundos = time.perf_counter() - inicio
+    terminado = True
+    await asyncio.gather(*lentos)
+    return resultado
+
+
+class Transporte:
+    """
+    Forma de servir las peticiones. ``cookie`` lleva la sesión y el
+    token CSRF con el que las subidas lentas pasan la validación.
+    """
+
+    def __init__(self, nombre, cookie, csrf):
+        self.nombre = nombre
+        self.cookie = cookie
+        self.csrf = csrf
+
+    def cuerpo_subida(self):
+        # El token va al final: el middleware CSRF tiene que leer todo el cuerpo
+        relleno = b'x' * (TROZOS_SUBIDA * TAMANO_TROZO)
+        return b'relleno=' + relleno + b'&csrfmiddlewaretoken=' + self.csrf.encode()
+
+    def cerrar(self):
+        pass
+
+
+# ====== EN PROCESO ======
+
+class EntradaLenta(io.RawIOBase):
+    """``wsgi.input`` que entrega el cuerpo poco a poco, como un socket lento"""
+
+    def __init__(self, datos, segundos):
+        self.datos = io.BytesIO(datos)
+        self.pausa = segundos / TROZOS_SUBIDA
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        leidos = self.datos.readinto(buffer)
+        # El servidor síncrono espera en el hilo hasta tener los bytes pedidos
+        time.sleep(self.pausa * -(-leidos // TAMANO_TROZO))
+        return leidos
+
+
+class TransporteWSGI(Transporte):
+    """Handler WSGI servido desde ``hilos`` hilos, como workers síncronos"""
+
+    def __init__(self, aplicacion, cookie, csrf, hilos):
+        super().__init__('wsgi', cookie, csrf)
+        self.aplicacion = aplicacion
+        self.executor = ThreadPoolExecutor(hilos)
+
+    def _llamar(self, metodo, url, cuerpo=b'', segundos=0):
+        ruta, _, consulta = url.partition('?')
+        environ = {
+            'REQUEST_METHOD': metodo,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': ruta,
+            'QUERY_STRING': consulta,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': self.cookie,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(cuerpo)),
+            'wsgi.input': EntradaLenta(cuerpo, segundos) if segundos else io.BytesIO(cuerpo),
+            'wsgi.url_scheme': 'http',
+        }
+        estado = []
+        respuesta = self.aplicacion(environ, lambda linea, cabeceras, exc_info=None: estado.append(linea))
+        try:
+            b''.join(respuesta)
+        finally:
+            respuesta.close()
+        return int(estado[0].split()[0])
+
+    async def peticion(self, url):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._llamar, 'GET', url)
+
+    async def subida(self, url, segundos):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._llamar, 'POST', url, self.cuerpo_subida(), segundos,
+        )
+
+    def cerrar(self):
+        self.executor.shutdown()
+
+
+class TransporteASGI(Transporte):
+    """Handler ASGI servido en el bucle de eventos actual"""
+
+    def __init__(self, aplicacion, cookie, csrf):
+        super().__init__('asgi', cookie, csrf)
+        self.aplicacion = aplicacion
+
+    async def _llamar(self, metodo, url, cuerpo=b'', segundos=0):
+        ruta, _, consulta = url.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': metodo,
+            'scheme': 'http',
+            'path': ruta,
+            'raw_path': ruta.encode(),
+            'query_string': consulta.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', self.cookie.encode()),
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(cuerpo)).encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        trozos = [cuerpo[i:i + TAMANO_TROZO] for i in range(0, len(cuerpo), TAMANO_TROZO)] or [b'']
+        estado = None
+
+        async def recibir():
+            if trozos:
+                if segundos:
+                    await asyncio.sleep(segundos / TROZOS_SUBIDA)
+                return {'type': 'http.request', 'body': trozos.pop(0), 'more_body': bool(trozos)}
+            # El cliente no se desconecta: Django cancela la espera al responder
+            await asyncio.Event().wait()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje['type'] == 'http.response.start':
+                estado = mensaje['status']
+
+        await self.aplicacion(scope, recibir, enviar)
+        return estado
+
+    async def peticion(self, url):
+        return await self._llamar('GET', url)
+
+    async def subida(self, url, segundos):
+        return await self._llamar('POST', url, self.cuerpo_subida(), segundos)
+
+
+# ====== HTTP ======
+
+class TransporteHTTP(Transporte):
+    """Servidor ya arrancado, con una conexión persistente por hilo cliente"""
+
+    def __init__(self, nombre, base, cookie, csrf, hilos):
+        super().__init__(nombre, cookie, csrf)
+        partes = urlsplit(base)
+        self.clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.servidor = partes.netloc
+        self.prefijo = partes.path.rstrip('/')
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(hilos)
+
+    def _llamar(self, metodo, url, cuerpo=b'', segundos=0):
+        if not hasattr(self.local, 'conexion'):
+            self.local.conexion = self.clase(self.servidor, timeout=60)
+        conexion = self.local.conexion
+        try:
+            conexion.putrequest(metodo, self.prefijo + url)
+            conexion.putheader('Cookie', self.cookie)
+            if metodo == 'POST':
+                conexion.putheader('Content-Type', 'application/x-www-form-urlencoded')
+                conexion.putheader('Content-Length', str(len(cuerpo)))
+            conexion.endheaders()
+            for i in range(0, len(cuerpo), TAMANO_TROZO):
+                time.sleep(segundos / TROZOS_SUBIDA)
+                conexion.send(cuerpo[i:i + TAMANO_TROZO])
+            respuesta = conexion.getresponse()
+            respuesta.read()
+        except (OSError, http.client.HTTPException):
+            conexion.close()
+            del self.local.conexion
+            raise
+        return respuesta.status
+
+    async def peticion(self, url):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._llamar, 'GET', url)
+
+    async def subida(self, url, segundos):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._llamar, 'POST', url, self.cuerpo_subida(), segundos,
+        )
+
+    def cerrar(self):
+        self.executor.shutdown()
+
+
+class Command(QueryBudgetCommand):
+    help = (
+        'Compara peticiones por segundo y latencias (p50/p95/p99) de las vistas '
+        'de lectura servidas de forma síncrona (WSGI) y asíncrona (ASGI) con '
+        'varios clientes concurrentes y, opcionalmente, subidas lentas. Sin '
+        '--wsgi/--asgi usa los handlers en proceso sobre una base de datos de '
+        'prueba; con ellos, pide por HTTP a servidores ya arrancados'
+    )
+    mensaje_fallo = '{} peticiones fallaron'
+    mensaje_exito = 'Sin errores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones por modo')
+        parser.add_argument('--concurrencia', type=int, default=50, help='Clientes simultáneos')
+        parser.add_argument(
+            '--hilos', type=int, default=3,
+            help='Hilos del handler WSGI en proceso (los workers síncronos de gunicorn)',
+        )
+        parser.add_argument('--subidas-lentas', type=int, default=0, help='Clientes que suben formularios lentos')
+        parser.add_argument('--segundos-subida', type=float, default=2.0, help='Duración de cada subida lenta')
+        parser.add_argument('--usuarios', type=int, default=20, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=200, help='Libros de cada bibliotecario')
+        parser.add_argument('--wsgi', metavar='URL', help='Servidor WSGI, p. ej. http://127.0.0.1:8001')
+        parser.add_argument('--asgi', metavar='URL', help='Servidor ASGI, p. ej. http://127.0.0.1:8002')
+        parser.add_argument('--usuario', help='Usuario con el que se piden las páginas (modo HTTP)')
+
+    def handle(self, *args, **options):
+        if not (options['wsgi'] or options['asgi']):
+            # En proceso: base de datos de prueba de query_budget
+            return super().handle(*args, **options)
+
+        if not options['usuario']:
+            raise CommandError('En modo HTTP hace falta --usuario')
+        try:
+            usuario = Usuario.objects.get(username=options['usuario'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["usuario"]}')
+        urls, cookie, csrf = self.preparar(usuario)
+
+        hilos = options['concurrencia'] + options['subidas_lentas']
+        self.comparar([
+            TransporteHTTP(nombre, options[nombre], cookie, csrf, hilos)
+            for nombre in ('wsgi', 'asgi') if options[nombre]
+        ], urls, options)
+
+    def medir(self, datos, options):
+        from bibliandria.asgi import application as asgi
+        from bibliandria.wsgi import application as wsgi
+
+        usuarios = datos['usuarios']
+        urls, cookie, csrf = self.preparar(usuarios['lector'], usuarios['propietario'])
+        resultados = self.comparar([
+            TransporteWSGI(wsgi, cookie, csrf, options['hilos']),
+            TransporteASGI(asgi, cookie, csrf),
+        ], urls, options)
+        return sum(resultado.errores for resultado in resultados)
+
+    def preparar(self, usuario, propietario=None):
+        """URLs de las vistas de lectura, cookies de ``usuario`` y token CSRF"""
+        if propietario is None:
+            propietario = Usuario.objects.filter(
+                biblioteca_publica=True, rol='bibliotecario', num_libros__gt=0,
+            ).exclude(pk=usuario.pk).first() or usuario
+        libro = Libro.objects.filter(propietario=propietario).order_by('-fecha_agregado', '-id').first()
+        if libro is None:
+            raise CommandError(f'{propietario.username} no tiene libros')
+
+        biblioteca = reverse('ver_biblioteca', kwargs={'username': propietario.username})
+        urls = [
+            reverse('home'),
+            reverse('bibliotecas_publicas'),
+            biblioteca,
+            biblioteca + '?query=novela',
+            reverse('libro_detalle', kwargs={'pk': libro.pk}),
+            reverse('mapa_web'),
+        ]
+
+        cliente = Client()
+        cliente.force_login(usuario)
+        csrf = get_random_string(32)
+        cookies = {nombre: morsel.value for nombre, morsel in cliente.cookies.items()}
+        cookies[settings.CSRF_COOKIE_NAME] = csrf
+        return urls, '; '.join(f'{nombre}={valor}' for nombre, valor in cookies.items()), csrf
+
+    def comparar(self, transportes, urls, options):
+        async def tanda(transporte):
+            # Calentamiento: plantillas, caché de tarjetas y conexiones
+            await cargar(transporte, urls, len(urls) * 2, 1)
+            return await cargar(
+                transporte, urls, options['peticiones'], options['concurrencia'],
+                options['subidas_lentas'], options['segundos_subida'],
+            )
+
+        resultados = []
+        for transporte in transportes:
+            try:
+                resultados.append(asyncio.run(tanda(transporte)))
+            finally:
+                transporte.cerrar()
+
+        self.stdout.write(
+            f'{options["peticiones"]} peticiones por modo, {options["concurrencia"]} clientes '
+            f'simultáneos, {options["subidas_lentas"]} subidas lentas de {options["segundos_subida"]:g} s\n'
+        )
+        self.stdout.write('{:<6} {:>10} {:>7} {:>8} {:>8} {:>8} {:>8} {:>7} {:>7}'.format(
+            'modo', 'peticiones', 'pet/s', 'p50 ms', 'p95 ms', 'p99 ms', 'máx ms', 'errores', 'subidas',
+        ))
+        for resultado in resultados:
+            self.stdout.write(resultado.fila())
+        return resultados
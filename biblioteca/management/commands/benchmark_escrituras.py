@@ -0,0 +1,175 @@
+import multiprocessing
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+
+from biblioteca import escrituras
+from biblioteca.models import SolicitudContacto
+
+from .benchmark_async import percentil
+from .benchmark_sqlite import Command as BenchmarkSqliteCommand, configurar, trabajador
+
+
+def solicitud(datos, n):
+    return SolicitudContacto(
+        visitante_id=datos['lector_id'], bibliotecario_id=datos['propietario_id'],
+        libro_id=datos['libro_id'], mensaje=f'Solicitud de carga {n}',
+    )
+
+
+def escribir_directa(datos, n):
+    solicitud(datos, n).save()
+
+
+def escribir_diferida(datos, n):
+    escrituras.guardar_solicitud(solicitud(datos, n))
+
+
+MODOS = {
+    'directas': escribir_directa,
+    'diferidas': escribir_diferida,
+}
+
+
+def escritor(ruta, intervalo, lote, parar, cola):
+    """Proceso hijo con el bucle de ``procesar_escrituras``"""
+    configurar('despues', ruta)
+    lotes = 0
+    while True:
+        escrituras.latido()
+        try:
+            aplicadas = escrituras.aplicar_pendientes(lote)
+        except OperationalError:
+            aplicadas = 0
+        lotes += bool(aplicadas)
+        if not aplicadas and parar.is_set():
+            break
+        if aplicadas < lote:
+            time.sleep(intervalo)
+    connection.close()
+    cola.put(lotes)
+
+
+class Command(BenchmarkSqliteCommand):
+    help = (
+        'Mide escrituras por segundo de solicitudes de contacto con N procesos '
+        'concurrentes, guardadas directamente o diferidas a procesar_escrituras '
+        '(una transacción por intervalo), sobre SQLite en modo WAL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help='Procesos que escriben')
+        parser.add_argument('--segundos', type=float, default=5, help='Duración de cada modo')
+        parser.add_argument('--intervalo', type=float, default=0.2, help='Intervalo de procesar_escrituras')
+        parser.add_argument('--lote', type=int, default=500, help='Escrituras máximas por transacción')
+        parser.add_argument('--usuarios', type=int, default=5, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=50, help='Libros de cada bibliotecario')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este benchmark solo tiene sentido con SQLite')
+
+        directorio = Path(tempfile.mkdtemp(prefix='benchmark-escrituras-'))
+        original = dict(connection.settings_dict)
+        cola_original = getattr(settings, 'COLA_ESCRITURAS', None)
+        try:
+            datos = self.crear_plantilla(directorio / 'plantilla.sqlite3', options)
+            resultados = {}
+            for modo, operacion in MODOS.items():
+                ruta = directorio / f'{modo}.sqlite3'
+                shutil.copy(directorio / 'plantilla.sqlite3', ruta)
+                with sqlite3.connect(ruta) as conexion:
+                    conexion.execute('PRAGMA journal_mode = wal')
+                # Sin escritor activo, las diferidas también se escriben directamente
+                settings.COLA_ESCRITURAS = directorio / f'cola-{modo}'
+                resultados[modo] = self.ejecutar_modo(modo, operacion, str(ruta), datos, options)
+        finally:
+            settings.COLA_ESCRITURAS = cola_original
+            connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self.informe(resultados, options)
+
+    def ejecutar_modo(self, modo, operacion, ruta, datos, options):
+        contexto = multiprocessing.get_context('fork')
+        cola = contexto.Queue()
+        arranque = contexto.Event()
+        parar = contexto.Event()
+
+        proceso_escritor = None
+        if modo == 'diferidas':
+            cola_escritor = contexto.Queue()
+            proceso_escritor = contexto.Process(
+                target=escritor, args=(ruta, options['intervalo'], options['lote'], parar, cola_escritor),
+            )
+            proceso_escritor.start()
+            while not escrituras.escritor_activo():
+                time.sleep(0.05)
+
+        salida = time.time() + options['segundos'] + 1
+        procesos = [
+            contexto.Process(
+                target=trabajador,
+                args=('despues', ruta, modo, operacion, datos, salida, cola, arranque),
+            )
+            for _ in range(options['escritores'])
+        ]
+        for proceso in procesos:
+            proceso.start()
+        time.sleep(max(0, salida - options['segundos'] - time.time()))
+        arranque.set()
+
+        latencias = []
+        errores = 0
+        for _ in procesos:
+            _, suyas, suyos_errores = cola.get()
+            latencias.extend(suyas)
+            errores += suyos_errores
+        for proceso in procesos:
+            proceso.join()
+
+        # Tiempo hasta que el escritor aplica lo que queda en la cola
+        inicio = time.perf_counter()
+        lotes = 0
+        if proceso_escritor:
+            parar.set()
+            lotes = cola_escritor.get()
+            proceso_escritor.join()
+        vaciado = time.perf_counter() - inicio
+
+        with sqlite3.connect(ruta) as conexion:
+            filas = conexion.execute(
+                "SELECT COUNT(*) FROM biblioteca_solicitudcontacto WHERE mensaje LIKE 'Solicitud de carga %'"
+            ).fetchone()[0]
+        return {
+            'latencias': latencias,
+            'errores': errores,
+            'vaciado': vaciado,
+            'lotes': lotes,
+            'filas': filas,
+        }
+
+    def informe(self, resultados, options):
+        self.stdout.write(
+            f'{options["escritores"]} procesos escribiendo solicitudes durante {options["segundos"]:g} s, '
+            f'intervalo del escritor {options["intervalo"]:g} s\n'
+        )
+        self.stdout.write('{:<10} {:>8} {:>8} {:>8} {:>8} {:>8} {:>10} {:>6} {:>8}'.format(
+            'modo', 'total', 'esc/s', 'p50 ms', 'p99 ms', 'errores', 'vaciado s', 'lotes', 'filas',
+        ))
+        for modo, resultado in resultados.items():
+            ms = sorted(latencia * 1000 for latencia in resultado['latencias'])
+            self.stdout.write('{:<10} {:>8} {:>8.0f} {:>8.2f} {:>8.1f} {:>8} {:>10.2f} {:>6} {:>8}'.format(
+                modo, len(ms), len(ms) / options['segundos'], statistics.median(ms),
+                percentil(ms, 99), resultado['errores'], resultado['vaciado'],
+                resultado['lotes'], resultado['filas'],
+            ))
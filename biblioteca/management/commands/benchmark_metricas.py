@@ -0,0 +1,120 @@
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from biblioteca import metricas
+
+from .benchmark_async import percentil
+from .query_budget import PRESUPUESTOS, Command as QueryBudgetCommand
+
+
+MIDDLEWARE_METRICAS = 'biblioteca.metricas.MetricasMiddleware'
+
+
+class Command(QueryBudgetCommand):
+    help = (
+        'Mide lo que cuestan las métricas sobre una base de datos de prueba: '
+        'tiempo por petición de las vistas de lectura con y sin '
+        'MetricasMiddleware, tiempo de un volcado y de generar /metrics'
+    )
+    mensaje_fallo = '{} peticiones fallaron'
+    mensaje_exito = 'Medición terminada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones por modo')
+        parser.add_argument('--rondas', type=int, default=5, help='Rondas alternando los dos modos')
+        parser.add_argument('--usuarios', type=int, default=20, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=200, help='Libros de cada bibliotecario')
+
+    def medir(self, datos, options):
+        directorio = Path(tempfile.mkdtemp(prefix='benchmark-metricas-'))
+        try:
+            with override_settings(METRICAS_DB=directorio / 'metricas.sqlite3'):
+                return self.comparar(datos, options)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def comparar(self, datos, options):
+        urls = [
+            reverse('home'),
+            reverse('bibliotecas_publicas'),
+            reverse('ver_biblioteca', kwargs={'username': datos['propietario']}),
+            reverse('libro_detalle', kwargs={'pk': datos['libro']}),
+            reverse('mapa_web'),
+        ]
+        modos = {
+            'sin métricas': [m for m in settings.MIDDLEWARE if m != MIDDLEWARE_METRICAS],
+            'con métricas': settings.MIDDLEWARE,
+        }
+        tiempos = {modo: [] for modo in modos}
+        errores = 0
+        por_ronda = options['peticiones'] // options['rondas']
+
+        # Alternar los modos en rondas reparte el ruido entre los dos
+        for _ in range(options['rondas']):
+            for modo, middleware in modos.items():
+                with override_settings(MIDDLEWARE=middleware):
+                    cliente = Client()
+                    cliente.force_login(datos['usuarios']['lector'])
+                    for url in urls:
+                        cliente.get(url)  # calentamiento
+                    for n in range(por_ronda):
+                        inicio = time.perf_counter()
+                        respuesta = cliente.get(urls[n % len(urls)])
+                        tiempos[modo].append(time.perf_counter() - inicio)
+                        errores += respuesta.status_code != 200
+
+        metricas.colector.volcar()
+        with metricas._cerrojo_conexion:
+            fila = metricas._conexion().execute(
+                "SELECT valor FROM serie WHERE nombre = 'bibliandria_metricas_sobrecarga_segundos_total'"
+            ).fetchone()
+        sobrecarga = fila[0] if fila else 0
+
+        # Un volcado con todas las vistas de biblioteca/urls.py con datos
+        for nombre in {caso[0] for caso in PRESUPUESTOS}:
+            vista = metricas.etiquetas(vista=nombre)
+            for duracion in (0.003, 0.02, 0.2):
+                metricas.colector.observar('bibliandria_peticion_duracion_segundos', vista, duracion)
+            metricas.colector.sumar('bibliandria_peticiones_total', vista + ',estado="2xx"', 3)
+            metricas.colector.sumar('bibliandria_consultas_sql_total', vista, 9)
+        inicio = time.perf_counter()
+        metricas.colector.volcar()
+        volcado = time.perf_counter() - inicio
+
+        cliente = Client()
+        exposicion = []
+        for _ in range(20):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(reverse('metricas'))
+            exposicion.append(time.perf_counter() - inicio)
+        series = sum(1 for linea in respuesta.content.decode().splitlines() if not linea.startswith('#'))
+
+        self.informe(tiempos, sobrecarga, volcado, exposicion, series, options)
+        return errores
+
+    def informe(self, tiempos, sobrecarga, volcado, exposicion, series, options):
+        self.stdout.write(
+            f'{options["peticiones"]} peticiones por modo en {options["rondas"]} rondas alternas\n'
+        )
+        self.stdout.write('{:<14} {:>10} {:>9} {:>8} {:>8}'.format('modo', 'peticiones', 'media ms', 'p50 ms', 'p99 ms'))
+        for modo, valores in tiempos.items():
+            ms = sorted(valor * 1000 for valor in valores)
+            self.stdout.write('{:<14} {:>10} {:>9.3f} {:>8.3f} {:>8.3f}'.format(
+                modo, len(ms), statistics.mean(ms), statistics.median(ms), percentil(ms, 99),
+            ))
+        diferencia = (statistics.mean(tiempos['con métricas']) - statistics.mean(tiempos['sin métricas'])) * 1e6
+        propia = sobrecarga / len(tiempos['con métricas']) * 1e6
+        self.stdout.write(
+            f'\nDiferencia media por petición: {diferencia:.0f} µs'
+            f'\nSobrecarga medida por el propio middleware: {propia:.0f} µs por petición'
+            f' (sin contar el execute_wrapper)'
+            f'\nVolcado de todas las vistas: {volcado * 1000:.2f} ms'
+            f'\n/metrics con {series} series: {statistics.median(exposicion) * 1000:.2f} ms (mediana)\n'
+        )
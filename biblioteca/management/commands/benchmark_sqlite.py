@@ -0,0 +1,199 @@
+import multiprocessing
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection
+
+from biblioteca.models import Libro, SolicitudContacto, Usuario
+
+from .benchmark_async import percentil
+from .query_budget import Command as QueryBudgetCommand
+
+
+# Configuraciones que se comparan: la de Django por defecto y la de settings.py
+MODOS = {
+    'antes': {
+        'journal_mode': 'delete',
+        'pragmas': {},
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+    },
+    'despues': {
+        'journal_mode': 'wal',
+        'pragmas': settings.SQLITE_PRAGMAS,
+        'CONN_MAX_AGE': settings.DATABASES['default'].get('CONN_MAX_AGE', 0) or 600,
+        'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}),
+    },
+}
+
+
+def leer(datos, n):
+    """Lo que consulta ``ver_biblioteca``: el propietario y una página de libros"""
+    usuario = Usuario.objects.get(username=datos['propietario'])
+    list(Libro.objects.filter(propietario=usuario).order_by('-fecha_agregado', '-id')[:24])
+
+
+def escribir(datos, n):
+    """Alterna un libro nuevo (con su contador y el índice FTS) y una solicitud"""
+    if n % 2:
+        Libro.objects.create(
+            propietario_id=datos['propietario_id'], titulo=f'Libro de carga {n}', autor='Autor de carga',
+        )
+    else:
+        SolicitudContacto.objects.create(
+            visitante_id=datos['lector_id'], bibliotecario_id=datos['propietario_id'],
+            libro_id=datos['libro_id'], mensaje=f'Solicitud de carga {n}',
+        )
+
+
+OPERACIONES = {'lectura': leer, 'escritura': escribir}
+
+
+def configurar(modo, ruta):
+    """Apunta la conexión del proceso hijo a ``ruta`` con la configuración de ``modo``"""
+    configuracion = MODOS[modo]
+    connection.settings_dict.update(
+        NAME=ruta,
+        CONN_MAX_AGE=configuracion['CONN_MAX_AGE'],
+        OPTIONS=configuracion['OPTIONS'],
+    )
+    settings.SQLITE_PRAGMAS = configuracion['pragmas']
+
+
+def trabajador(modo, ruta, tipo, operacion, datos, salida, cola, arranque):
+    """
+    Proceso hijo: repite ``operacion(datos, n)`` hasta ``salida`` como si
+    cada una fuera una petición, con las señales que abren y cierran la
+    conexión.
+    """
+    configurar(modo, ruta)
+    latencias = []
+    errores = 0
+    arranque.wait()
+    n = 0
+    while time.time() < salida:
+        n += 1
+        inicio = time.perf_counter()
+        request_started.send(sender=None)
+        try:
+            operacion(datos, n)
+        except OperationalError:
+            # "database is locked"
+            errores += 1
+        finally:
+            request_finished.send(sender=None)
+        latencias.append(time.perf_counter() - inicio)
+    connection.close()
+    cola.put((tipo, latencias, errores))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara lecturas y escrituras por segundo con varios procesos '
+        'concurrentes sobre SQLite con la configuración por defecto de Django '
+        '(diario DELETE, una conexión por petición) y con la de settings.py '
+        '(WAL, PRAGMA y conexiones persistentes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=3, help='Procesos que leen')
+        parser.add_argument('--escritores', type=int, default=3, help='Procesos que escriben')
+        parser.add_argument('--segundos', type=float, default=5, help='Duración de cada modo')
+        parser.add_argument('--usuarios', type=int, default=20, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=200, help='Libros de cada bibliotecario')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este benchmark solo tiene sentido con SQLite')
+
+        directorio = Path(tempfile.mkdtemp(prefix='benchmark-sqlite-'))
+        original = dict(connection.settings_dict)
+        try:
+            datos = self.crear_plantilla(directorio / 'plantilla.sqlite3', options)
+            resultados = {}
+            for modo, configuracion in MODOS.items():
+                ruta = directorio / f'{modo}.sqlite3'
+                shutil.copy(directorio / 'plantilla.sqlite3', ruta)
+                with sqlite3.connect(ruta) as conexion:
+                    conexion.execute(f'PRAGMA journal_mode = {configuracion["journal_mode"]}')
+                resultados[modo] = self.ejecutar(modo, str(ruta), datos, options)
+        finally:
+            connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        self.informe(resultados, options)
+
+    def crear_plantilla(self, ruta, options):
+        """Base de datos migrada y poblada que se copia para cada modo"""
+        connection.close()
+        connection.settings_dict['NAME'] = str(ruta)
+        call_command('migrate', verbosity=0, interactive=False)
+        datos = QueryBudgetCommand().poblar(options['usuarios'], options['libros_por_usuario'])
+        propietario = datos['usuarios']['propietario']
+        datos = {
+            'propietario': propietario.username,
+            'propietario_id': propietario.pk,
+            'lector_id': datos['usuarios']['lector'].pk,
+            'libro_id': datos['libro'],
+        }
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        # Los hijos abren su propia conexión: no deben heredar esta
+        connection.close()
+        return datos
+
+    def ejecutar(self, modo, ruta, datos, options):
+        contexto = multiprocessing.get_context('fork')
+        cola = contexto.Queue()
+        arranque = contexto.Event()
+        salida = time.time() + options['segundos'] + 1
+        tipos = ['lectura'] * options['lectores'] + ['escritura'] * options['escritores']
+        procesos = [
+            contexto.Process(
+                target=trabajador,
+                args=(modo, ruta, tipo, OPERACIONES[tipo], datos, salida, cola, arranque),
+            )
+            for tipo in tipos
+        ]
+        for proceso in procesos:
+            proceso.start()
+        # Un segundo de margen para que arranquen todos antes de medir
+        time.sleep(max(0, salida - options['segundos'] - time.time()))
+        arranque.set()
+
+        resultado = {tipo: {'latencias': [], 'errores': 0} for tipo in OPERACIONES}
+        for _ in procesos:
+            tipo, latencias, errores = cola.get()
+            resultado[tipo]['latencias'].extend(latencias)
+            resultado[tipo]['errores'] += errores
+        for proceso in procesos:
+            proceso.join()
+        return resultado
+
+    def informe(self, resultados, options):
+        self.stdout.write(
+            f'{options["lectores"]} procesos lectores y {options["escritores"]} escritores '
+            f'durante {options["segundos"]:g} s\n'
+        )
+        self.stdout.write('{:<8} {:<10} {:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+            'modo', 'operación', 'total', 'op/s', 'p50 ms', 'p99 ms', 'errores',
+        ))
+        for modo, resultado in resultados.items():
+            for tipo, datos in resultado.items():
+                ms = sorted(latencia * 1000 for latencia in datos['latencias'])
+                if not ms:
+                    continue
+                self.stdout.write('{:<8} {:<10} {:>8} {:>8.0f} {:>8.2f} {:>8.1f} {:>8}'.format(
+                    modo, tipo, len(ms), len(ms) / options['segundos'],
+                    statistics.median(ms), percentil(ms, 99), datos['errores'],
+                ))
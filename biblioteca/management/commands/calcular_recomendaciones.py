@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.recomendaciones import K, calcular
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula los libros parecidos de los libros de bibliotecas públicas que aún '
+        'no se han calculado (o de todos con --todos)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Recalcula las recomendaciones de todos los libros y no solo de los nuevos',
+        )
+        parser.add_argument('--vecinos', type=int, default=K, help='Recomendaciones por libro')
+
+    def handle(self, *args, **options):
+        resultado = calcular(todos=options['todos'], k=options['vecinos'])
+        self.stdout.write(
+            f'{resultado.libros} libros públicos vectorizados en {resultado.segundos_vectores:.1f} s'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Vecinos buscados para {resultado.nuevos} libros; '
+            f'{resultado.actualizados} listas guardadas en {resultado.segundos_vecinos:.1f} s'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.recordatorios import TAMANO_LOTE, enviar_recordatorios
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía a cada propietario un correo con sus préstamos vencidos de los que '
+        'aún no se le ha avisado. Se puede ejecutar tantas veces como se quiera'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Préstamos cargados por consulta')
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo cuenta los recordatorios pendientes, sin enviarlos ni marcarlos',
+        )
+
+    def handle(self, *args, **options):
+        def progreso(resultado):
+            self.stdout.write(f'  {resultado.prestamos} préstamos en {resultado.correos} correos')
+
+        resultado = enviar_recordatorios(lote=options['lote'], simular=options['simular'], progreso=progreso)
+
+        if resultado.sin_email:
+            self.stdout.write(self.style.WARNING(
+                f'{resultado.sin_email} préstamos vencidos de propietarios sin correo electrónico'
+            ))
+        if resultado.fallidos:
+            self.stdout.write(self.style.ERROR(
+                f'{resultado.fallidos} préstamos no se han podido avisar (se reintentará en la próxima ejecución)'
+            ))
+        verbo = 'por avisar' if options['simular'] else 'avisados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.prestamos} préstamos vencidos {verbo} en {resultado.correos} correos'
+        ))
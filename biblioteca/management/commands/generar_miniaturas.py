@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.models import Libro
+from biblioteca.portadas import generar_rendiciones
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas (WebP/JPEG) de las portadas que aún no las tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Regenera también las portadas que ya tienen miniaturas',
+        )
+
+    def handle(self, *args, **options):
+        libros = Libro.objects.exclude(portada='').exclude(portada__isnull=True)
+        if not options['todas']:
+            libros = libros.filter(portada_miniaturas=False)
+
+        total = libros.count()
+        self.stdout.write(self.style.WARNING(f'Procesando {total} portadas...'))
+
+        generadas = fallidas = 0
+        for libro in libros.only('id', 'portada', 'portada_miniaturas').iterator(chunk_size=200):
+            if generar_rendiciones(libro):
+                generadas += 1
+            else:
+                fallidas += 1
+                self.stdout.write(self.style.ERROR(f'  No se pudo procesar: {libro.portada.name}'))
+            if (generadas + fallidas) % 100 == 0:
+                self.stdout.write(f'  {generadas + fallidas}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(f'Miniaturas generadas: {generadas} (fallidas: {fallidas})'))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.importacion import TAMANO_LOTE, ErrorImportacion, detectar_formato, importar
+from biblioteca.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa libros en la biblioteca de un usuario desde un CSV, un JSON '
+        '(array o JSON Lines) o la exportación CSV de Goodreads'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuario propietario de los libros')
+        parser.add_argument('ruta', help='Fichero a importar')
+        parser.add_argument(
+            '--formato',
+            choices=['auto', 'csv', 'json'],
+            default='auto',
+            help='Formato del fichero (por defecto, según la extensión)',
+        )
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Libros por inserción')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(username=options['username'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f'No existe el usuario {options["username"]}')
+
+        formato = detectar_formato(options['formato'], options['ruta'])
+        inicio = time.perf_counter()
+
+        def progreso(resultado):
+            self.stdout.write(f'  {resultado.leidas} filas leídas, {resultado.creados} libros creados')
+
+        try:
+            with open(options['ruta'], encoding='utf-8-sig', newline='') as texto:
+                resultado = importar(usuario, texto, formato, lote=options['lote'], progreso=progreso)
+        except (OSError, UnicodeDecodeError, ErrorImportacion) as exc:
+            raise CommandError(str(exc))
+
+        for fila, mensaje in resultado.errores:
+            self.stdout.write(self.style.WARNING(f'Fila {fila}: {mensaje}'))
+        if resultado.errores_omitidos:
+            self.stdout.write(self.style.WARNING(f'... y {resultado.errores_omitidos} filas más con errores'))
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creados} libros importados, {resultado.duplicados} duplicados omitidos y '
+            f'{resultado.num_errores} filas con errores de {resultado.leidas} leídas en {segundos:.1f} s '
+            f'({resultado.leidas / segundos if segundos else 0:.0f} filas/s)'
+        ))
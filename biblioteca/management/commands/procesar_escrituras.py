@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections
+
+from biblioteca import escrituras
+
+
+# Vueltas entre purgas de claves antiguas
+VUELTAS_PURGA = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica en lote las escrituras diferidas (solicitudes de contacto, '
+        'último acceso): una transacción por intervalo en un único proceso'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=0.2,
+            help='Segundos que se acumulan escrituras antes de cada transacción',
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Escrituras máximas por transacción')
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vacía la cola y termina en lugar de quedarse esperando',
+        )
+
+    def handle(self, *args, **options):
+        if escrituras.directorio() is None:
+            raise CommandError('COLA_ESCRITURAS no está configurado')
+        self.stdout.write(self.style.SUCCESS(f'Escritor de {escrituras.directorio()}'))
+
+        vueltas = 0
+        while True:
+            escrituras.latido()
+            close_old_connections()
+            try:
+                aplicadas = escrituras.aplicar_pendientes(options['lote'])
+            except OperationalError as exc:
+                self.stdout.write(self.style.WARNING(f'Base de datos ocupada, se reintenta: {exc}'))
+                aplicadas = 0
+            if aplicadas:
+                self.stdout.write(f'  {aplicadas} escrituras aplicadas')
+            elif options['una_vez']:
+                break
+
+            vueltas += 1
+            if vueltas % VUELTAS_PURGA == 0:
+                escrituras.purgar_claves()
+            if aplicadas < options['lote']:
+                time.sleep(options['intervalo'])
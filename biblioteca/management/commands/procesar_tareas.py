@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from biblioteca import portadas, tareas
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa la cola de tareas en segundo plano (miniaturas de portadas) '
+        'con un pool de procesos para el trabajo de CPU'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=max(1, (os.cpu_count() or 2) - 1),
+            help='Procesos del pool para el trabajo de Pillow',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando la cola está vacía',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vacía la cola y termina en lugar de quedarse esperando',
+        )
+
+    def handle(self, *args, **options):
+        trabajador = tareas.identificador_trabajador()
+        procesos = options['procesos']
+        self.stdout.write(self.style.SUCCESS(f'Trabajador {trabajador} con {procesos} procesos'))
+
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            while True:
+                close_old_connections()
+                # En cada vuelta: otro trabajador puede haber caído mientras tanto
+                recuperadas = tareas.recuperar_huerfanas()
+                if recuperadas:
+                    self.stdout.write(self.style.WARNING(f'{recuperadas} tareas huérfanas devueltas a la cola'))
+                lote = tareas.reclamar(procesos * 2, trabajador)
+                if not lote:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                self.procesar_lote(pool, lote)
+
+    def procesar_lote(self, pool, lote):
+        futuros = {}
+        for tarea in lote:
+            if tarea.tipo != 'miniaturas':
+                tareas.fallar(tarea, f'Tipo de tarea desconocido: {tarea.tipo}')
+                continue
+            try:
+                preparado = tareas.preparar_miniaturas(tarea)
+            except OSError as exc:
+                tareas.fallar(tarea, exc)
+                continue
+            if preparado is None:
+                # El libro o la portada ya no existen
+                tareas.completar(tarea)
+                continue
+            libro, contenido = preparado
+            futuros[pool.submit(portadas.renderizar, contenido)] = (tarea, libro)
+
+        for futuro in as_completed(futuros):
+            tarea, libro = futuros[futuro]
+            try:
+                portadas.guardar_rendiciones(libro, futuro.result())
+            except Exception as exc:
+                tareas.fallar(tarea, exc)
+                self.stdout.write(self.style.ERROR(f'  Tarea {tarea.pk}: {exc}'))
+            else:
+                tareas.completar(tarea)
+                self.stdout.write(f'  Miniaturas generadas: {libro.portada.name}')
@@ -0,0 +1,270 @@
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import URLPattern, reverse
+
+from biblioteca import recomendaciones, urls as biblioteca_urls
+from biblioteca.models import Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto, Usuario
+
+
+# Presupuesto de consultas SQL por vista. Cada caso es
+# (nombre de la URL, usuario, argumentos, parámetros GET, consultas máximas).
+# Los argumentos hacen referencia a los objetos que crea poblar().
+# Las peticiones autenticadas incluyen siempre 2 consultas (sesión y usuario).
+PRESUPUESTOS = [
+    ('landing', None, {}, '', 0),
+    ('registro', None, {}, '', 0),
+    ('login', None, {}, '', 0),
+    ('demo_video', None, {}, '', 0),
+    ('logout', 'lector', {}, '', 4),
+    ('home', 'propietario', {}, '', 4),
+    ('bibliotecas_publicas', 'lector', {}, '', 3),
+    ('ver_biblioteca', 'lector', {'username': 'propietario'}, '', 5),
+    ('ver_biblioteca', 'lector', {'username': 'propietario'}, 'query=novela', 6),
+    ('ver_biblioteca', 'lector', {'username': 'propietario'}, 'query=novla&modo=aproximada', 6),
+    ('mi_biblioteca', 'propietario', {}, '', 4),
+    # Exportación: libros + préstamos por cada trozo de exportacion.TAMANO_TROZO libros
+    ('biblioteca_exportar', 'propietario', {}, 'formato=csv', 4),
+    ('biblioteca_exportar', 'propietario', {}, 'formato=jsonl', 4),
+    ('biblioteca_exportar', 'propietario', {}, 'formato=marc', 4),
+    ('busqueda_global', 'lector', {}, 'query=novela', 4),
+    ('busqueda_global', 'lector', {}, 'query=novla&modo=aproximada', 4),
+    ('libro_detalle', 'propietario', {'pk': 'libro'}, '', 6),
+    ('libro_detalle', 'lector', {'pk': 'libro'}, '', 5),
+    ('libro_crear', 'propietario', {}, '', 2),
+    ('libro_importar', 'propietario', {}, '', 2),
+    ('libro_editar', 'propietario', {'pk': 'libro'}, '', 3),
+    ('libro_eliminar', 'propietario', {'pk': 'libro'}, '', 3),
+    ('resena_crear', 'propietario', {'libro_pk': 'libro'}, '', 3),
+    ('prestamo_crear', 'propietario', {'libro_pk': 'libro'}, '', 3),
+    ('prestamos_activos', 'propietario', {}, '', 3),
+    ('prestamo_devolver', 'propietario', {'pk': 'prestamo'}, '', 3),
+    ('lista_deseos', 'lector', {}, '', 4),
+    ('lista_deseos_eliminar', 'lector', {'pk': 'deseo'}, '', 3),
+    ('usuarios_lista', 'admin', {}, '', 3),
+    # Al hacerla privada se borran sus coincidencias con listas de deseos (BEGIN, DELETE, COMMIT)
+    ('usuario_cambiar_privacidad', 'admin', {'pk': 'otro'}, '', 8),
+    ('analisis', 'admin', {}, '', 2),
+    ('sobre_nosotros', 'admin', {}, '', 2),
+    ('mapa_web', 'lector', {}, '', 2),
+    ('configuracion', 'propietario', {}, '', 2),
+    ('api_bibliotecas', 'lector', {}, '', 3),
+    ('api_biblioteca_libros', 'lector', {'username': 'propietario'}, '', 4),
+    ('api_biblioteca_libros', 'lector', {'username': 'propietario'}, 'query=novela&fields=id,titulo', 4),
+    ('api_libros', 'propietario', {}, '', 3),
+    ('api_libros', 'propietario', {}, 'fields=titulo,propietario,resena&limite=100', 3),
+    ('api_libro', 'lector', {'pk': 'libro'}, '', 3),
+    ('api_resena', 'lector', {'libro_pk': 'libro'}, '', 4),
+    ('api_libro_prestamos', 'propietario', {'libro_pk': 'libro'}, '', 4),
+    ('api_prestamos', 'propietario', {}, 'activos=1', 3),
+    ('api_prestamo', 'propietario', {'pk': 'prestamo'}, '', 3),
+    ('api_deseos', 'lector', {}, '', 3),
+    ('api_deseo', 'lector', {'pk': 'deseo'}, '', 3),
+    ('api_solicitudes', 'propietario', {}, '', 3),
+    ('api_solicitud', 'propietario', {'pk': 'solicitud'}, '', 3),
+    # Indicadores: libros, usuarios, préstamos activos y vencidos
+    ('metricas', None, {}, '', 4),
+]
+
+# URLconf con la que resuelve bibliandria/asgi.py
+URLCONF_ASGI = 'bibliandria.urls_asgi'
+AYUDA_VISTAS_ASYNC = 'Mide las vistas de lectura asíncronas, las que se sirven bajo ASGI'
+
+PALABRAS = [
+    'novela', 'historia', 'sombra', 'viento', 'ciudad', 'memoria', 'jardín', 'noche',
+    'mar', 'tiempo', 'silencio', 'camino', 'fuego', 'invierno', 'isla', 'espejo',
+]
+AUTORES = [
+    'Gabriel García Márquez', 'Isabel Allende', 'Julio Cortázar', 'Carmen Laforet',
+    'Miguel Delibes', 'Ana María Matute', 'Javier Marías', 'Almudena Grandes',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Recorre todas las URLs de biblioteca/urls.py sobre un conjunto de datos '
+        'grande en una base de datos de prueba y falla si alguna vista supera su '
+        'presupuesto de consultas SQL'
+    )
+    mensaje_fallo = '{} vistas superan su presupuesto de consultas'
+    mensaje_exito = 'Todas las vistas están dentro de su presupuesto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=200, help='Libros de cada bibliotecario')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Peticiones por caso para medir el tiempo')
+        parser.add_argument('--vistas-async', action='store_true', help=AYUDA_VISTAS_ASYNC)
+
+    def handle(self, *args, **options):
+        self.comprobar_cobertura()
+
+        setup_test_environment()
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Métricas activadas en un directorio temporal para que /metrics responda
+        directorio_metricas = Path(tempfile.mkdtemp(prefix='query-budget-metricas-'))
+        try:
+            inicio = time.perf_counter()
+            datos = self.poblar(options['usuarios'], options['libros_por_usuario'])
+            self.stdout.write(
+                f'Datos de prueba: {Libro.objects.count()} libros de {Usuario.objects.count()} '
+                f'usuarios en {time.perf_counter() - inicio:.1f} s\n'
+            )
+            urlconf = URLCONF_ASGI if options.get('vistas_async') else settings.ROOT_URLCONF
+            with override_settings(ROOT_URLCONF=urlconf, METRICAS_DB=directorio_metricas / 'metricas.sqlite3'):
+                fallos = self.medir(datos, options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(directorio_metricas, ignore_errors=True)
+
+        if fallos:
+            raise CommandError(self.mensaje_fallo.format(fallos))
+        self.stdout.write(self.style.SUCCESS(self.mensaje_exito))
+
+    def comprobar_cobertura(self):
+        """Todas las URLs con nombre deben tener al menos un caso"""
+        nombres = {
+            patron.name for patron in biblioteca_urls.urlpatterns
+            if isinstance(patron, URLPattern) and patron.name
+        }
+        sin_presupuesto = nombres - {caso[0] for caso in PRESUPUESTOS}
+        if sin_presupuesto:
+            raise CommandError(
+                'URLs sin presupuesto de consultas: ' + ', '.join(sorted(sin_presupuesto))
+            )
+
+    def peticion(self, cliente, datos, caso):
+        """Hace la petición de un caso; devuelve ``(url, consultas capturadas, ms)``"""
+        nombre, usuario, argumentos, parametros, _ = caso
+        kwargs = {clave: datos[valor] for clave, valor in argumentos.items()}
+        url = reverse(nombre, kwargs=kwargs) + (f'?{parametros}' if parametros else '')
+
+        cliente.logout()
+        if usuario:
+            cliente.force_login(datos['usuarios'][usuario])
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            if respuesta.streaming:
+                # Las consultas de una respuesta en streaming se hacen al recorrerla
+                b''.join(respuesta.streaming_content)
+            milisegundos = (time.perf_counter() - inicio) * 1000
+        if respuesta.status_code >= 400:
+            raise CommandError(f'{url} respondió {respuesta.status_code}')
+        return url, capturadas, milisegundos
+
+    def medir(self, datos, options):
+        cliente = Client()
+        excedidos = 0
+        self.stdout.write(f'{"URL":<58} {"consultas":>9} {"máx":>4} {"mediana ms":>11}')
+        for caso in PRESUPUESTOS:
+            presupuesto = caso[-1]
+            tiempos = []
+            consultas = None
+            for _ in range(options['repeticiones']):
+                url, capturadas, milisegundos = self.peticion(cliente, datos, caso)
+                tiempos.append(milisegundos)
+                if consultas is None:
+                    consultas = len(capturadas)
+
+            linea = f'{url[:58]:<58} {consultas:>9} {presupuesto:>4} {statistics.median(tiempos):>11.1f}'
+            if consultas > presupuesto:
+                excedidos += 1
+                self.stdout.write(self.style.ERROR(linea))
+                for consulta in capturadas.captured_queries:
+                    self.stdout.write(f'    {consulta["sql"][:160]}')
+            else:
+                self.stdout.write(linea)
+        return excedidos
+
+    def poblar(self, num_usuarios, libros_por_usuario):
+        """Crea bibliotecarios con muchos libros, reseñas, préstamos, deseos y solicitudes"""
+        hoy = date.today()
+        clave = Usuario(username='x')
+        clave.set_password('presupuesto')
+
+        def crear_usuario(username, **extra):
+            return Usuario.objects.create(
+                username=username,
+                password=clave.password,
+                first_name=username.capitalize(),
+                last_name='Prueba',
+                **extra,
+            )
+
+        admin = crear_usuario('admin', rol='admin')
+        lector = crear_usuario('lector', rol='visitante')
+        bibliotecarios = [
+            crear_usuario(f'bibliotecario{i}', rol='bibliotecario', biblioteca_publica=True)
+            for i in range(num_usuarios)
+        ]
+        propietario = bibliotecarios[0]
+
+        libros = []
+        for i, usuario in enumerate(bibliotecarios):
+            for j in range(libros_por_usuario):
+                n = i * libros_por_usuario + j
+                libros.append(Libro(
+                    propietario=usuario,
+                    titulo=f'{PALABRAS[n % len(PALABRAS)].capitalize()} de la {PALABRAS[(n // 7) % len(PALABRAS)]} {n}',
+                    autor=AUTORES[n % len(AUTORES)],
+                    editorial='Editorial de Prueba',
+                    isbn=f'978{n:010d}',
+                    año_publicacion=1950 + n % 70,
+                    descripcion=' '.join(PALABRAS[(n + k) % len(PALABRAS)] for k in range(12)),
+                ))
+        Libro.objects.bulk_create(libros, batch_size=2000)
+
+        libros_propietario = list(propietario.libros.order_by('id')[:40])
+        libro = libros_propietario[0]
+        Resena.objects.bulk_create(
+            Resena(libro=l, puntuacion=1 + k % 5, comentario='Reseña de prueba')
+            for k, l in enumerate(libros_propietario)
+        )
+        for k in range(10):
+            Prestamo.objects.create(
+                libro=libro,
+                nombre_prestatario=f'Prestatario {k}',
+                fecha_prestamo=hoy - timedelta(days=30 * (k + 1)),
+                fecha_devolucion_real=None if k == 0 else hoy - timedelta(days=30 * k),
+            )
+        prestamo = libro.prestamos.filter(fecha_devolucion_real__isnull=True).get()
+
+        for k in range(30):
+            ListaDeseos.objects.create(usuario=lector, titulo=f'Deseo {k}', autor=AUTORES[k % len(AUTORES)])
+        # Deseos que están en otra biblioteca pública, por ISBN y por título y autor
+        for k, l in enumerate(bibliotecarios[-1].libros.order_by('id')[:10]):
+            for usuario in (lector, propietario):
+                ListaDeseos.objects.create(
+                    usuario=usuario,
+                    titulo=l.titulo.upper() if k % 2 else f'Otra edición {k}',
+                    autor=l.autor,
+                    isbn='' if k % 2 else l.isbn,
+                )
+        for l in libros_propietario[:20]:
+            solicitud = SolicitudContacto.objects.create(
+                visitante=lector, bibliotecario=propietario, libro=l, mensaje='¿Me lo prestas?'
+            )
+        # Libros parecidos para el detalle
+        recomendaciones.calcular()
+
+        return {
+            'usuarios': {'admin': admin, 'lector': lector, 'propietario': propietario},
+            'propietario': propietario.username,
+            'otro': bibliotecarios[-1].pk,
+            'libro': libro.pk,
+            'prestamo': prestamo.pk,
+            'deseo': lector.lista_deseos.first().pk,
+            'solicitud': solicitud.pk,
+        }
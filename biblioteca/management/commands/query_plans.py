@@ -0,0 +1,84 @@
+from django.db import connection
+from django.test import Client
+
+from .query_budget import AYUDA_VISTAS_ASYNC, PRESUPUESTOS, Command as QueryBudgetCommand
+
+
+# (vista, tabla) que se recorren enteras a propósito
+RECORRIDOS_PERMITIDOS = {
+    # Listado completo de usuarios para el administrador
+    ('usuarios_lista', 'biblioteca_usuario'),
+}
+
+
+def recorridos_completos(plan):
+    """
+    Líneas de ``EXPLAIN QUERY PLAN`` que leen una tabla entera. No cuentan
+    los ``SCAN`` que recorren un índice (p. ej. para ordenar con LIMIT),
+    una tabla virtual (FTS5) ni el resultado de una subconsulta.
+    """
+    subconsultas = {'subquery', 'CONSTANT'}
+    for detalle in plan:
+        if detalle.startswith(('CO-ROUTINE ', 'MATERIALIZE ')):
+            subconsultas.add(detalle.split()[1])
+    return [
+        detalle for detalle in plan
+        if detalle.startswith('SCAN ')
+        and detalle.split()[1] not in subconsultas
+        and ' INDEX' not in detalle
+        and 'VIRTUAL TABLE' not in detalle
+    ]
+
+
+class Command(QueryBudgetCommand):
+    help = (
+        'Ejecuta EXPLAIN QUERY PLAN sobre las consultas de todas las vistas de '
+        'biblioteca/urls.py en una base de datos de prueba y falla si alguna '
+        'recorre una tabla entera'
+    )
+    mensaje_fallo = '{} consultas recorren una tabla entera'
+    mensaje_exito = 'Todas las consultas usan índices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50, help='Bibliotecarios a crear')
+        parser.add_argument('--libros-por-usuario', type=int, default=200, help='Libros de cada bibliotecario')
+        parser.add_argument('--planes', action='store_true', help='Muestra el plan de todas las consultas')
+        parser.add_argument('--vistas-async', action='store_true', help=AYUDA_VISTAS_ASYNC)
+
+    def medir(self, datos, options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING('La comprobación solo interpreta planes de SQLite'))
+            return 0
+
+        cliente = Client()
+        fallos = 0
+        vistas = set()
+        for caso in PRESUPUESTOS:
+            url, capturadas, _ = self.peticion(cliente, datos, caso)
+            self.stdout.write(url)
+            for consulta in capturadas.captured_queries:
+                sql = consulta['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plan = [fila[3] for fila in cursor.fetchall()]
+
+                recorridos = [
+                    detalle for detalle in recorridos_completos(plan)
+                    if (caso[0], detalle.split()[1]) not in RECORRIDOS_PERMITIDOS
+                ]
+                if recorridos:
+                    fallos += 1
+                    vistas.add(caso[0])
+                    self.stdout.write(self.style.ERROR(f'    {sql[:160]}'))
+                    for detalle in recorridos:
+                        self.stdout.write(self.style.ERROR(f'      {detalle}'))
+                elif options['planes']:
+                    self.stdout.write(f'    {sql[:160]}')
+                    for detalle in plan:
+                        self.stdout.write(f'      {detalle}')
+
+        if vistas:
+            self.stdout.write(self.style.ERROR('Vistas afectadas: ' + ', '.join(sorted(vistas))))
+        return fallos
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from biblioteca.contadores import descuadres, recontar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores desnormalizados de los usuarios (libros, deseos, préstamos, solicitudes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--comprobar',
+            action='store_true',
+            help='Solo informa de los usuarios descuadrados, sin corregirlos',
+        )
+
+    def handle(self, *args, **options):
+        erroneos = list(descuadres().values_list('username', flat=True))
+        if erroneos:
+            self.stdout.write(self.style.WARNING(
+                f'{len(erroneos)} usuarios con contadores descuadrados: {", ".join(erroneos[:20])}'
+                + (' ...' if len(erroneos) > 20 else '')
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Todos los contadores están al día'))
+
+        if options['comprobar'] or not erroneos:
+            return
+
+        actualizados = recontar()
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {actualizados} usuarios'))
@@ -0,0 +1,359 @@
+"""
+Métricas en el formato de texto de Prometheus (``/metrics``).
+
+Cada proceso acumula en memoria (``Colector``) lo que mide
+``MetricasMiddleware`` y cada ``METRICAS_INTERVALO`` segundos lo suma, en
+una transacción, a una base de datos SQLite aparte (``settings.METRICAS_DB``)
+que comparten todos los workers de gunicorn. ``/metrics`` lee de ahí los
+totales de todos los procesos, incluidos los que ya han terminado, así
+que los contadores no retroceden al reiniciar un worker.
+
+Qué se mide:
+
+- Duración de las peticiones (histograma) y peticiones por vista y
+  estado. La vista es el nombre de la URL, no la ruta, para que el número
+  de series no crezca con los ids.
+- Consultas SQL y su tiempo por vista, con el ``execute_wrapper`` que
+  ``perfilado.medir`` pone durante cada petición.
+- Aciertos y fallos de caché (``contar_cache``, la llaman quienes leen).
+- Bytes de media servidos: los que sirva Django y, en producción, los
+  que nginx deja en ``METRICAS_LOG_MEDIA`` (un número por línea).
+- Al pedir ``/metrics``: libros, usuarios, préstamos activos y vencidos y
+  escrituras diferidas pendientes.
+
+El coste está acotado: por petición, unas pocas sumas en un diccionario;
+por proceso, un volcado cada intervalo. El propio tiempo de recogida se
+publica en ``bibliandria_metricas_sobrecarga_segundos_total``.
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+
+from . import escrituras
+from .models import Libro, Prestamo, Usuario
+from .perfilado import amedir, instrumentar, medir
+
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los cubos del histograma de duración
+CUBOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Métricas acumuladas: nombre -> (tipo, ayuda)
+METRICAS = {
+    'bibliandria_peticiones_total': ('counter', 'Peticiones atendidas por vista y clase de estado HTTP'),
+    'bibliandria_peticion_duracion_segundos': ('histogram', 'Duración de las peticiones por vista'),
+    'bibliandria_consultas_sql_total': ('counter', 'Consultas SQL por vista'),
+    'bibliandria_consultas_sql_segundos_total': ('counter', 'Tiempo en consultas SQL por vista'),
+    'bibliandria_cache_lecturas_total': ('counter', 'Lecturas de caché por alias y resultado'),
+    'bibliandria_media_bytes_total': ('counter', 'Bytes de ficheros de media servidos'),
+    'bibliandria_metricas_volcados_total': ('counter', 'Volcados de métricas de los procesos a la base de datos'),
+    'bibliandria_metricas_sobrecarga_segundos_total': (
+        'counter', 'Tiempo que dedican los procesos a medir y volcar métricas'),
+}
+
+# Métricas que se calculan al pedir /metrics: nombre -> ayuda
+INDICADORES = {
+    'bibliandria_libros': 'Libros catalogados',
+    'bibliandria_usuarios': 'Usuarios registrados',
+    'bibliandria_prestamos_activos': 'Préstamos sin devolver',
+    'bibliandria_prestamos_vencidos': 'Préstamos sin devolver con la fecha de devolución pasada',
+    'bibliandria_escrituras_pendientes': 'Escrituras diferidas que aún no se han aplicado',
+    'bibliandria_metricas_recogida_segundos': 'Tiempo que ha costado generar esta respuesta',
+}
+
+_SQL_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS serie (
+        nombre TEXT NOT NULL,
+        etiquetas TEXT NOT NULL,
+        valor REAL NOT NULL,
+        PRIMARY KEY (nombre, etiquetas)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS estado (
+        clave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL
+    );
+"""
+_SQL_SUMAR = """
+    INSERT INTO serie (nombre, etiquetas, valor) VALUES (?, ?, ?)
+    ON CONFLICT (nombre, etiquetas) DO UPDATE SET valor = valor + excluded.valor
+"""
+
+# El log de nginx se vacía al pasar de este tamaño
+MAX_LOG_MEDIA = 8 * 1024 * 1024
+
+
+def etiquetas(**valores):
+    return ','.join(
+        '{}="{}"'.format(nombre, str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for nombre, valor in valores.items()
+    )
+
+
+def _formatear(valor):
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+_CUBOS = [(limite, _formatear(limite)) for limite in CUBOS]
+
+
+# ====== ALMACÉN COMPARTIDO ======
+
+_conexiones = {}
+# La conexión se comparte entre los hilos del proceso
+_cerrojo_conexion = threading.Lock()
+
+
+def _conexion():
+    """Conexión de este proceso con la base de datos de métricas"""
+    clave = (os.getpid(), str(settings.METRICAS_DB))
+    if clave not in _conexiones:
+        conexion = sqlite3.connect(settings.METRICAS_DB, timeout=5, isolation_level=None,
+                                   check_same_thread=False)
+        conexion.execute('PRAGMA journal_mode = wal')
+        conexion.execute('PRAGMA synchronous = off')
+        conexion.executescript(_SQL_ESQUEMA)
+        _conexiones.clear()
+        _conexiones[clave] = conexion
+    return _conexiones[clave]
+
+
+@contextmanager
+def _transaccion():
+    conexion = _conexion()
+    conexion.execute('BEGIN IMMEDIATE')
+    try:
+        yield conexion
+    except BaseException:
+        conexion.execute('ROLLBACK')
+        raise
+    conexion.execute('COMMIT')
+
+
+class Colector:
+    """Contadores de este proceso pendientes de volcar"""
+
+    def __init__(self):
+        self._cerrojo = threading.Lock()
+        self._pendiente = defaultdict(float)
+        self._ultimo_volcado = time.monotonic()
+
+    def sumar(self, nombre, etiquetas='', valor=1):
+        with self._cerrojo:
+            self._pendiente[nombre, etiquetas] += valor
+
+    def observar(self, nombre, etiquetas, valor):
+        """Una observación del histograma ``nombre``"""
+        separador = ',' if etiquetas else ''
+        with self._cerrojo:
+            pendiente = self._pendiente
+            for limite, texto in _CUBOS:
+                if valor <= limite:
+                    pendiente[f'{nombre}_bucket', f'{etiquetas}{separador}le="{texto}"'] += 1
+            pendiente[f'{nombre}_bucket', f'{etiquetas}{separador}le="+Inf"'] += 1
+            pendiente[f'{nombre}_sum', etiquetas] += valor
+            pendiente[f'{nombre}_count', etiquetas] += 1
+
+    def toca_volcar(self):
+        return time.monotonic() - self._ultimo_volcado >= settings.METRICAS_INTERVALO
+
+    def volcar(self):
+        """Suma lo pendiente a la base de datos compartida"""
+        inicio = time.perf_counter()
+        with self._cerrojo:
+            pendiente, self._pendiente = self._pendiente, defaultdict(float)
+            self._ultimo_volcado = time.monotonic()
+        # Sin METRICAS_DB (p. ej. al salir de un override_settings) se descarta
+        if not pendiente or not getattr(settings, 'METRICAS_DB', None):
+            return
+        filas = [(n, e, v) for (n, e), v in pendiente.items()]
+        filas.append(('bibliandria_metricas_volcados_total', '', 1))
+        try:
+            with _cerrojo_conexion, _transaccion() as conexion:
+                conexion.executemany(_SQL_SUMAR, filas)
+        except sqlite3.Error:
+            logger.exception('No se pudieron volcar las métricas: se reintentará')
+            with self._cerrojo:
+                for clave, valor in pendiente.items():
+                    self._pendiente[clave] += valor
+        self.sumar('bibliandria_metricas_sobrecarga_segundos_total', '', time.perf_counter() - inicio)
+
+
+colector = Colector()
+# Lo que quede sin volcar al parar el worker
+atexit.register(colector.volcar)
+
+
+def contar_cache(alias, aciertos, fallos):
+    """La llama quien lee de la caché ``alias``"""
+    if not getattr(settings, 'METRICAS_DB', None):
+        return
+    if aciertos:
+        colector.sumar('bibliandria_cache_lecturas_total', etiquetas(cache=alias, resultado='acierto'), aciertos)
+    if fallos:
+        colector.sumar('bibliandria_cache_lecturas_total', etiquetas(cache=alias, resultado='fallo'), fallos)
+
+
+def leer_log_media():
+    """
+    Suma los bytes que nginx ha anotado en ``METRICAS_LOG_MEDIA`` desde la
+    última lectura (la posición se guarda en la tabla ``estado``).
+    """
+    ruta = getattr(settings, 'METRICAS_LOG_MEDIA', None)
+    if not ruta or not os.path.exists(ruta):
+        return
+    with _cerrojo_conexion, _transaccion() as conexion:
+        fila = conexion.execute("SELECT valor FROM estado WHERE clave = 'log_media'").fetchone()
+        posicion = fila[0] if fila else 0
+        with open(ruta, 'rb') as fichero:
+            if os.fstat(fichero.fileno()).st_size < posicion:
+                posicion = 0  # rotado o vaciado
+            fichero.seek(posicion)
+            datos = fichero.read()
+        # Solo las líneas completas
+        datos = datos[:datos.rfind(b'\n') + 1]
+        total = sum(int(linea) for linea in datos.split() if linea.isdigit())
+        posicion += len(datos)
+        if posicion > MAX_LOG_MEDIA and os.path.getsize(ruta) == posicion:
+            # nginx abre el log con O_APPEND: tras vaciarlo sigue escribiendo al principio
+            os.truncate(ruta, 0)
+            posicion = 0
+        conexion.execute(_SQL_SUMAR, ('bibliandria_media_bytes_total', etiquetas(origen='nginx'), total))
+        conexion.execute("INSERT OR REPLACE INTO estado (clave, valor) VALUES ('log_media', ?)", (posicion,))
+
+
+# ====== MIDDLEWARE ======
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_DB', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefijo_media = '/' + settings.MEDIA_URL.lstrip('/')
+        instrumentar()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with medir() as medicion:
+            inicio = time.perf_counter()
+            response = self.get_response(request)
+            self.anotar(request, response, medicion, time.perf_counter() - inicio)
+        if colector.toca_volcar():
+            colector.volcar()
+        return response
+
+    async def __acall__(self, request):
+        async with amedir() as medicion:
+            inicio = time.perf_counter()
+            response = await self.get_response(request)
+            self.anotar(request, response, medicion, time.perf_counter() - inicio)
+        if colector.toca_volcar():
+            await sync_to_async(colector.volcar, thread_sensitive=False)()
+        return response
+
+    def anotar(self, request, response, medicion, duracion):
+        inicio = time.perf_counter()
+        coincidencia = request.resolver_match
+        vista = etiquetas(vista=coincidencia.view_name if coincidencia else 'sin_ruta')
+        colector.observar('bibliandria_peticion_duracion_segundos', vista, duracion)
+        colector.sumar('bibliandria_peticiones_total', f'{vista},estado="{response.status_code // 100}xx"')
+        if medicion.consultas:
+            colector.sumar('bibliandria_consultas_sql_total', vista, medicion.consultas)
+            colector.sumar('bibliandria_consultas_sql_segundos_total', vista, medicion.sql)
+        if request.path.startswith(self.prefijo_media) and response.status_code == 200:
+            colector.sumar(
+                'bibliandria_media_bytes_total', etiquetas(origen='django'),
+                int(response.get('Content-Length') or 0),
+            )
+        colector.sumar('bibliandria_metricas_sobrecarga_segundos_total', '', time.perf_counter() - inicio)
+
+
+# ====== EXPOSICIÓN ======
+
+def indicadores():
+    hoy = timezone.localdate()
+    activos = Prestamo.objects.filter(fecha_devolucion_real__isnull=True)
+    base = escrituras.directorio()
+    pendientes = 0
+    if base is not None and (base / 'pendientes').is_dir():
+        pendientes = sum(1 for _ in os.scandir(base / 'pendientes'))
+    return {
+        'bibliandria_libros': Libro.objects.count(),
+        'bibliandria_usuarios': Usuario.objects.count(),
+        'bibliandria_prestamos_activos': activos.count(),
+        'bibliandria_prestamos_vencidos': activos.filter(fecha_devolucion_esperada__lt=hoy).count(),
+        'bibliandria_escrituras_pendientes': pendientes,
+    }
+
+
+def _orden(fila):
+    """Agrupa por métrica y ordena los cubos por su límite, no como texto"""
+    nombre, texto, _ = fila
+    if nombre.endswith('_bucket'):
+        resto, _, limite = texto.rpartition('le="')
+        return _base(nombre), nombre, resto, float(limite.rstrip('"'))
+    return _base(nombre), nombre, texto, 0.0
+
+
+def _base(nombre):
+    for sufijo in ('_bucket', '_sum', '_count'):
+        if nombre.endswith(sufijo) and nombre[:-len(sufijo)] in METRICAS:
+            return nombre[:-len(sufijo)]
+    return nombre
+
+
+def _ip_cliente(request):
+    """
+    IP de quien pide ``/metrics``. Por el socket unix de gunicorn no hay
+    ``REMOTE_ADDR`` y solo puede llegar nginx, que pone la del cliente en
+    ``X-Real-IP`` (``proxy_params``).
+    """
+    return request.META.get('REMOTE_ADDR') or request.META.get('HTTP_X_REAL_IP', '')
+
+
+def exponer(request):
+    """Vista de ``/metrics``, solo para las IP de ``METRICAS_IPS``"""
+    if not getattr(settings, 'METRICAS_DB', None):
+        raise Http404
+    if _ip_cliente(request) not in getattr(settings, 'METRICAS_IPS', ()):
+        return HttpResponseForbidden('No tienes permiso.')
+    inicio = time.perf_counter()
+    colector.volcar()
+    leer_log_media()
+    with _cerrojo_conexion:
+        filas = _conexion().execute('SELECT nombre, etiquetas, valor FROM serie').fetchall()
+    filas.sort(key=_orden)
+
+    lineas = []
+    anterior = None
+    for nombre, texto, valor in filas:
+        base = _base(nombre)
+        if base != anterior:
+            tipo, ayuda = METRICAS.get(base, ('untyped', ''))
+            lineas += [f'# HELP {base} {ayuda}', f'# TYPE {base} {tipo}']
+            anterior = base
+        lineas.append(f'{nombre}{{{texto}}} {_formatear(valor)}' if texto else f'{nombre} {_formatear(valor)}')
+
+    valores = indicadores()
+    valores['bibliandria_metricas_recogida_segundos'] = time.perf_counter() - inicio
+    for nombre, valor in valores.items():
+        lineas += [f'# HELP {nombre} {INDICADORES[nombre]}', f'# TYPE {nombre} gauge', f'{nombre} {_formatear(valor)}']
+
+    return HttpResponse('\n'.join(lineas) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
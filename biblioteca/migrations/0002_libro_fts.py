@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from biblioteca.busqueda import asegurar_indice_fts
+    asegurar_indice_fts(using=schema_editor.connection.alias)
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in [
+        'DROP TRIGGER IF EXISTS biblioteca_libro_fts_au',
+        'DROP TRIGGER IF EXISTS biblioteca_libro_fts_ad',
+        'DROP TRIGGER IF EXISTS biblioteca_libro_fts_ai',
+        'DROP TABLE IF EXISTS biblioteca_libro_fts',
+    ]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rellenar_claves(apps, schema_editor):
+    from biblioteca.busqueda import normalizar, trigramas
+
+    Libro = apps.get_model('biblioteca', 'Libro')
+    TrigramaLibro = apps.get_model('biblioteca', 'TrigramaLibro')
+    libros = list(Libro.objects.only('id', 'titulo', 'autor'))
+    filas = []
+    for libro in libros:
+        libro.titulo_normalizado = normalizar(libro.titulo)
+        libro.autor_normalizado = normalizar(libro.autor)
+        firma = trigramas(libro.titulo_normalizado) | trigramas(libro.autor_normalizado)
+        filas.extend(TrigramaLibro(libro_id=libro.pk, trigrama=t) for t in firma)
+    Libro.objects.bulk_update(libros, ['titulo_normalizado', 'autor_normalizado'], batch_size=1000)
+    TrigramaLibro.objects.bulk_create(filas, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0002_libro_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='autor_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='titulo_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=300),
+        ),
+        migrations.CreateModel(
+            name='TrigramaLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='biblioteca.libro')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Libro',
+                'verbose_name_plural': 'Trigramas de Libros',
+                'indexes': [models.Index(fields=['trigrama', 'libro'], name='trigrama_libro_idx')],
+            },
+        ),
+        migrations.RunPython(rellenar_claves, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+def copiar_privacidad(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Libro.objects.filter(propietario__biblioteca_publica=True).update(publico=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0003_libro_busqueda_normalizada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='publico',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(copiar_privacidad, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['publico', '-fecha_agregado', '-id'], name='libro_publico_fecha_idx'),
+        ),
+    ]
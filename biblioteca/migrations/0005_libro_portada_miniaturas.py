@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0004_libro_publico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='portada_miniaturas',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def rellenar_contadores(apps, schema_editor):
+    Usuario = apps.get_model('biblioteca', 'Usuario')
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+    ListaDeseos = apps.get_model('biblioteca', 'ListaDeseos')
+    SolicitudContacto = apps.get_model('biblioteca', 'SolicitudContacto')
+
+    def conteo(queryset, campo):
+        sub = queryset.filter(**{campo: OuterRef('pk')}).order_by().values(campo).annotate(
+            total=Count('pk')
+        ).values('total')
+        return Coalesce(Subquery(sub, output_field=IntegerField()), 0)
+
+    Usuario.objects.update(
+        num_libros=conteo(Libro.objects.all(), 'propietario'),
+        num_deseos=conteo(ListaDeseos.objects.all(), 'usuario'),
+        num_prestamos_activos=conteo(
+            Prestamo.objects.filter(fecha_devolucion_real__isnull=True), 'libro__propietario'
+        ),
+        num_solicitudes_pendientes=conteo(
+            SolicitudContacto.objects.filter(estado='pendiente'), 'bibliotecario'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('biblioteca', '0006_tarea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='num_deseos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Deseos'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='num_libros',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Libros'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='num_prestamos_activos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Préstamos Activos'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='num_solicitudes_pendientes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Solicitudes Pendientes'),
+        ),
+        migrations.RunPython(rellenar_contadores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['biblioteca_publica', 'rol'], name='usuario_publica_rol_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('biblioteca', '0007_usuario_contadores'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='libro',
+            name='libro_publico_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='usuario',
+            name='usuario_publica_rol_idx',
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(condition=models.Q(('publico', True)), fields=['-fecha_agregado', '-id'], name='libro_publico_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['propietario', '-fecha_agregado', '-id'], name='libro_propietario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['isbn'], name='libro_isbn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listadeseos',
+            index=models.Index(fields=['usuario', '-prioridad', '-fecha_agregado'], name='deseo_usuario_prioridad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', True)), fields=['libro', 'fecha_devolucion_esperada'], name='prestamo_activo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudcontacto',
+            index=models.Index(fields=['bibliotecario', 'estado', '-fecha_creacion'], name='solicitud_bibliotecario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(condition=models.Q(('biblioteca_publica', True)), fields=['rol'], name='usuario_publica_idx'),
+        ),
+    ]
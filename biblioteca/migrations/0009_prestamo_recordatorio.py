@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0008_indices_accesos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prestamo',
+            name='recordatorio_enviado',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('fecha_devolucion_real__isnull', True), ('recordatorio_enviado__isnull', True)), fields=['fecha_devolucion_esperada', 'id'], name='prestamo_sin_recordatorio_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0009_prestamo_recordatorio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscrituraAplicada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=80, unique=True, verbose_name='Clave')),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Escritura aplicada',
+                'verbose_name_plural': 'Escrituras aplicadas',
+            },
+        ),
+    ]
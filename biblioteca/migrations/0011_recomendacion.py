@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0010_escritura_aplicada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recomendacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicion', models.PositiveSmallIntegerField()),
+                ('similitud', models.FloatField()),
+                ('libro', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recomendaciones', to='biblioteca.libro')),
+                ('recomendado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='biblioteca.libro')),
+            ],
+            options={
+                'verbose_name': 'Recomendación',
+                'verbose_name_plural': 'Recomendaciones',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recomendacion',
+            constraint=models.UniqueConstraint(fields=('libro', 'posicion'), name='recomendacion_libro_posicion_uniq'),
+        ),
+    ]
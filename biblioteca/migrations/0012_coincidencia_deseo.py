@@ -0,0 +1,97 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:08
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def rellenar_coincidencias(apps, schema_editor):
+    from biblioteca.busqueda import normalizar, normalizar_isbn
+
+    Libro = apps.get_model('biblioteca', 'Libro')
+    ListaDeseos = apps.get_model('biblioteca', 'ListaDeseos')
+    CoincidenciaDeseo = apps.get_model('biblioteca', 'CoincidenciaDeseo')
+
+    libros = list(Libro.objects.only('id', 'isbn', 'propietario_id', 'publico', 'titulo_normalizado', 'autor_normalizado'))
+    for libro in libros:
+        libro.isbn_normalizado = normalizar_isbn(libro.isbn)
+    Libro.objects.bulk_update(libros, ['isbn_normalizado'], batch_size=1000)
+
+    deseos = list(ListaDeseos.objects.only('id', 'usuario_id', 'titulo', 'autor', 'isbn'))
+    for deseo in deseos:
+        deseo.titulo_normalizado = normalizar(deseo.titulo)
+        deseo.autor_normalizado = normalizar(deseo.autor)
+        deseo.isbn_normalizado = normalizar_isbn(deseo.isbn)
+    ListaDeseos.objects.bulk_update(
+        deseos, ['titulo_normalizado', 'autor_normalizado', 'isbn_normalizado'], batch_size=1000
+    )
+
+    # Mismo cruce que biblioteca/coincidencias.py: ISBN y luego título y autor
+    por_isbn = defaultdict(list)
+    por_titulo = defaultdict(list)
+    for libro in libros:
+        if not libro.publico:
+            continue
+        if libro.isbn_normalizado:
+            por_isbn[libro.isbn_normalizado].append(libro)
+        por_titulo[libro.titulo_normalizado, libro.autor_normalizado].append(libro)
+    filas = {}
+    for deseo in deseos:
+        candidatos = [('isbn', libro) for libro in por_isbn.get(deseo.isbn_normalizado, ())]
+        candidatos += [('titulo', libro) for libro in por_titulo.get((deseo.titulo_normalizado, deseo.autor_normalizado), ())]
+        for criterio, libro in candidatos:
+            if libro.propietario_id != deseo.usuario_id:
+                filas.setdefault((deseo.pk, libro.pk), criterio)
+    CoincidenciaDeseo.objects.bulk_create(
+        [CoincidenciaDeseo(deseo_id=d, libro_id=l, criterio=c) for (d, l), c in filas.items()],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0011_recomendacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='isbn_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=13),
+        ),
+        migrations.AddField(
+            model_name='listadeseos',
+            name='autor_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='listadeseos',
+            name='isbn_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=13),
+        ),
+        migrations.AddField(
+            model_name='listadeseos',
+            name='titulo_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=300),
+        ),
+        migrations.CreateModel(
+            name='CoincidenciaDeseo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criterio', models.CharField(choices=[('isbn', 'ISBN'), ('titulo', 'Título y autor')], max_length=10)),
+                ('deseo', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='coincidencias', to='biblioteca.listadeseos')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coincidencias_deseos', to='biblioteca.libro')),
+            ],
+            options={
+                'verbose_name': 'Coincidencia de Deseo',
+                'verbose_name_plural': 'Coincidencias de Deseos',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='coincidenciadeseo',
+            constraint=models.UniqueConstraint(fields=('deseo', 'libro'), name='coincidencia_deseo_libro_uniq'),
+        ),
+        migrations.RunPython(rellenar_coincidencias, migrations.RunPython.noop),
+    ]
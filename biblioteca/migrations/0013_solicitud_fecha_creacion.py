@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0012_coincidencia_deseo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='solicitudcontacto',
+            name='fecha_creacion',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
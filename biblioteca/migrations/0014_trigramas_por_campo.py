@@ -0,0 +1,62 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+def reindexar_trigramas(apps, schema_editor):
+    from biblioteca.busqueda import trigramas
+
+    Libro = apps.get_model('biblioteca', 'Libro')
+    TrigramaLibro = apps.get_model('biblioteca', 'TrigramaLibro')
+    TrigramaLibro.objects.all().delete()
+    libros = list(Libro.objects.only('id', 'titulo_normalizado', 'autor_normalizado'))
+    filas = []
+    for libro in libros:
+        titulo = trigramas(libro.titulo_normalizado)
+        autor = trigramas(libro.autor_normalizado)
+        libro.trigramas_titulo = len(titulo)
+        libro.trigramas_autor = len(autor)
+        filas.extend(TrigramaLibro(libro_id=libro.pk, campo=0, trigrama=t) for t in titulo)
+        filas.extend(TrigramaLibro(libro_id=libro.pk, campo=1, trigrama=t) for t in autor)
+    Libro.objects.bulk_update(libros, ['trigramas_titulo', 'trigramas_autor'], batch_size=1000)
+    TrigramaLibro.objects.bulk_create(filas, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0013_solicitud_fecha_creacion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trigramalibro',
+            name='trigrama_libro_idx',
+        ),
+        migrations.AddField(
+            model_name='trigramalibro',
+            name='campo',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Título'), (1, 'Autor')], default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='trigramas_titulo',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='trigramas_autor',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='libro',
+            name='autor_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='trigramalibro',
+            index=models.Index(fields=['trigrama', 'libro', 'campo'], name='trigrama_libro_campo_idx'),
+        ),
+        migrations.RunPython(reindexar_trigramas, migrations.RunPython.noop),
+    ]
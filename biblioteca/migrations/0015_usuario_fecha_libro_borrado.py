@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0014_trigramas_por_campo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='fecha_libro_borrado',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
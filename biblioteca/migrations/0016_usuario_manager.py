@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:36
+
+import biblioteca.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0015_usuario_fecha_libro_borrado'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='usuario',
+            managers=[
+                ('objects', biblioteca.models.UsuarioManager()),
+            ],
+        ),
+    ]
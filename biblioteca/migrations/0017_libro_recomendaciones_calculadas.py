@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:42
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def marcar_calculados(apps, schema_editor):
+    # Los libros que ya tienen recomendaciones se calcularon antes de existir el campo
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Recomendacion = apps.get_model('biblioteca', 'Recomendacion')
+    Libro.objects.filter(
+        pk__in=Recomendacion.objects.values('libro_id'),
+    ).update(recomendaciones_calculadas=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0016_usuario_manager'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='recomendaciones_calculadas',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(marcar_calculados, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,39 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from collections import Counter
+
+from django.db import connections, models, router, transaction
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+
+class UsuarioQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        ``update()`` no pasa por ``save()``: si cambia ``biblioteca_publica``
+        se propaga aquí a ``Libro.publico`` y a las coincidencias de las
+        listas de deseos. ``bulk_update()`` no lo hace; no debe usarse con
+        ese campo.
+        """
+        if 'biblioteca_publica' not in kwargs:
+            return super().update(**kwargs)
+        publica = kwargs['biblioteca_publica']
+        if not isinstance(publica, bool):
+            raise TypeError('biblioteca_publica solo se puede actualizar con True o False')
+        with transaction.atomic(using=self.db):
+            cambiados = list(self.exclude(biblioteca_publica=publica).values_list('pk', flat=True))
+            filas = super().update(**kwargs)
+            if cambiados:
+                Libro.objects.filter(propietario__in=cambiados).update(**Libro.cambios_publico(publica))
+                from .coincidencias import biblioteca_cambiada
+                for usuario in Usuario.objects.filter(pk__in=cambiados).only('pk', 'biblioteca_publica'):
+                    biblioteca_cambiada(usuario)
+        return filas
+    
+    update.alters_data = True
+
+
+class UsuarioManager(UserManager.from_queryset(UsuarioQuerySet)):
+    pass
 
 
 class Usuario(AbstractUser):
@@ -29,13 +62,58 @@ class Usuario(AbstractUser):
     
     fecha_registro = models.DateTimeField(auto_now_add=True)
     
+    # Contadores desnormalizados (ver contadores.py y el comando recount)
+    num_libros = models.PositiveIntegerField(default=0, editable=False, verbose_name='Libros')
+    num_deseos = models.PositiveIntegerField(default=0, editable=False, verbose_name='Deseos')
+    num_prestamos_activos = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Préstamos Activos'
+    )
+    num_solicitudes_pendientes = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Solicitudes Pendientes'
+    )
+    
+    # Último borrado de uno de sus libros: con la fecha de modificación de
+    # los que quedan da el Last-Modified de su biblioteca (condicional.py)
+    fecha_libro_borrado = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = UsuarioManager()
+    
     class Meta:
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Parcial por la misma razón que los índices de Libro.publico
+            models.Index(fields=['rol'], condition=models.Q(biblioteca_publica=True), name='usuario_publica_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} (@{self.username})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valor guardado, para detectar cambios de privacidad en save()
+        instance._biblioteca_publica_guardada = instance.__dict__.get('biblioteca_publica')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Los contadores solo se escriben con F() (contadores.py); un save()
+            # completo pisaría con el valor en memoria los ajustes concurrentes
+            from .contadores import CONTADORES
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in CONTADORES
+            ]
+        super().save(*args, **kwargs)
+        anterior = getattr(self, '_biblioteca_publica_guardada', None)
+        if anterior is not None and anterior != self.biblioteca_publica:
+            # Libro.publico es una copia desnormalizada de este campo
+            self.libros.update(**Libro.cambios_publico(self.biblioteca_publica))
+            from .coincidencias import biblioteca_cambiada
+            biblioteca_cambiada(self)
+        self._biblioteca_publica_guardada = self.biblioteca_publica
+    
     def es_admin(self):
         return self.rol == 'admin'
     
@@ -43,6 +121,38 @@ class Usuario(AbstractUser):
         return self.rol == 'bibliotecario'
 
 
+class LibroQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        ``bulk_create`` no llama a ``save()``: se rellenan aquí las claves
+        normalizadas, se indexan los trigramas de los libros insertados y
+        se cruzan con las listas de deseos.
+        """
+        objs = list(objs)
+        pendientes = {libro.propietario_id for libro in objs if not Libro.propietario.is_cached(libro)}
+        publicos = set(
+            Usuario.objects.filter(pk__in=pendientes, biblioteca_publica=True).values_list('pk', flat=True)
+        ) if pendientes else set()
+        for libro in objs:
+            libro.normalizar_campos()
+            if Libro.propietario.is_cached(libro):
+                libro.publico = libro.propietario.biblioteca_publica
+            else:
+                libro.publico = libro.propietario_id in publicos
+        creados = super().bulk_create(objs, *args, **kwargs)
+        con_pk = [libro for libro in creados if libro.pk]
+        TrigramaLibro.indexar(con_pk)
+        from .coincidencias import emparejar_libros
+        emparejar_libros(con_pk)
+        
+        # Tampoco se emiten señales: contadores de libros por propietario
+        from .contadores import ajustar
+        por_propietario = Counter(libro.propietario_id for libro in con_pk)
+        for propietario_id, nuevos in por_propietario.items():
+            ajustar(propietario_id, num_libros=nuevos)
+        return creados
+
+
 class Libro(models.Model):
     """
     Modelo para representar un libro en la biblioteca personal
@@ -94,6 +204,8 @@ class Libro(models.Model):
         null=True,
         verbose_name='Número de Páginas'
     )
+    # True cuando existen las miniaturas de la portada (ver portadas.py)
+    portada_miniaturas = models.BooleanField(default=False, editable=False)
     
     # Propietario y estado
     propietario = models.ForeignKey(
@@ -115,17 +227,226 @@ class Libro(models.Model):
         verbose_name='Formato'
     )
     
+    # Claves de búsqueda (sin tildes, en minúsculas), calculadas en save()
+    # (con índice el título: coincidencias.py cruza por él con las listas de deseos)
+    titulo_normalizado = models.CharField(max_length=300, blank=True, editable=False, db_index=True)
+    autor_normalizado = models.CharField(max_length=200, blank=True, editable=False)
+    # Trigramas distintos de cada clave, para la similitud de la búsqueda aproximada
+    trigramas_titulo = models.PositiveSmallIntegerField(default=0, editable=False)
+    trigramas_autor = models.PositiveSmallIntegerField(default=0, editable=False)
+    # ISBN-13 sin guiones, para cruzarlo con las listas de deseos
+    isbn_normalizado = models.CharField(max_length=13, blank=True, editable=False, db_index=True)
+    
+    # Copia de propietario.biblioteca_publica para filtrar sin join
+    publico = models.BooleanField(default=False, editable=False)
+    # Último cálculo de sus libros parecidos; vacío si está pendiente
+    # (recomendaciones.py). Se vacía al hacerse pública la biblioteca.
+    recomendaciones_calculadas = models.DateTimeField(null=True, blank=True, editable=False)
+    
     # Metadata
     fecha_agregado = models.DateTimeField(auto_now_add=True)
     fecha_modificado = models.DateTimeField(auto_now=True)
     
+    objects = LibroQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Libro'
         verbose_name_plural = 'Libros'
         ordering = ['-fecha_agregado']
+        indexes = [
+            # Django escribe filter(publico=True) como WHERE "publico", sin '= 1':
+            # SQLite no usa un índice que empiece por la columna, pero sí uno parcial
+            models.Index(
+                fields=['-fecha_agregado', '-id'],
+                condition=models.Q(publico=True),
+                name='libro_publico_reciente_idx',
+            ),
+            models.Index(fields=['propietario', '-fecha_agregado', '-id'], name='libro_propietario_fecha_idx'),
+            models.Index(fields=['isbn'], name='libro_isbn_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
+    
+    @staticmethod
+    def cambios_publico(publico):
+        """
+        Campos que cambian cuando la biblioteca del propietario se hace
+        pública o privada: al volver a ser públicos, sus libros quedan
+        pendientes de recomendaciones.
+        """
+        if publico:
+            return {'publico': True, 'recomendaciones_calculadas': None}
+        return {'publico': False}
+    
+    def normalizar_campos(self):
+        """
+        Recalcula las claves normalizadas; devuelve True si han cambiado las
+        de título o autor (las de la búsqueda aproximada)
+        """
+        from .busqueda import normalizar, normalizar_isbn
+        claves = (normalizar(self.titulo), normalizar(self.autor))
+        cambiado = claves != (self.titulo_normalizado, self.autor_normalizado)
+        self.titulo_normalizado, self.autor_normalizado = claves
+        self.isbn_normalizado = normalizar_isbn(self.isbn)
+        firma = self.firma_trigramas()
+        self.trigramas_titulo = len(firma[TrigramaLibro.TITULO])
+        self.trigramas_autor = len(firma[TrigramaLibro.AUTOR])
+        return cambiado
+    
+    def save(self, *args, **kwargs):
+        isbn_anterior = self.isbn_normalizado
+        reindexar = self.normalizar_campos() or self._state.adding
+        emparejar = reindexar or isbn_anterior != self.isbn_normalizado
+        creado = self._state.adding
+        if creado:
+            self.publico = self.propietario.biblioteca_publica
+        super().save(*args, **kwargs)
+        if reindexar:
+            TrigramaLibro.indexar([self], reemplazar=True)
+        if emparejar:
+            from .coincidencias import emparejar_libros
+            emparejar_libros([self], reemplazar=not creado)
+    
+    def portada_rendicion_url(self, nombre, extension):
+        from .portadas import ruta_rendicion
+        return self.portada.storage.url(ruta_rendicion(self.portada.name, nombre, extension))
+    
+    def _portada_srcset(self, extension):
+        from .portadas import RENDICIONES
+        return ', '.join(
+            f'{self.portada_rendicion_url(nombre, extension)} {ancho}w'
+            for nombre, ancho in RENDICIONES
+        )
+    
+    @property
+    def portada_srcset_webp(self):
+        return self._portada_srcset('webp')
+    
+    @property
+    def portada_srcset_jpg(self):
+        return self._portada_srcset('jpg')
+    
+    @property
+    def portada_tarjeta_url(self):
+        return self.portada_rendicion_url('tarjeta', 'jpg')
+    
+    @property
+    def portada_detalle_url(self):
+        return self.portada_rendicion_url('detalle', 'jpg')
+    
+    def firma_trigramas(self):
+        """Trigramas de título y de autor usados por la búsqueda aproximada"""
+        from .busqueda import trigramas
+        return {
+            TrigramaLibro.TITULO: trigramas(self.titulo_normalizado),
+            TrigramaLibro.AUTOR: trigramas(self.autor_normalizado),
+        }
+
+
+class TrigramaLibro(models.Model):
+    """
+    Índice invertido de trigramas de título y autor para la búsqueda
+    aproximada (una fila por trigrama distinto de cada campo de cada libro)
+    """
+    # 0/1 para que la búsqueda cuente los del autor con un SUM (un
+    # COUNT(... FILTER) convertiría el join en LEFT OUTER y no usaría el índice)
+    TITULO = 0
+    AUTOR = 1
+    CAMPOS = [
+        (TITULO, 'Título'),
+        (AUTOR, 'Autor'),
+    ]
+    
+    libro = models.ForeignKey(
+        Libro,
+        on_delete=models.CASCADE,
+        related_name='trigramas',
+    )
+    campo = models.PositiveSmallIntegerField(choices=CAMPOS)
+    trigrama = models.CharField(max_length=3)
+    
+    class Meta:
+        verbose_name = 'Trigrama de Libro'
+        verbose_name_plural = 'Trigramas de Libros'
+        indexes = [
+            # Cubre la búsqueda: del trigrama al libro y su campo sin leer la tabla
+            models.Index(fields=['trigrama', 'libro', 'campo'], name='trigrama_libro_campo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigrama!r} ({self.libro_id})"
+    
+    @classmethod
+    def indexar(cls, libros, reemplazar=False):
+        """
+        Genera las filas de trigramas de ``libros``. Son decenas por libro,
+        así que se insertan con un ``executemany`` en lugar de crear una
+        instancia del modelo por fila.
+        """
+        if reemplazar:
+            cls.objects.filter(libro__in=[libro.pk for libro in libros]).delete()
+        filas = [
+            (libro.pk, campo, trigrama)
+            for libro in libros
+            for campo, firma in libro.firma_trigramas().items()
+            for trigrama in firma
+        ]
+        if not filas:
+            return
+        qn = connections[router.db_for_write(cls)].ops.quote_name
+        with connections[router.db_for_write(cls)].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {qn(cls._meta.db_table)} ({qn("libro_id")}, {qn("campo")}, {qn("trigrama")}) '
+                'VALUES (%s, %s, %s)',
+                filas,
+            )
+
+
+class Recomendacion(models.Model):
+    """
+    Libros parecidos a cada libro de las bibliotecas públicas, en orden.
+    Los calcula por lotes el comando ``calcular_recomendaciones`` (ver
+    recomendaciones.py); el detalle del libro solo los lee.
+    """
+    # Sin índice propio: lo cubre la restricción única (libro, posicion)
+    libro = models.ForeignKey(
+        Libro,
+        on_delete=models.CASCADE,
+        related_name='recomendaciones',
+        db_index=False,
+    )
+    recomendado = models.ForeignKey(
+        Libro,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    posicion = models.PositiveSmallIntegerField()
+    similitud = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Recomendación'
+        verbose_name_plural = 'Recomendaciones'
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'posicion'], name='recomendacion_libro_posicion_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.libro_id} -> {self.recomendado_id} ({self.similitud:.2f})"
+
+    @classmethod
+    def de_libro(cls, libro):
+        """Libros parecidos a ``libro`` que siguen siendo públicos, en una consulta"""
+        return cls.objects.filter(libro=libro, recomendado__publico=True).select_related(
+            'recomendado__propietario'
+        ).only(
+            'posicion',
+            'recomendado__titulo',
+            'recomendado__autor',
+            'recomendado__propietario__username',
+            'recomendado__propietario__first_name',
+            'recomendado__propietario__last_name',
+        ).order_by('posicion')
 
 
 class Resena(models.Model):
@@ -186,11 +507,27 @@ class Prestamo(models.Model):
         verbose_name='Fecha de Devolución Real'
     )
     notas = models.TextField(blank=True, verbose_name='Notas')
+    # Cuándo se avisó al propietario del retraso (ver recordatorios.py)
+    recordatorio_enviado = models.DateTimeField(blank=True, null=True, editable=False)
     
     class Meta:
         verbose_name = 'Préstamo'
         verbose_name_plural = 'Préstamos'
         ordering = ['-fecha_prestamo']
+        indexes = [
+            # Solo los préstamos activos: una fracción pequeña de la tabla
+            models.Index(
+                fields=['libro', 'fecha_devolucion_esperada'],
+                condition=models.Q(fecha_devolucion_real__isnull=True),
+                name='prestamo_activo_idx',
+            ),
+            # Préstamos activos de los que aún no se ha enviado recordatorio
+            models.Index(
+                fields=['fecha_devolucion_esperada', 'id'],
+                condition=models.Q(fecha_devolucion_real__isnull=True, recordatorio_enviado__isnull=True),
+                name='prestamo_sin_recordatorio_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.libro.titulo} prestado a {self.nombre_prestatario}"
@@ -199,6 +536,29 @@ class Prestamo(models.Model):
     def esta_prestado(self):
         """Devuelve True si el libro está actualmente prestado"""
         return self.fecha_devolucion_real is None
+    
+    @property
+    def dias_retraso(self):
+        """Días que han pasado desde la fecha de devolución esperada (0 si no hay retraso)"""
+        if not self.esta_prestado or not self.fecha_devolucion_esperada:
+            return 0
+        return max((timezone.localdate() - self.fecha_devolucion_esperada).days, 0)
+    
+    @property
+    def vencido(self):
+        return self.dias_retraso > 0
+
+
+class ListaDeseosQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Como en ``LibroQuerySet``: claves normalizadas y coincidencias"""
+        objs = list(objs)
+        for deseo in objs:
+            deseo.normalizar_campos()
+        creados = super().bulk_create(objs, *args, **kwargs)
+        from .coincidencias import emparejar_deseos
+        emparejar_deseos(creados)
+        return creados
 
 
 class ListaDeseos(models.Model):
@@ -226,13 +586,74 @@ class ListaDeseos(models.Model):
     )
     fecha_agregado = models.DateTimeField(auto_now_add=True)
     
+    # Claves para cruzar con los libros públicos, calculadas en save()
+    titulo_normalizado = models.CharField(max_length=300, blank=True, editable=False, db_index=True)
+    autor_normalizado = models.CharField(max_length=200, blank=True, editable=False)
+    isbn_normalizado = models.CharField(max_length=13, blank=True, editable=False, db_index=True)
+    
+    objects = ListaDeseosQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Lista de Deseos'
         verbose_name_plural = 'Listas de Deseos'
         ordering = ['-prioridad', '-fecha_agregado']
+        indexes = [
+            models.Index(fields=['usuario', '-prioridad', '-fecha_agregado'], name='deseo_usuario_prioridad_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
+    
+    def normalizar_campos(self):
+        """Recalcula las claves normalizadas; devuelve True si han cambiado"""
+        from .busqueda import normalizar, normalizar_isbn
+        claves = (normalizar(self.titulo), normalizar(self.autor), normalizar_isbn(self.isbn))
+        cambiado = claves != (self.titulo_normalizado, self.autor_normalizado, self.isbn_normalizado)
+        self.titulo_normalizado, self.autor_normalizado, self.isbn_normalizado = claves
+        return cambiado
+    
+    def save(self, *args, **kwargs):
+        creado = self._state.adding
+        emparejar = self.normalizar_campos() or creado
+        super().save(*args, **kwargs)
+        if emparejar:
+            from .coincidencias import emparejar_deseos
+            emparejar_deseos([self], reemplazar=not creado)
+
+
+class CoincidenciaDeseo(models.Model):
+    """
+    Libro de una biblioteca pública que coincide con un deseo de otro
+    usuario (ver coincidencias.py)
+    """
+    CRITERIOS = [
+        ('isbn', 'ISBN'),
+        ('titulo', 'Título y autor'),
+    ]
+    
+    # Sin índice propio: lo cubre la restricción única (deseo, libro)
+    deseo = models.ForeignKey(
+        ListaDeseos,
+        on_delete=models.CASCADE,
+        related_name='coincidencias',
+        db_index=False,
+    )
+    libro = models.ForeignKey(
+        Libro,
+        on_delete=models.CASCADE,
+        related_name='coincidencias_deseos',
+    )
+    criterio = models.CharField(max_length=10, choices=CRITERIOS)
+    
+    class Meta:
+        verbose_name = 'Coincidencia de Deseo'
+        verbose_name_plural = 'Coincidencias de Deseos'
+        constraints = [
+            models.UniqueConstraint(fields=['deseo', 'libro'], name='coincidencia_deseo_libro_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.deseo_id} -> {self.libro_id} ({self.criterio})"
 
 
 class SolicitudContacto(models.Model):
@@ -271,12 +692,78 @@ class SolicitudContacto(models.Model):
         default='pendiente',
         verbose_name='Estado'
     )
-    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # default y no auto_now_add: las solicitudes diferidas (escrituras.py)
+    # conservan la hora de la petición al insertarse en lote
+    fecha_creacion = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         verbose_name = 'Solicitud de Contacto'
         verbose_name_plural = 'Solicitudes de Contacto'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['bibliotecario', 'estado', '-fecha_creacion'], name='solicitud_bibliotecario_idx'),
+        ]
     
     def __str__(self):
         return f"Solicitud de {self.visitante.username} a {self.bibliotecario.username}"
+
+
+class Tarea(models.Model):
+    """
+    Cola de trabajos en segundo plano guardada en la base de datos.
+    La procesa el comando ``procesar_tareas``.
+    """
+    TIPOS = [
+        ('miniaturas', 'Miniaturas de portada'),
+    ]
+    
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    tipo = models.CharField(max_length=30, choices=TIPOS, verbose_name='Tipo')
+    datos = models.JSONField(default=dict, blank=True, verbose_name='Datos')
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADOS,
+        default='pendiente',
+        verbose_name='Estado'
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name='Intentos')
+    error = models.TextField(blank=True, verbose_name='Último error')
+    trabajador = models.CharField(max_length=100, blank=True, verbose_name='Trabajador')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(blank=True, null=True)
+    fecha_fin = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['estado', 'id'], name='tarea_estado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+
+class EscrituraAplicada(models.Model):
+    """
+    Claves de las escrituras diferidas ya aplicadas (``escrituras.py``).
+    Se guardan en la misma transacción que el lote: si el escritor cae
+    entre el commit y el borrado de los ficheros, al volver no repite
+    ninguna escritura.
+    """
+    clave = models.CharField(max_length=80, unique=True, verbose_name='Clave')
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Escritura aplicada'
+        verbose_name_plural = 'Escrituras aplicadas'
+    
+    def __str__(self):
+        return self.clave
@@ -0,0 +1,194 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En lugar de OFFSET, cada página se pide a partir de los valores de orden
+de la última fila vista, de modo que la página 500 cuesta lo mismo que
+la primera: el índice se recorre desde el cursor y solo se leen
+``por_pagina + 1`` filas.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Como DjangoJSONEncoder pero sin truncar los microsegundos"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar"""
+
+
+class Pagina:
+    """Una página de resultados con sus cursores de navegación"""
+
+    def __init__(self, object_list, siguiente, anterior, paginador):
+        self.object_list = object_list
+        self.cursor_siguiente = siguiente
+        self.cursor_anterior = anterior
+        self.paginador = paginador
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def total(self):
+        return self.paginador.total
+
+
+class KeysetPaginator:
+    """
+    Pagina un queryset sobre una tupla de campos de orden.
+
+    ``orden`` sigue la sintaxis de ``order_by`` (``'-fecha_agregado'``) y
+    debe terminar en un campo único (normalmente ``'-id'``) para que el
+    orden sea estable. Todos los campos se recorren en la misma dirección.
+    """
+
+    def __init__(self, queryset, orden=('-fecha_agregado', '-id'), por_pagina=24, total=None):
+        self.queryset = queryset
+        self.orden = tuple(orden)
+        self.por_pagina = por_pagina
+        self._total = total
+        self.descendente = self.orden[0].startswith('-')
+        self.campos = [campo.lstrip('-') for campo in self.orden]
+
+    @cached_property
+    def total(self):
+        """Número total de resultados, calculado una sola vez"""
+        if self._total is not None:
+            return self._total
+        return self.queryset.count()
+
+    # ------------------------------------------------------------------
+    # Cursores
+    # ------------------------------------------------------------------
+
+    def codificar(self, obj):
+        valores = [getattr(obj, campo) for campo in self.campos]
+        datos = json.dumps(valores, cls=_CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        except (ValueError, TypeError) as exc:
+            raise CursorInvalido(cursor) from exc
+        if not isinstance(valores, list) or len(valores) != len(self.campos):
+            raise CursorInvalido(cursor)
+
+        modelo = self.queryset.model
+        resultado = []
+        for campo, valor in zip(self.campos, valores):
+            try:
+                field = modelo._meta.get_field(campo)
+            except FieldDoesNotExist:
+                # Anotaciones (rango, similitud...): se usan tal cual
+                resultado.append(valor)
+                continue
+            try:
+                resultado.append(field.to_python(valor))
+            except Exception as exc:
+                raise CursorInvalido(cursor) from exc
+        return resultado
+
+    def _filtro_desde(self, valores, hacia_adelante):
+        """
+        Construye ``(a, b) < (x, y)`` como
+        ``a <= x AND (a < x OR (a = x AND b < y))``. La primera condición
+        acota el rango del índice para que SQLite no recorra la tabla.
+        """
+        menor = self.descendente == hacia_adelante
+        operador = 'lt' if menor else 'gt'
+        filtro = Q()
+        for i, campo in enumerate(self.campos):
+            condicion = Q(**{f'{campo}__{operador}': valores[i]})
+            for previo, valor_previo in zip(self.campos[:i], valores[:i]):
+                condicion &= Q(**{previo: valor_previo})
+            filtro |= condicion
+        return Q(**{f'{self.campos[0]}__{operador}e': valores[0]}) & filtro
+
+    def _orden_inverso(self):
+        return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in self.orden]
+
+    # ------------------------------------------------------------------
+    # Páginas
+    # ------------------------------------------------------------------
+
+    def _consulta(self, despues, antes):
+        """Queryset de la página, con una fila de más para saber si hay otra"""
+        if antes:
+            valores = self.decodificar(antes)
+            qs = self.queryset.filter(self._filtro_desde(valores, hacia_adelante=False))
+            return qs.order_by(*self._orden_inverso())[:self.por_pagina + 1]
+
+        qs = self.queryset
+        if despues:
+            valores = self.decodificar(despues)
+            qs = qs.filter(self._filtro_desde(valores, hacia_adelante=True))
+        return qs.order_by(*self.orden)[:self.por_pagina + 1]
+
+    def _construir(self, filas, despues, antes):
+        hay_mas = len(filas) > self.por_pagina
+        filas = filas[:self.por_pagina]
+        if antes:
+            filas.reverse()
+            anterior = self.codificar(filas[0]) if hay_mas and filas else None
+            siguiente = self.codificar(filas[-1]) if filas else None
+        else:
+            siguiente = self.codificar(filas[-1]) if hay_mas else None
+            anterior = self.codificar(filas[0]) if despues and filas else None
+        return Pagina(filas, siguiente, anterior, self)
+
+    def pagina(self, despues=None, antes=None):
+        """
+        Devuelve la página que sigue a ``despues`` o la que precede a
+        ``antes``. Sin cursores, devuelve la primera página.
+        """
+        return self._construir(list(self._consulta(despues, antes)), despues, antes)
+
+    async def apagina(self, despues=None, antes=None):
+        """Como ``pagina`` pero con el ORM asíncrono"""
+        filas = [fila async for fila in self._consulta(despues, antes)]
+        return self._construir(filas, despues, antes)
+
+    async def atotal(self):
+        """Calcula ``total`` con ``acount`` para que la plantilla no consulte"""
+        if 'total' not in self.__dict__:
+            self.__dict__['total'] = (
+                self._total if self._total is not None else await self.queryset.acount()
+            )
+        return self.total
+
+
+def sin_cursor(parametros):
+    """Copia de ``request.GET`` sin ``despues``/``antes``, para enlazar otras páginas"""
+    parametros = parametros.copy()
+    parametros.pop('despues', None)
+    parametros.pop('antes', None)
+    return parametros
@@ -0,0 +1,214 @@
+"""
+Perfilado de peticiones: en qué se va el tiempo de cada una.
+
+``PerfiladoMiddleware`` (activo solo con ``settings.PERFILADO``) mide por
+petición el número y el tiempo de las consultas SQL, el tiempo de render
+de las plantillas (sin contar las consultas que se lanzan durante el
+render) y el tiempo total. Lo devuelve en la cabecera ``Server-Timing``,
+que las herramientas de desarrollo del navegador muestran en la pestaña
+de red, y deja en el logger ``biblioteca.perfilado`` una línea JSON por
+cada petición que supera ``PERFILADO_UMBRAL_MS``, con sus consultas más
+lentas.
+
+La instrumentación solo existe mientras se mide: cada medición pone su
+``execute_wrapper`` en las conexiones del hilo donde se hacen las
+consultas y lo quita al terminar la petición. Bajo ASGI ese hilo no es el
+del middleware sino el de ``sync_to_async``, así que ``amedir`` lo pone y
+lo quita desde allí. El parche de ``Template.render`` lo aplica
+``instrumentar``, que solo llaman los middlewares activos (este y el de
+``metricas.py``).
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+
+logger = logging.getLogger(__name__)
+
+_medicion = ContextVar('medicion_peticion', default=None)
+
+
+class Medicion:
+    """Tiempos acumulados de una petición"""
+
+    def __init__(self, max_lentas):
+        self.inicio = time.perf_counter()
+        self.total = 0.0
+        self.consultas = 0
+        self.sql = 0.0
+        self.plantillas = 0.0
+        self.en_plantilla = False
+        self.max_lentas = max_lentas
+        self.lentas = []  # montículo de (duración, orden, sql) con las más lentas
+
+    def consulta(self, duracion, sql):
+        self.consultas += 1
+        self.sql += duracion
+        if not self.max_lentas:
+            return
+        entrada = (duracion, self.consultas, sql)
+        if len(self.lentas) < self.max_lentas:
+            heapq.heappush(self.lentas, entrada)
+        elif duracion > self.lentas[0][0]:
+            heapq.heapreplace(self.lentas, entrada)
+
+    def terminar(self):
+        self.total = time.perf_counter() - self.inicio
+
+    def server_timing(self):
+        return ', '.join([
+            f'sql;dur={self.sql * 1000:.1f};desc="{self.consultas} consultas"',
+            f'plantillas;dur={self.plantillas * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def registro(self, request, response):
+        coincidencia = request.resolver_match
+        return {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': coincidencia.view_name if coincidencia else None,
+            'estado': response.status_code,
+            'total_ms': round(self.total * 1000, 1),
+            'sql_ms': round(self.sql * 1000, 1),
+            'consultas': self.consultas,
+            'plantillas_ms': round(self.plantillas * 1000, 1),
+            'consultas_lentas': [
+                {'ms': round(duracion * 1000, 2), 'sql': sql[:500]}
+                for duracion, _, sql in sorted(self.lentas, reverse=True)
+            ],
+        }
+
+
+# ====== INSTRUMENTACIÓN ======
+
+def _registrador(medicion):
+    """``execute_wrapper`` de una medición: solo apunta las consultas de su petición"""
+    def registrar_consulta(execute, sql, params, many, context):
+        if _medicion.get() is not medicion:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            medicion.consulta(time.perf_counter() - inicio, sql)
+    return registrar_consulta
+
+
+def _instalar(registrador):
+    """Pone ``registrador`` en las conexiones de este hilo y las devuelve"""
+    conexiones = connections.all()
+    for conexion in conexiones:
+        conexion.execute_wrappers.append(registrador)
+    return conexiones
+
+
+def _retirar(registrador, conexiones):
+    for conexion in conexiones:
+        conexion.execute_wrappers.remove(registrador)
+
+
+_render_original = Template.render
+
+
+def _render_medido(self, context):
+    medicion = _medicion.get()
+    # Las plantillas incluidas se miden con la que las incluye
+    if medicion is None or medicion.en_plantilla:
+        return _render_original(self, context)
+    medicion.en_plantilla = True
+    inicio = time.perf_counter()
+    sql_inicio = medicion.sql
+    try:
+        return _render_original(self, context)
+    finally:
+        medicion.en_plantilla = False
+        medicion.plantillas += (time.perf_counter() - inicio) - (medicion.sql - sql_inicio)
+
+
+@contextmanager
+def medir(max_lentas=0):
+    """
+    Medición de la petición en curso. Si ya hay una (de otro middleware
+    más externo) se comparte en lugar de ocultarla.
+    """
+    actual = _medicion.get()
+    if actual is not None:
+        yield actual
+        return
+    medicion = Medicion(max_lentas)
+    token = _medicion.set(medicion)
+    registrador = _registrador(medicion)
+    conexiones = _instalar(registrador)
+    try:
+        yield medicion
+    finally:
+        _retirar(registrador, conexiones)
+        _medicion.reset(token)
+
+
+@asynccontextmanager
+async def amedir(max_lentas=0):
+    """``medir`` para middlewares asíncronos: el ORM consulta en el hilo de ``sync_to_async``"""
+    actual = _medicion.get()
+    if actual is not None:
+        yield actual
+        return
+    medicion = Medicion(max_lentas)
+    token = _medicion.set(medicion)
+    registrador = _registrador(medicion)
+    conexiones = await sync_to_async(_instalar)(registrador)
+    try:
+        yield medicion
+    finally:
+        await sync_to_async(_retirar)(registrador, conexiones)
+        _medicion.reset(token)
+
+
+def instrumentar():
+    Template.render = _render_medido
+
+
+# ====== MIDDLEWARE ======
+
+class PerfiladoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = settings.PERFILADO_UMBRAL_MS / 1000
+        self.max_lentas = settings.PERFILADO_CONSULTAS_LENTAS
+        instrumentar()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with medir(self.max_lentas) as medicion:
+            response = self.get_response(request)
+        return self.anotar(request, response, medicion)
+
+    async def __acall__(self, request):
+        async with amedir(self.max_lentas) as medicion:
+            response = await self.get_response(request)
+        return self.anotar(request, response, medicion)
+
+    def anotar(self, request, response, medicion):
+        medicion.terminar()
+        response['Server-Timing'] = medicion.server_timing()
+        if medicion.total >= self.umbral:
+            logger.warning(json.dumps(medicion.registro(request, response), ensure_ascii=False))
+        return response
@@ -0,0 +1,135 @@
+"""
+Miniaturas de las portadas.
+
+Cada portada subida se guarda tal cual en ``portadas/`` y, a su lado, se
+generan versiones de ancho fijo en WebP y JPEG::
+
+    portadas/quijote.jpg
+    portadas/quijote_tarjeta.webp   portadas/quijote_tarjeta.jpg
+    portadas/quijote_detalle.webp   portadas/quijote_detalle.jpg
+    portadas/quijote_retina.webp    portadas/quijote_retina.jpg
+
+Las plantillas las sirven con ``srcset``/``sizes`` una vez que
+``Libro.portada_miniaturas`` es True; hasta entonces muestran el original.
+"""
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# (nombre, ancho en píxeles)
+RENDICIONES = [
+    ('tarjeta', 240),
+    ('detalle', 480),
+    ('retina', 960),
+]
+
+# (extensión, formato de Pillow, opciones de guardado)
+FORMATOS = [
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+
+def ruta_rendicion(nombre_original, nombre, extension):
+    """``portadas/quijote.jpg`` -> ``portadas/quijote_tarjeta.webp``"""
+    base, _ = posixpath.splitext(nombre_original)
+    return f'{base}_{nombre}.{extension}'
+
+
+def borrar_portada(nombre_original):
+    """
+    Borra una portada que ya no usa ningún libro junto con sus miniaturas.
+    Cada subida tiene un nombre propio, así que no la comparte otro libro.
+    """
+    from .models import Libro
+
+    storage = Libro._meta.get_field('portada').storage
+    rutas = [nombre_original] + [
+        ruta_rendicion(nombre_original, nombre, extension)
+        for nombre, _ in RENDICIONES
+        for extension, _, _ in FORMATOS
+    ]
+    for ruta in rutas:
+        try:
+            storage.delete(ruta)
+        except OSError:
+            logger.warning('No se pudo borrar %s', ruta, exc_info=True)
+
+
+def renderizar(contenido):
+    """
+    Genera todas las miniaturas a partir de los bytes de la imagen
+    original. Solo usa CPU (sin base de datos ni almacenamiento), para
+    poder ejecutarse en otro proceso.
+
+    Devuelve ``{(nombre, extension): bytes}``.
+    """
+    with Image.open(io.BytesIO(contenido)) as original:
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+
+        resultado = {}
+        for nombre, ancho in RENDICIONES:
+            if imagen.width > ancho:
+                alto = round(imagen.height * ancho / imagen.width)
+                miniatura = imagen.resize((ancho, alto), Image.LANCZOS)
+            else:
+                miniatura = imagen
+
+            for extension, formato, opciones in FORMATOS:
+                salida = miniatura
+                if formato == 'JPEG' and salida.mode == 'RGBA':
+                    # JPEG no admite transparencia: fondo blanco
+                    fondo = Image.new('RGB', salida.size, (255, 255, 255))
+                    fondo.paste(salida, mask=salida.getchannel('A'))
+                    salida = fondo
+                buffer = io.BytesIO()
+                salida.save(buffer, formato, **opciones)
+                resultado[(nombre, extension)] = buffer.getvalue()
+    return resultado
+
+
+def guardar_rendiciones(libro, rendiciones):
+    """Escribe las miniaturas junto al original y marca el libro"""
+    from .models import Libro
+
+    storage = libro.portada.storage
+    for (nombre, extension), contenido in rendiciones.items():
+        ruta = ruta_rendicion(libro.portada.name, nombre, extension)
+        if storage.exists(ruta):
+            storage.delete(ruta)
+        storage.save(ruta, ContentFile(contenido))
+
+    # update() no toca auto_now: se actualiza fecha_modificado a mano
+    Libro.objects.filter(pk=libro.pk, portada=libro.portada.name).update(
+        portada_miniaturas=True,
+        fecha_modificado=timezone.now(),
+    )
+    libro.portada_miniaturas = True
+
+
+def generar_rendiciones(libro):
+    """
+    Genera y guarda las miniaturas de la portada de ``libro``.
+    Devuelve False si la imagen no se ha podido procesar.
+    """
+    if not libro.portada:
+        return False
+    try:
+        with libro.portada.open('rb') as fichero:
+            contenido = fichero.read()
+        rendiciones = renderizar(contenido)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('No se pudieron generar las miniaturas de %s', libro.portada.name, exc_info=True)
+        return False
+    guardar_rendiciones(libro, rendiciones)
+    return True
+
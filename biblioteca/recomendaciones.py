@@ -0,0 +1,282 @@
+"""
+Libros parecidos, calculados por lotes con ``calcular_recomendaciones``.
+
+Cada libro de las bibliotecas públicas es un vector TF-IDF de las palabras
+de su título, autor, editorial y descripción (matriz dispersa de SciPy,
+una fila por libro, normalizada para que el producto sea el coseno). Los
+``K`` libros más parecidos a cada uno se guardan en ``Recomendacion`` y el
+detalle del libro los lee con una consulta por índice.
+
+El cálculo incremental solo busca vecinos para los libros públicos sin
+``recomendaciones_calculadas`` (los nuevos y los de bibliotecas que se
+acaban de hacer públicas; un libro sin vecinos parecidos también queda
+marcado y no se repite) y, a la inversa, coloca a esos libros en las
+listas de los ya calculados a los que se parecen más que alguno de sus
+vecinos. Los IDF cambian poco con cada libro nuevo; ``todos=True`` lo
+recalcula todo y conviene lanzarlo de vez en cuando (también recoge los
+libros editados y los que han dejado de ser públicos).
+"""
+import math
+import time
+from collections import Counter
+
+import numpy as np
+from django.db import connections, router, transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .busqueda import normalizar
+from .models import Libro, Recomendacion
+
+
+# Recomendaciones por libro
+K = 8
+
+# Por debajo de este coseno dos libros no se consideran parecidos
+SIMILITUD_MINIMA = 0.05
+
+# Peso de cada campo en la frecuencia de sus palabras
+PESOS = {'titulo': 3.0, 'autor': 2.0, 'editorial': 1.0, 'descripcion': 1.0}
+
+# Palabras que aparecen en más de esta proporción de libros no ayudan a
+# distinguirlos y hacen denso el producto de matrices
+MAX_PROPORCION_LIBROS = 0.5
+
+# Filas de la matriz que se multiplican de una vez
+LOTE = 500
+
+PALABRAS_VACIAS = frozenset('''
+    los las del una uno unos unas por con para que sus como mas pero sin sobre
+    entre hasta desde este esta esto estos estas ese esa eso ser son fue han hay
+    muy tan ya cuando donde quien cual otro otra otros otras todo toda todos todas
+    the and for with from that this his her its their are was were not but you
+'''.split())
+
+
+class ResultadoRecomendaciones:
+    """Recuento de un cálculo de recomendaciones"""
+
+    def __init__(self):
+        self.libros = 0
+        self.nuevos = 0
+        self.actualizados = 0
+        self.segundos_vectores = 0.0
+        self.segundos_vecinos = 0.0
+
+
+# ====== VECTORES ======
+
+def _palabras(normalizado):
+    return [palabra for palabra in normalizado.split()
+            if len(palabra) > 2 and palabra not in PALABRAS_VACIAS]
+
+
+def terminos(titulo_normalizado, autor_normalizado, editorial, descripcion):
+    """
+    Frecuencias ponderadas de los términos de un libro (título y autor ya
+    normalizados, como se guardan en ``Libro``). Autor y editorial llevan
+    prefijo para no mezclarse con las palabras del texto, y la editorial
+    cuenta entera como un solo término.
+    """
+    frecuencias = Counter()
+    for palabra in _palabras(titulo_normalizado):
+        frecuencias[palabra] += PESOS['titulo']
+    for palabra in _palabras(autor_normalizado):
+        frecuencias['a:' + palabra] += PESOS['autor']
+    if editorial:
+        frecuencias['e:' + normalizar(editorial)] += PESOS['editorial']
+    for palabra in _palabras(normalizar(descripcion)):
+        frecuencias[palabra] += PESOS['descripcion']
+    return frecuencias
+
+
+def vectorizar():
+    """
+    Devuelve ``(ids, matriz, grupos)`` de todos los libros públicos:
+    ``matriz`` es la TF-IDF con filas de norma 1, ya sin las columnas que
+    no pueden acercar a dos libros (términos de un solo libro o de
+    demasiados), y ``grupos`` identifica los ejemplares de un mismo libro
+    (mismo título y autor) para no recomendar una copia de sí mismo.
+    """
+    ids = []
+    grupos = []
+    claves = {}
+    vocabulario = {}
+    columnas = []
+    valores = []
+    punteros = [0]
+    consulta = Libro.objects.filter(publico=True).order_by('id').values_list(
+        'id', 'titulo_normalizado', 'autor_normalizado', 'editorial', 'descripcion',
+    )
+    for pk, titulo, autor, editorial, descripcion in consulta.iterator(chunk_size=2000):
+        ids.append(pk)
+        grupos.append(claves.setdefault((titulo, autor), len(claves)))
+        for termino, frecuencia in terminos(titulo, autor, editorial, descripcion).items():
+            columnas.append(vocabulario.setdefault(termino, len(vocabulario)))
+            valores.append(1 + math.log(frecuencia))
+        punteros.append(len(columnas))
+
+    n = len(ids)
+    if not n:
+        return np.zeros(0, dtype=np.int64), sparse.csr_matrix((0, 0)), np.zeros(0, dtype=np.int64)
+    columnas = np.array(columnas, dtype=np.int32)
+    apariciones = np.bincount(columnas, minlength=len(vocabulario))
+    idf = np.log((1 + n) / (1 + apariciones)) + 1
+    matriz = sparse.csr_matrix(
+        (np.array(valores) * idf[columnas], columnas, np.array(punteros)),
+        shape=(n, len(vocabulario)),
+    )
+    # La norma incluye todos los términos: un libro con mucho texto propio
+    # se parece menos a los demás aunque compartan las mismas palabras
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    normas[normas == 0] = 1
+    matriz = sparse.diags(1 / normas) @ matriz
+    utiles = (apariciones >= 2) & (apariciones <= max(2, MAX_PROPORCION_LIBROS * n))
+    return np.array(ids, dtype=np.int64), matriz[:, utiles].tocsr(), np.array(grupos, dtype=np.int64)
+
+
+# ====== VECINOS ======
+
+def _vecinos(matriz, filas, traspuesta, columnas, grupos, k):
+    """
+    Para cada fila de ``filas``, sus ``k`` mejores columnas de entre
+    ``columnas`` (``traspuesta`` es ``matriz[columnas].T``). Devuelve
+    ``{fila: (posiciones, similitudes)}`` en orden descendente.
+    """
+    similitudes = (matriz[filas] @ traspuesta).tocsr()
+    resultado = {}
+    for r, fila in enumerate(filas):
+        inicio, fin = similitudes.indptr[r], similitudes.indptr[r + 1]
+        posiciones = columnas[similitudes.indices[inicio:fin]]
+        valores = similitudes.data[inicio:fin]
+        validas = (grupos[posiciones] != grupos[fila]) & (valores >= SIMILITUD_MINIMA)
+        posiciones, valores = posiciones[validas], valores[validas]
+        if len(valores) > k:
+            # Selección parcial: el producto es casi denso y ordenarlo entero cuesta más
+            mejores = np.argpartition(-valores, k)[:k]
+            posiciones, valores = posiciones[mejores], valores[mejores]
+        # Empates por posición para que el resultado no dependa del orden
+        orden = np.lexsort((posiciones, -valores))
+        resultado[fila] = (posiciones[orden], valores[orden])
+    return resultado
+
+
+def _en_lotes(filas, matriz, traspuesta, columnas, grupos, k):
+    resultado = {}
+    for inicio in range(0, len(filas), LOTE):
+        resultado.update(_vecinos(matriz, filas[inicio:inicio + LOTE], traspuesta, columnas, grupos, k))
+    return resultado
+
+
+def _como_lista(ids, posiciones, valores):
+    return list(zip(ids[posiciones].tolist(), valores.tolist()))
+
+
+def _trozos(elementos, tamano=500):
+    elementos = list(elementos)
+    for inicio in range(0, len(elementos), tamano):
+        yield elementos[inicio:inicio + tamano]
+
+
+def _guardadas(libros):
+    """Recomendaciones guardadas de ``libros``: ``{libro_id: [(recomendado_id, similitud)]}``"""
+    guardadas = {}
+    for trozo in _trozos(libros):
+        for libro_id, recomendado_id, similitud in Recomendacion.objects.filter(
+            libro_id__in=trozo
+        ).order_by('libro_id', 'posicion').values_list('libro_id', 'recomendado_id', 'similitud'):
+            guardadas.setdefault(libro_id, []).append((recomendado_id, similitud))
+    return guardadas
+
+
+def _guardar(listas):
+    """
+    Reemplaza las recomendaciones de los libros de ``listas``. Va en
+    transacciones cortas para no retener el bloqueo de escritura de SQLite.
+    Las filas nuevas tienen ids mayores, así que el ETag del detalle
+    (condicional.py) cambia sin tocar los libros.
+    """
+    tabla = connections[router.db_for_write(Recomendacion)].ops.quote_name(Recomendacion._meta.db_table)
+    for trozo in _trozos(listas):
+        filas = [
+            (libro_id, recomendado_id, posicion, similitud)
+            for libro_id in trozo
+            for posicion, (recomendado_id, similitud) in enumerate(listas[libro_id])
+        ]
+        with transaction.atomic(using=router.db_for_write(Recomendacion)):
+            Recomendacion.objects.filter(libro_id__in=trozo).delete()
+            if filas:
+                with connections[router.db_for_write(Recomendacion)].cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {tabla} (libro_id, recomendado_id, posicion, similitud) '
+                        'VALUES (%s, %s, %s, %s)',
+                        filas,
+                    )
+
+
+def _marcar_calculados(libros):
+    """Los libros ya buscados, tengan o no vecinos, no vuelven a ser nuevos"""
+    ahora = timezone.now()
+    for trozo in _trozos(libros):
+        Libro.objects.filter(pk__in=trozo).update(recomendaciones_calculadas=ahora)
+
+
+def calcular(todos=False, k=K):
+    """
+    Calcula las recomendaciones de los libros nuevos (o de todos) y
+    guarda las listas que cambian. Devuelve un ``ResultadoRecomendaciones``.
+    """
+    resultado = ResultadoRecomendaciones()
+    inicio = time.perf_counter()
+    ids, matriz, grupos = vectorizar()
+    resultado.libros = len(ids)
+    resultado.segundos_vectores = time.perf_counter() - inicio
+    if not len(ids):
+        return resultado
+
+    inicio = time.perf_counter()
+    publicos = set(ids.tolist())
+    if todos:
+        nuevas = np.arange(len(ids))
+        # Los libros que han dejado de ser públicos pierden sus recomendaciones
+        Recomendacion.objects.filter(libro__publico=False).delete()
+    else:
+        pendientes = set(Libro.objects.filter(
+            publico=True, recomendaciones_calculadas__isnull=True,
+        ).values_list('id', flat=True))
+        nuevas = np.array([fila for fila, pk in enumerate(ids.tolist()) if pk in pendientes], dtype=np.int64)
+    resultado.nuevos = len(nuevas)
+
+    listas = {}
+    if len(nuevas):
+        todas = np.arange(len(ids))
+        vecinos = _en_lotes(nuevas, matriz, matriz.T.tocsr(), todas, grupos, k)
+        listas = {int(ids[fila]): _como_lista(ids, *par) for fila, par in vecinos.items()}
+
+    candidatos = {}
+    antiguas = np.setdiff1d(np.arange(len(ids)), nuevas)
+    if len(nuevas) and len(antiguas):
+        # Los libros nuevos que podrían entrar en las listas ya calculadas
+        vecinos = _en_lotes(antiguas, matriz, matriz[nuevas].T.tocsr(), nuevas, grupos, k)
+        candidatos = {
+            int(ids[fila]): _como_lista(ids, *par)
+            for fila, par in vecinos.items() if len(par[0])
+        }
+
+    guardadas = _guardadas(set(listas) | set(candidatos))
+    for libro_id, nuevos in candidatos.items():
+        combinados = {recomendado: similitud for recomendado, similitud in guardadas.get(libro_id, [])
+                      if recomendado in publicos}
+        combinados.update(nuevos)
+        listas[libro_id] = sorted(combinados.items(), key=lambda par: (-par[1], par[0]))[:k]
+
+    # Solo se reescriben las listas con otros libros u otro orden
+    cambiadas = {
+        libro_id: lista for libro_id, lista in listas.items()
+        if [pk for pk, _ in lista] != [pk for pk, _ in guardadas.get(libro_id, [])]
+    }
+    _guardar(cambiadas)
+    _marcar_calculados(ids[nuevas].tolist())
+    resultado.actualizados = len(cambiadas)
+    resultado.segundos_vecinos = time.perf_counter() - inicio
+    return resultado
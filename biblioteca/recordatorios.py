@@ -0,0 +1,118 @@
+"""
+Recordatorios de préstamos vencidos.
+
+Los préstamos activos cuya fecha de devolución esperada ya ha pasado se
+leen primero como pares ``(id, propietario)`` sobre el índice parcial
+``prestamo_sin_recordatorio_idx`` y se agrupan por propietario. Después se
+cargan por lotes de propietarios completos, así que cada uno recibe un
+único correo por ejecución con todos sus préstamos vencidos. Los correos
+de un lote se envían por una sola conexión y, al terminar, los préstamos
+avisados se marcan con ``recordatorio_enviado`` en un único ``UPDATE``.
+Volver a ejecutar el envío no repite avisos: solo se leen préstamos sin
+marcar.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Prestamo
+
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+
+PLANTILLA_ASUNTO = 'biblioteca/emails/recordatorio_prestamos_asunto.txt'
+PLANTILLA_CUERPO = 'biblioteca/emails/recordatorio_prestamos.txt'
+
+
+class ResultadoRecordatorios:
+    """Recuento de un envío de recordatorios"""
+
+    def __init__(self):
+        self.prestamos = 0
+        self.correos = 0
+        self.sin_email = 0
+        self.fallidos = 0
+
+
+def vencidos_sin_recordatorio(hoy=None):
+    """Préstamos activos y vencidos de los que no se ha avisado todavía"""
+    return Prestamo.objects.filter(
+        fecha_devolucion_real__isnull=True,
+        recordatorio_enviado__isnull=True,
+        fecha_devolucion_esperada__lt=hoy or timezone.localdate(),
+    )
+
+
+def mensaje_recordatorio(propietario, prestamos):
+    contexto = {'propietario': propietario, 'prestamos': prestamos}
+    asunto = ' '.join(render_to_string(PLANTILLA_ASUNTO, contexto).split())
+    return EmailMessage(
+        subject=asunto,
+        body=render_to_string(PLANTILLA_CUERPO, contexto),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[propietario.email],
+    )
+
+
+def _enviar_lote(prestamos, conexion, resultado, simular):
+    por_propietario = defaultdict(list)
+    for prestamo in prestamos:
+        por_propietario[prestamo.libro.propietario].append(prestamo)
+
+    avisados = []
+    for propietario, suyos in por_propietario.items():
+        if not propietario.email:
+            resultado.sin_email += len(suyos)
+            continue
+        if not simular:
+            try:
+                conexion.send_messages([mensaje_recordatorio(propietario, suyos)])
+            except Exception:
+                # Queda sin marcar: se reintentará en la próxima ejecución
+                logger.exception('No se pudo enviar el recordatorio a %s', propietario.email)
+                resultado.fallidos += len(suyos)
+                continue
+        resultado.correos += 1
+        avisados.extend(prestamo.pk for prestamo in suyos)
+
+    if avisados and not simular:
+        Prestamo.objects.filter(pk__in=avisados).update(recordatorio_enviado=timezone.now())
+    resultado.prestamos += len(avisados)
+
+
+def enviar_recordatorios(hoy=None, lote=TAMANO_LOTE, simular=False, progreso=None):
+    """
+    Avisa a cada propietario de sus préstamos vencidos. Con ``simular``
+    no se envía ni se marca nada. Devuelve un ``ResultadoRecordatorios``.
+    """
+    resultado = ResultadoRecordatorios()
+    vencidos = vencidos_sin_recordatorio(hoy).order_by('fecha_devolucion_esperada', 'id')
+    pendientes = defaultdict(list)
+    for pk, propietario_id in vencidos.values_list('pk', 'libro__propietario_id').iterator():
+        pendientes[propietario_id].append(pk)
+
+    def enviar(ids):
+        # Se vuelve a filtrar por si alguno se ha devuelto o avisado mientras tanto
+        prestamos = vencidos.filter(pk__in=ids).select_related('libro__propietario')
+        _enviar_lote(prestamos, conexion, resultado, simular)
+        if progreso:
+            progreso(resultado)
+
+    conexion = get_connection()
+    ids = []
+    with conexion:
+        # Un lote puede pasar de ``lote`` préstamos: un propietario no se parte
+        for suyos in pendientes.values():
+            ids.extend(suyos)
+            if len(ids) >= lote:
+                enviar(ids)
+                ids = []
+        if ids:
+            enviar(ids)
+    return resultado
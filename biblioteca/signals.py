@@ -0,0 +1,122 @@
+"""
+Señales que mantienen los contadores desnormalizados de ``Usuario``, la
+fecha de modificación de los libros y los ficheros de sus portadas.
+
+Se usan señales (y no ``save()``/``delete()``) porque también se emiten
+en los borrados en cascada: al borrar un libro se descuentan sus
+préstamos activos, y al borrar un usuario todo lo suyo.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .contadores import ajustar
+from .portadas import borrar_portada
+from .models import Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto
+
+
+# ====== LIBROS ======
+
+@receiver(post_save, sender=Libro)
+def libro_guardado(sender, instance, created, **kwargs):
+    if created:
+        ajustar(instance.propietario_id, num_libros=1)
+
+
+@receiver(post_delete, sender=Libro)
+def libro_borrado(sender, instance, **kwargs):
+    # El libro ya no cuenta en Max(fecha_modificado): la fecha del borrado
+    # hace avanzar el Last-Modified de la biblioteca (condicional.py)
+    ajustar(instance.propietario_id, fijar={'fecha_libro_borrado': timezone.now()}, num_libros=-1)
+
+
+@receiver(post_delete, sender=Libro)
+def portada_huerfana(sender, instance, **kwargs):
+    # La portada y sus miniaturas se quedarían en disco. Tras el commit: si
+    # el borrado se deshace, el libro sigue necesitándolas.
+    if instance.portada:
+        transaction.on_commit(partial(borrar_portada, instance.portada.name))
+
+
+# ====== LISTA DE DESEOS ======
+
+@receiver(post_save, sender=ListaDeseos)
+def deseo_guardado(sender, instance, created, **kwargs):
+    if created:
+        ajustar(instance.usuario_id, num_deseos=1)
+
+
+@receiver(post_delete, sender=ListaDeseos)
+def deseo_borrado(sender, instance, **kwargs):
+    ajustar(instance.usuario_id, num_deseos=-1)
+
+
+# ====== PRÉSTAMOS ======
+
+_SIN_CARGAR = object()
+
+
+@receiver(post_init, sender=Prestamo)
+def prestamo_cargado(sender, instance, **kwargs):
+    # Estado al cargar, para saber en post_save si el préstamo se ha cerrado.
+    # Si el campo está diferido no se consulta (None = desconocido).
+    devolucion = instance.__dict__.get('fecha_devolucion_real', _SIN_CARGAR)
+    instance._activo_guardado = None if devolucion is _SIN_CARGAR else devolucion is None
+
+
+def _propietario_prestamo(prestamo):
+    return Libro.objects.filter(pk=prestamo.libro_id).values_list('propietario_id', flat=True).first()
+
+
+@receiver(post_save, sender=Prestamo)
+def prestamo_guardado(sender, instance, created, **kwargs):
+    anterior = False if created else instance._activo_guardado
+    if anterior is not None and anterior != instance.esta_prestado:
+        delta = 1 if instance.esta_prestado else -1
+        ajustar(_propietario_prestamo(instance), num_prestamos_activos=delta)
+    instance._activo_guardado = instance.esta_prestado
+
+
+@receiver(post_delete, sender=Prestamo)
+def prestamo_borrado(sender, instance, **kwargs):
+    if instance._activo_guardado:
+        ajustar(_propietario_prestamo(instance), num_prestamos_activos=-1)
+
+
+# ====== SOLICITUDES DE CONTACTO ======
+
+@receiver(post_init, sender=SolicitudContacto)
+def solicitud_cargada(sender, instance, **kwargs):
+    estado = instance.__dict__.get('estado', _SIN_CARGAR)
+    instance._pendiente_guardada = None if estado is _SIN_CARGAR else estado == 'pendiente'
+
+
+@receiver(post_save, sender=SolicitudContacto)
+def solicitud_guardada(sender, instance, created, **kwargs):
+    pendiente = instance.estado == 'pendiente'
+    anterior = False if created else instance._pendiente_guardada
+    if anterior is not None and anterior != pendiente:
+        ajustar(instance.bibliotecario_id, num_solicitudes_pendientes=1 if pendiente else -1)
+    instance._pendiente_guardada = pendiente
+
+
+@receiver(post_delete, sender=SolicitudContacto)
+def solicitud_borrada(sender, instance, **kwargs):
+    if instance._pendiente_guardada:
+        ajustar(instance.bibliotecario_id, num_solicitudes_pendientes=-1)
+
+
+# ====== FECHA DE MODIFICACIÓN DEL LIBRO ======
+
+@receiver(post_save, sender=Resena)
+@receiver(post_delete, sender=Resena)
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+def libro_tocado(sender, instance, **kwargs):
+    # La reseña y los préstamos se muestran en el detalle del libro: su
+    # fecha_modificado invalida los ETag (condicional.py) y las tarjetas
+    # cacheadas (fragmentos.py). update() no vuelve a emitir señales.
+    Libro.objects.filter(pk=instance.libro_id).update(fecha_modificado=timezone.now())
@@ -0,0 +1,31 @@
+"""
+Ajustes de SQLite para producción.
+
+Cada conexión nueva recibe los ``PRAGMA`` de ``settings.SQLITE_PRAGMAS``
+(señal ``connection_created``; Django 5.0 no admite ``init_command`` en
+SQLite). Con ``journal_mode=wal`` los lectores no bloquean al escritor
+ni el escritor a los lectores, y con ``synchronous=normal`` solo se
+sincroniza el disco en cada checkpoint: una transacción confirmada puede
+perderse si se va la luz, pero la base de datos no se corrompe.
+``busy_timeout`` hace que un escritor espere al otro en lugar de fallar
+con "database is locked".
+
+Los ``PRAGMA`` se ejecutan sobre la conexión de ``sqlite3`` directamente
+para que no cuenten como consultas de la petición.
+"""
+from django.conf import settings
+
+
+# Solo tienen sentido con un fichero: en memoria no hay diario ni mmap
+SOLO_EN_FICHERO = {'journal_mode', 'mmap_size'}
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    """Receptor de ``connection_created``"""
+    if connection.vendor != 'sqlite':
+        return
+    en_memoria = connection.is_in_memory_db()
+    for nombre, valor in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if en_memoria and nombre in SOLO_EN_FICHERO:
+            continue
+        connection.connection.execute(f'PRAGMA {nombre} = {valor}')
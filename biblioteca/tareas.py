@@ -0,0 +1,156 @@
+"""
+Cola de tareas en segundo plano respaldada por la base de datos.
+
+Las vistas solo encolan (una fila en ``Tarea``) y responden enseguida;
+el comando ``procesar_tareas`` reclama las tareas pendientes y ejecuta el
+trabajo pesado de CPU (Pillow) en un pool de procesos. Al estar en la
+base de datos, la cola sobrevive a reinicios y no necesita un broker.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Libro, Tarea
+from . import portadas
+
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 3
+
+# Tareas 'en_curso' más antiguas se consideran huérfanas (trabajador caído)
+TIEMPO_MAXIMO_EN_CURSO = timedelta(minutes=10)
+
+
+def identificador_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ----------------------------------------------------------------------
+# Encolado (ruta de la petición)
+# ----------------------------------------------------------------------
+
+def encolar(tipo, **datos):
+    return Tarea.objects.create(tipo=tipo, datos=datos)
+
+
+def encolar_miniaturas(libro, anterior=''):
+    """
+    Marca la portada como pendiente de miniaturas y encola su
+    generación. Mientras tanto las plantillas muestran el original.
+    ``anterior`` es el nombre de la portada sustituida (o quitada): la
+    tarea la borra junto con sus miniaturas.
+    """
+    if anterior == libro.portada.name:
+        anterior = ''
+    if libro.portada_miniaturas:
+        # Se toca fecha_modificado para invalidar las tarjetas cacheadas
+        ahora = timezone.now()
+        Libro.objects.filter(pk=libro.pk).update(portada_miniaturas=False, fecha_modificado=ahora)
+        libro.portada_miniaturas = False
+        libro.fecha_modificado = ahora
+    if anterior:
+        # Siempre se encola: hay ficheros que borrar aunque haya otra pendiente
+        return encolar('miniaturas', libro_id=libro.pk, anterior=anterior)
+    if not libro.portada:
+        return None
+    ya_pendiente = Tarea.objects.filter(
+        tipo='miniaturas', estado='pendiente', datos__libro_id=libro.pk
+    ).exists()
+    if ya_pendiente:
+        return None
+    return encolar('miniaturas', libro_id=libro.pk)
+
+
+# ----------------------------------------------------------------------
+# Consumo (comando procesar_tareas)
+# ----------------------------------------------------------------------
+
+def recuperar_huerfanas():
+    """
+    Devuelve a la cola las tareas de trabajadores que ya no responden. Se
+    llama en cada vuelta del trabajador, no solo al arrancar. Cuenta como
+    un intento: una tarea que tumba al trabajador acaba como fallida en
+    lugar de tumbarlo una y otra vez.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        recuperadas = Tarea.objects.filter(
+            estado='en_curso', fecha_inicio__lt=ahora - TIEMPO_MAXIMO_EN_CURSO
+        ).update(
+            estado='pendiente',
+            trabajador='',
+            intentos=F('intentos') + 1,
+            error='El trabajador dejó de responder',
+        )
+        if recuperadas:
+            Tarea.objects.filter(estado='pendiente', intentos__gte=MAX_INTENTOS).update(
+                estado='fallida', fecha_fin=ahora
+            )
+    return recuperadas
+
+
+def reclamar(limite, trabajador):
+    """
+    Reserva hasta ``limite`` tareas pendientes para ``trabajador``. El
+    UPDATE condicionado a ``estado='pendiente'`` garantiza que dos
+    trabajadores nunca reclaman la misma tarea.
+    """
+    with transaction.atomic():
+        ids = list(
+            Tarea.objects.filter(estado='pendiente')
+            .order_by('id')
+            .values_list('id', flat=True)[:limite]
+        )
+        if not ids:
+            return []
+        Tarea.objects.filter(pk__in=ids, estado='pendiente').update(
+            estado='en_curso',
+            trabajador=trabajador,
+            fecha_inicio=timezone.now(),
+        )
+    return list(Tarea.objects.filter(pk__in=ids, estado='en_curso', trabajador=trabajador))
+
+
+def completar(tarea):
+    tarea.estado = 'completada'
+    tarea.error = ''
+    tarea.fecha_fin = timezone.now()
+    tarea.save(update_fields=['estado', 'error', 'fecha_fin'])
+
+
+def fallar(tarea, error):
+    """Reintenta la tarea hasta ``MAX_INTENTOS`` veces"""
+    tarea.intentos += 1
+    tarea.error = str(error)[:2000]
+    tarea.trabajador = ''
+    if tarea.intentos >= MAX_INTENTOS:
+        tarea.estado = 'fallida'
+        tarea.fecha_fin = timezone.now()
+        logger.error('Tarea %s fallida definitivamente: %s', tarea.pk, error)
+    else:
+        tarea.estado = 'pendiente'
+    tarea.save(update_fields=['intentos', 'error', 'trabajador', 'estado', 'fecha_fin'])
+
+
+def preparar_miniaturas(tarea):
+    """
+    Borra la portada sustituida con sus miniaturas, lee la actual en el
+    proceso principal y devuelve ``(libro, contenido)``, o None si ya no
+    hay nada que hacer.
+    """
+    libro = Libro.objects.filter(pk=tarea.datos.get('libro_id')).only(
+        'id', 'portada', 'portada_miniaturas'
+    ).first()
+    anterior = tarea.datos.get('anterior')
+    if anterior and (libro is None or libro.portada.name != anterior):
+        portadas.borrar_portada(anterior)
+    if libro is None or not libro.portada:
+        return None
+    with libro.portada.open('rb') as fichero:
+        return libro, fichero.read()
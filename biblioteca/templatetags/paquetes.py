@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..estaticos import AlmacenEstaticos, ruta_paquete
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hojas_estilo(context):
+    """
+    Enlaza la hoja de estilos de la versión de la interfaz de la sesión:
+    el paquete único si los estáticos se han recopilado con
+    ``AlmacenEstaticos`` y, si no, cada fichero del paquete por separado.
+    """
+    version = context['request'].session.get('version', 'normal')
+    if version not in settings.PAQUETES_CSS:
+        version = 'normal'
+    if isinstance(staticfiles_storage, AlmacenEstaticos):
+        rutas = [ruta_paquete(version)]
+    else:
+        rutas = settings.PAQUETES_CSS[version]
+    return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((static(ruta),) for ruta in rutas))
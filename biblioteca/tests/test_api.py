@@ -0,0 +1,102 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from biblioteca.models import Libro, SolicitudContacto, Usuario
+
+
+class APITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lectora = Usuario.objects.create_user(
+            'lectora', password='x', rol='bibliotecario', biblioteca_publica=True,
+        )
+        cls.privada = Usuario.objects.create_user('privada', password='x', rol='bibliotecario')
+        cls.visitante = Usuario.objects.create_user('visita', password='x')
+        cls.libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=cls.lectora)
+        cls.libro_privado = Libro.objects.create(titulo='Ficciones', autor='Borges', propietario=cls.privada)
+
+    def setUp(self):
+        self.client.force_login(self.visitante)
+
+    def enviar(self, metodo, url, datos):
+        cuerpo = datos if isinstance(datos, (str, bytes)) else json.dumps(datos)
+        return getattr(self.client, metodo)(url, cuerpo, content_type='application/json')
+
+    def assertError(self, respuesta, estado):
+        self.assertEqual(respuesta.status_code, estado)
+        self.assertIn('error', respuesta.json())
+        return respuesta.json()
+
+    def test_sin_sesion(self):
+        self.client.logout()
+        self.assertError(self.client.get(reverse('api_libros')), 401)
+
+    def test_metodo_no_permitido(self):
+        respuesta = self.client.delete(reverse('api_libros'))
+        self.assertError(respuesta, 405)
+        self.assertEqual(respuesta['Allow'], 'GET, POST')
+
+    def test_parametros_de_listado(self):
+        url = reverse('api_biblioteca_libros', args=['lectora'])
+        self.assertError(self.client.get(url, {'limite': 'muchos'}), 400)
+        self.assertError(self.client.get(url, {'despues': 'basura!'}), 400)
+        datos = self.assertError(self.client.get(url, {'fields': 'titulo,color'}), 400)
+        self.assertIn('titulo', datos['detalles']['disponibles'])
+
+    def test_listado_con_fields_y_limite(self):
+        url = reverse('api_biblioteca_libros', args=['lectora'])
+        respuesta = self.client.get(url, {'fields': 'titulo', 'limite': 1})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resultados'], [{'titulo': 'Rayuela'}])
+
+    def test_biblioteca_privada(self):
+        self.assertError(self.client.get(reverse('api_biblioteca_libros', args=['privada'])), 403)
+        self.assertError(self.client.get(reverse('api_libro', args=[self.libro_privado.pk])), 403)
+
+    def test_cuerpo_no_valido(self):
+        self.assertError(self.enviar('post', reverse('api_libros'), '{no es json'), 400)
+        self.assertError(self.enviar('post', reverse('api_libros'), [1, 2]), 400)
+
+    def test_crear_libro_valida_los_campos(self):
+        datos = self.assertError(self.enviar('post', reverse('api_libros'), {'autor': 'Alguien'}), 400)
+        self.assertIn('titulo', datos['detalles'])
+        datos = self.assertError(
+            self.enviar('post', reverse('api_libros'), {'titulo': 'X', 'autor': 'Y', 'publico': True}), 400,
+        )
+        self.assertIn('editables', datos['detalles'])
+        respuesta = self.enviar('post', reverse('api_libros'), {'titulo': 'Nuevo', 'autor': 'Alguien'})
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(Libro.objects.get(pk=respuesta.json()['id']).propietario, self.visitante)
+
+    def test_libro_ajeno_no_se_modifica(self):
+        url = reverse('api_libro', args=[self.libro.pk])
+        self.assertError(self.enviar('patch', url, {'titulo': 'Otro'}), 403)
+
+    def test_solicitudes(self):
+        url = reverse('api_solicitudes')
+        datos = self.assertError(self.enviar('post', url, {'mensaje': 'Hola'}), 400)
+        self.assertIn('libro', datos['detalles'])
+        self.assertError(self.enviar('post', url, {'libro': self.libro_privado.pk, 'mensaje': 'Hola'}), 403)
+        self.assertError(self.enviar('post', url, {'libro': self.libro.pk}), 400)
+
+        respuesta = self.enviar('post', url, {'libro': self.libro.pk, 'mensaje': '¿Me lo prestas?'})
+        self.assertEqual(respuesta.status_code, 201)
+        solicitud = SolicitudContacto.objects.get(pk=respuesta.json()['id'])
+        self.assertEqual((solicitud.visitante, solicitud.bibliotecario), (self.visitante, self.lectora))
+
+    def test_solicitud_a_uno_mismo(self):
+        self.client.force_login(self.lectora)
+        datos = {'libro': self.libro.pk, 'mensaje': 'Hola'}
+        self.assertError(self.enviar('post', reverse('api_solicitudes'), datos), 400)
+
+    def test_solo_el_bibliotecario_cambia_el_estado(self):
+        solicitud = SolicitudContacto.objects.create(
+            visitante=self.visitante, bibliotecario=self.lectora, libro=self.libro, mensaje='Hola',
+        )
+        url = reverse('api_solicitud', args=[solicitud.pk])
+        self.assertError(self.enviar('patch', url, {'estado': 'respondida'}), 403)
+        self.client.force_login(self.lectora)
+        self.assertError(self.enviar('patch', url, {'estado': 'inventado'}), 400)
+        self.assertEqual(self.enviar('patch', url, {'estado': 'respondida'}).status_code, 200)
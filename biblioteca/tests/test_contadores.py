@@ -0,0 +1,100 @@
+from datetime import date
+
+from django.test import TestCase
+
+from biblioteca.contadores import descuadres, recontar
+from biblioteca.models import Libro, ListaDeseos, Prestamo, SolicitudContacto, Usuario
+
+
+class ContadoresTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.propietario = Usuario.objects.create_user('lectora', password='x', rol='bibliotecario')
+        cls.visitante = Usuario.objects.create_user('visita', password='x')
+
+    def contador(self, campo, usuario=None):
+        return Usuario.objects.values_list(campo, flat=True).get(pk=(usuario or self.propietario).pk)
+
+    def test_libros(self):
+        libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=self.propietario)
+        self.assertEqual(self.contador('num_libros'), 1)
+        libro.delete()
+        self.assertEqual(self.contador('num_libros'), 0)
+
+    def test_borrar_libro_fija_fecha_libro_borrado(self):
+        libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=self.propietario)
+        libro.delete()
+        self.assertIsNotNone(self.contador('fecha_libro_borrado'))
+
+    def test_bulk_create_de_libros(self):
+        Libro.objects.bulk_create(
+            Libro(titulo=f'Libro {n}', autor='Autora', propietario=self.propietario) for n in range(3)
+        )
+        self.assertEqual(self.contador('num_libros'), 3)
+
+    def test_deseos(self):
+        deseo = ListaDeseos.objects.create(usuario=self.visitante, titulo='Ficciones', autor='Borges')
+        self.assertEqual(self.contador('num_deseos', self.visitante), 1)
+        deseo.delete()
+        self.assertEqual(self.contador('num_deseos', self.visitante), 0)
+
+    def test_prestamos_activos(self):
+        libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=self.propietario)
+        prestamo = Prestamo.objects.create(libro=libro, nombre_prestatario='Ana', fecha_prestamo=date(2025, 1, 1))
+        self.assertEqual(self.contador('num_prestamos_activos'), 1)
+        prestamo.fecha_devolucion_real = date(2025, 2, 1)
+        prestamo.save()
+        self.assertEqual(self.contador('num_prestamos_activos'), 0)
+        # Borrar un préstamo ya devuelto no descuenta nada
+        prestamo.delete()
+        self.assertEqual(self.contador('num_prestamos_activos'), 0)
+
+    def test_borrar_libro_descuenta_sus_prestamos_activos(self):
+        libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=self.propietario)
+        Prestamo.objects.create(libro=libro, nombre_prestatario='Ana', fecha_prestamo=date(2025, 1, 1))
+        libro.delete()
+        self.assertEqual(self.contador('num_prestamos_activos'), 0)
+
+    def test_solicitudes_pendientes(self):
+        solicitud = SolicitudContacto.objects.create(
+            visitante=self.visitante, bibliotecario=self.propietario, mensaje='Hola',
+        )
+        self.assertEqual(self.contador('num_solicitudes_pendientes'), 1)
+        solicitud.estado = 'respondida'
+        solicitud.save()
+        self.assertEqual(self.contador('num_solicitudes_pendientes'), 0)
+
+    def test_recontar_corrige_los_descuadres(self):
+        Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=self.propietario)
+        Usuario.objects.filter(pk=self.propietario.pk).update(num_libros=7, num_deseos=3)
+        self.assertEqual(list(descuadres().values_list('pk', flat=True)), [self.propietario.pk])
+        recontar()
+        self.assertFalse(descuadres().exists())
+        self.assertEqual(self.contador('num_libros'), 1)
+
+
+class PrivacidadTests(TestCase):
+    """Libro.publico es una copia de biblioteca_publica del propietario"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.propietario = Usuario.objects.create_user('lectora', password='x', biblioteca_publica=True)
+        cls.libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=cls.propietario)
+
+    def publico(self):
+        return Libro.objects.values_list('publico', flat=True).get(pk=self.libro.pk)
+
+    def test_save(self):
+        self.assertTrue(self.publico())
+        self.propietario.biblioteca_publica = False
+        self.propietario.save()
+        self.assertFalse(self.publico())
+
+    def test_update_de_queryset(self):
+        Usuario.objects.filter(pk=self.propietario.pk).update(biblioteca_publica=False)
+        self.assertFalse(self.publico())
+        Usuario.objects.filter(pk=self.propietario.pk).update(biblioteca_publica=True)
+        self.assertTrue(self.publico())
+        self.assertIsNone(
+            Libro.objects.values_list('recomendaciones_calculadas', flat=True).get(pk=self.libro.pk)
+        )
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from biblioteca import escrituras
+from biblioteca.models import EscrituraAplicada, Libro, SolicitudContacto, Usuario
+
+
+class ColaEscriturasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.propietario = Usuario.objects.create_user('lectora', password='x', rol='bibliotecario')
+        cls.visitante = Usuario.objects.create_user('visita', password='x')
+        cls.libro = Libro.objects.create(titulo='Rayuela', autor='Cortázar', propietario=cls.propietario)
+
+    def setUp(self):
+        self.cola = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.cola)
+        ajustes = override_settings(COLA_ESCRITURAS=self.cola)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        escrituras.latido()
+
+    def solicitud(self):
+        return SolicitudContacto(
+            visitante=self.visitante, bibliotecario=self.propietario, libro=self.libro, mensaje='Hola',
+        )
+
+    def pendientes(self):
+        return sorted((self.cola / 'pendientes').glob('*.json'))
+
+    def test_se_aplica_en_lote(self):
+        primera, segunda = self.solicitud(), self.solicitud()
+        self.assertFalse(escrituras.guardar_solicitud(primera))
+        self.assertFalse(escrituras.guardar_solicitud(segunda))
+        self.assertFalse(SolicitudContacto.objects.exists())
+        self.assertEqual(len(self.pendientes()), 2)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(escrituras.aplicar_pendientes(), 2)
+        tabla = SolicitudContacto._meta.db_table
+        inserciones = [q for q in consultas.captured_queries if q['sql'].startswith(f'INSERT INTO "{tabla}"')]
+        self.assertEqual(len(inserciones), 1)
+
+        self.assertEqual(self.pendientes(), [])
+        guardadas = SolicitudContacto.objects.order_by('fecha_creacion')
+        self.assertEqual(
+            list(guardadas.values_list('fecha_creacion', flat=True)),
+            [primera.fecha_creacion, segunda.fecha_creacion],
+        )
+        self.propietario.refresh_from_db()
+        self.assertEqual(self.propietario.num_solicitudes_pendientes, 2)
+
+    def test_no_se_aplica_dos_veces(self):
+        escrituras.guardar_solicitud(self.solicitud())
+        copia = self.cola / 'copia.json'
+        shutil.copy(self.pendientes()[0], copia)
+        nombre = self.pendientes()[0].name
+        escrituras.aplicar_pendientes()
+        # Como si el escritor hubiera caído antes de borrar el fichero
+        copia.rename(self.cola / 'pendientes' / nombre)
+        escrituras.aplicar_pendientes()
+        self.assertEqual(SolicitudContacto.objects.count(), 1)
+        self.assertEqual(EscrituraAplicada.objects.count(), 1)
+
+    def test_fichero_corrupto_se_aparta(self):
+        (self.cola / 'pendientes' / '1-roto.json').write_text('{no es json')
+        escrituras.guardar_solicitud(self.solicitud())
+        with self.assertLogs('biblioteca.escrituras', 'ERROR'):
+            self.assertEqual(escrituras.aplicar_pendientes(), 2)
+        self.assertEqual(SolicitudContacto.objects.count(), 1)
+        self.assertTrue((self.cola / 'fallidas' / '1-roto.json').exists())
+
+    def test_usuario_borrado_mientras_tanto(self):
+        visitante = Usuario.objects.create_user('efimero', password='x')
+        solicitud = self.solicitud()
+        solicitud.visitante = visitante
+        escrituras.guardar_solicitud(solicitud)
+        visitante.delete()
+        escrituras.aplicar_pendientes()
+        self.assertFalse(SolicitudContacto.objects.exists())
+
+    def test_sin_escritor_se_guarda_directamente(self):
+        (self.cola / 'latido').unlink()
+        solicitud = self.solicitud()
+        self.assertTrue(escrituras.guardar_solicitud(solicitud))
+        self.assertIsNotNone(solicitud.pk)
+        self.assertEqual(self.pendientes(), [])
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+from django.http import QueryDict
+from django.test import TestCase
+
+from biblioteca.busqueda import paginar_busqueda
+from biblioteca.forms import BusquedaLibroForm
+from biblioteca.models import Libro, Usuario
+from biblioteca.paginacion import CursorInvalido, KeysetPaginator, sin_cursor
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('lectora', password='x', rol='bibliotecario')
+        Libro.objects.bulk_create(
+            Libro(titulo=f'Libro {n}', autor='Autora', propietario=cls.usuario) for n in range(7)
+        )
+        # Todos con la misma fecha: el desempate es el id
+        Libro.objects.update(fecha_agregado=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        cls.ids = list(Libro.objects.order_by('-fecha_agregado', '-id').values_list('pk', flat=True))
+
+    def paginador(self):
+        return KeysetPaginator(Libro.objects.all(), por_pagina=3)
+
+    def test_recorre_todas_las_filas_sin_repetir(self):
+        vistos = []
+        cursor = None
+        while True:
+            pagina = self.paginador().pagina(despues=cursor)
+            vistos.extend(libro.pk for libro in pagina)
+            if not pagina.tiene_siguiente:
+                break
+            cursor = pagina.cursor_siguiente
+        self.assertEqual(vistos, self.ids)
+
+    def test_primera_pagina_sin_anterior(self):
+        pagina = self.paginador().pagina()
+        self.assertFalse(pagina.tiene_anterior)
+        self.assertTrue(pagina.tiene_siguiente)
+
+    def test_antes_devuelve_la_pagina_previa(self):
+        paginador = self.paginador()
+        primera = paginador.pagina()
+        segunda = paginador.pagina(despues=primera.cursor_siguiente)
+        previa = paginador.pagina(antes=segunda.cursor_anterior)
+        self.assertEqual([libro.pk for libro in previa], self.ids[:3])
+        self.assertFalse(previa.tiene_anterior)
+        self.assertEqual(previa.cursor_siguiente, primera.cursor_siguiente)
+
+    def test_cursor_no_valido(self):
+        for cursor in ('basura!', 'WzFd', 'eyJhIjoxfQ'):
+            with self.subTest(cursor=cursor), self.assertRaises(CursorInvalido):
+                self.paginador().pagina(despues=cursor)
+
+    def test_total_dado_no_consulta(self):
+        paginador = KeysetPaginator(Libro.objects.all(), por_pagina=3, total=99)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginador.total, 99)
+
+    def test_busqueda_con_cursor_no_valido_vuelve_a_la_primera_pagina(self):
+        parametros = QueryDict('query=libro&despues=basura!')
+        pagina, query = paginar_busqueda(Libro.objects.all(), BusquedaLibroForm(parametros), parametros, 3)
+        self.assertEqual(query, 'libro')
+        self.assertEqual(len(pagina), 3)
+        self.assertFalse(pagina.tiene_anterior)
+
+    def test_sin_cursor(self):
+        parametros = sin_cursor(QueryDict('query=a&despues=x&antes=y'))
+        self.assertEqual(parametros.urlencode(), 'query=a')
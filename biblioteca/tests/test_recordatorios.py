@@ -0,0 +1,59 @@
+from datetime import date
+
+from django.core import mail
+from django.test import TestCase
+
+from biblioteca.models import Libro, Prestamo, Usuario
+from biblioteca.recordatorios import enviar_recordatorios
+
+
+HOY = date(2025, 6, 1)
+
+
+class RecordatoriosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = Usuario.objects.create_user('ana', 'ana@example.com', 'x', rol='bibliotecario')
+        cls.luis = Usuario.objects.create_user('luis', 'luis@example.com', 'x', rol='bibliotecario')
+        cls.sin_correo = Usuario.objects.create_user('anonima', '', 'x', rol='bibliotecario')
+        for usuario, vencidos in ((cls.ana, 3), (cls.luis, 1), (cls.sin_correo, 1)):
+            libro = Libro.objects.create(titulo=f'Libro de {usuario}', autor='Autora', propietario=usuario)
+            for n in range(vencidos):
+                cls.prestar(libro, date(2025, 5, 1 + n))
+        libro = Libro.objects.create(titulo='Otro libro', autor='Autora', propietario=cls.ana)
+        # Ni el que vence en el futuro ni el ya devuelto llevan aviso
+        cls.al_dia = cls.prestar(libro, date(2025, 7, 1))
+        cls.devuelto = cls.prestar(libro, date(2025, 5, 1), devuelto=date(2025, 5, 2))
+
+    @staticmethod
+    def prestar(libro, vence, devuelto=None):
+        return Prestamo.objects.create(
+            libro=libro,
+            nombre_prestatario='Pablo',
+            fecha_prestamo=date(2025, 4, 1),
+            fecha_devolucion_esperada=vence,
+            fecha_devolucion_real=devuelto,
+        )
+
+    def test_un_correo_por_propietario(self):
+        # Lotes de un préstamo: los tres de Ana van igualmente en un solo correo
+        resultado = enviar_recordatorios(hoy=HOY, lote=1)
+        self.assertEqual(sorted(correo.to[0] for correo in mail.outbox), ['ana@example.com', 'luis@example.com'])
+        self.assertEqual((resultado.correos, resultado.prestamos, resultado.sin_email), (2, 4, 1))
+
+    def test_no_repite_avisos(self):
+        enviar_recordatorios(hoy=HOY)
+        mail.outbox.clear()
+        resultado = enviar_recordatorios(hoy=HOY)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(resultado.prestamos, 0)
+        self.assertEqual(Prestamo.objects.filter(recordatorio_enviado__isnull=False).count(), 4)
+        self.assertFalse(
+            Prestamo.objects.filter(pk__in=[self.al_dia.pk, self.devuelto.pk], recordatorio_enviado__isnull=False)
+        )
+
+    def test_simular_no_envia_ni_marca(self):
+        resultado = enviar_recordatorios(hoy=HOY, simular=True)
+        self.assertEqual(resultado.correos, 2)
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Prestamo.objects.filter(recordatorio_enviado__isnull=False).exists())
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, metricas, views
 
 urlpatterns = [
     # Públicas
@@ -14,10 +14,13 @@ urlpatterns = [
     path('bibliotecas/', views.bibliotecas_publicas, name='bibliotecas_publicas'),
     path('biblioteca/<str:username>/', views.ver_biblioteca, name='ver_biblioteca'),
     path('mi-biblioteca/', views.mi_biblioteca, name='mi_biblioteca'),
+    path('mi-biblioteca/exportar/', views.biblioteca_exportar, name='biblioteca_exportar'),
+    path('buscar/', views.busqueda_global, name='busqueda_global'),
     
     # Libros
     path('libro/<int:pk>/', views.libro_detalle, name='libro_detalle'),
     path('libro/nuevo/', views.libro_crear, name='libro_crear'),
+    path('libro/importar/', views.libro_importar, name='libro_importar'),
     path('libro/<int:pk>/editar/', views.libro_editar, name='libro_editar'),
     path('libro/<int:pk>/eliminar/', views.libro_eliminar, name='libro_eliminar'),
     
@@ -26,6 +29,7 @@ urlpatterns = [
     
     # Préstamos
     path('libro/<int:libro_pk>/prestamo/', views.prestamo_crear, name='prestamo_crear'),
+    path('prestamos/', views.prestamos_activos, name='prestamos_activos'),
     path('prestamo/<int:pk>/devolver/', views.prestamo_devolver, name='prestamo_devolver'),
     
     # Lista de deseos
@@ -41,4 +45,21 @@ urlpatterns = [
     
     # Configuración
     path('configuracion/', views.configuracion, name='configuracion'),
+    
+    # API JSON
+    path('api/bibliotecas/', api.bibliotecas, name='api_bibliotecas'),
+    path('api/bibliotecas/<str:username>/libros/', api.biblioteca_libros, name='api_biblioteca_libros'),
+    path('api/libros/', api.libros, name='api_libros'),
+    path('api/libros/<int:pk>/', api.libro, name='api_libro'),
+    path('api/libros/<int:libro_pk>/resena/', api.resena, name='api_resena'),
+    path('api/libros/<int:libro_pk>/prestamos/', api.libro_prestamos, name='api_libro_prestamos'),
+    path('api/prestamos/', api.prestamos, name='api_prestamos'),
+    path('api/prestamos/<int:pk>/', api.prestamo, name='api_prestamo'),
+    path('api/deseos/', api.deseos, name='api_deseos'),
+    path('api/deseos/<int:pk>/', api.deseo, name='api_deseo'),
+    path('api/solicitudes/', api.solicitudes, name='api_solicitudes'),
+    path('api/solicitudes/<int:pk>/', api.solicitud, name='api_solicitud'),
+
+    # Métricas para Prometheus (nginx solo deja pedirlas desde el servidor)
+    path('metrics', metricas.exponer, name='metricas'),
 ]
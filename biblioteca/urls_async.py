@@ -0,0 +1,22 @@
+"""
+URLs de la aplicación bajo ASGI: las de ``urls.py`` con las vistas de
+lectura cambiadas por sus versiones de ``vistas_async``.
+"""
+from django.urls import path
+
+from . import urls, vistas_async
+
+
+VISTAS_ASYNC = {
+    'home': vistas_async.home,
+    'bibliotecas_publicas': vistas_async.bibliotecas_publicas,
+    'ver_biblioteca': vistas_async.ver_biblioteca,
+    'libro_detalle': vistas_async.libro_detalle,
+    'mapa_web': vistas_async.mapa_web,
+}
+
+urlpatterns = [
+    path(str(patron.pattern), VISTAS_ASYNC[patron.name], name=patron.name)
+    if patron.name in VISTAS_ASYNC else patron
+    for patron in urls.urlpatterns
+]
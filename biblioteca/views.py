@@ -2,13 +2,29 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
-from django.http import HttpResponseForbidden
-from .models import Usuario, Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto
+from django.db.models import F, prefetch_related_objects
+from django.http import Http404, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Usuario, Libro, Resena, Prestamo, ListaDeseos, SolicitudContacto, Recomendacion
 from .forms import (
     RegistroForm, LibroForm, ResenaForm, PrestamoForm,
-    ListaDeseosForm, SolicitudContactoForm, BusquedaLibroForm
+    ListaDeseosForm, SolicitudContactoForm, BusquedaLibroForm, ImportarLibrosForm
 )
+from .paginacion import sin_cursor
+from .busqueda import paginar_busqueda
+from .tareas import encolar_miniaturas
+from .escrituras import guardar_solicitud
+from .coincidencias import disponibles_inicio, prefetch_disponibles
+from .fragmentos import tarjetas
+from .importacion import ErrorImportacion, abrir_texto, detectar_formato, importar
+from .exportacion import FORMATOS as FORMATOS_EXPORTACION, exportar, nombre_fichero
+from .condicional import (
+    etag_biblioteca, ultima_modificacion_biblioteca, etag_libro, ultima_modificacion_libro
+)
+
+
+LIBROS_POR_PAGINA = 24
 
 
 # ====== VISTAS PÚBLICAS ======
@@ -80,9 +96,10 @@ def logout_view(request):
 def home(request):
     """Dashboard principal - Inicio Bibliotecas"""
     context = {
-        'total_libros': request.user.libros.count(),
+        'total_libros': request.user.num_libros,
         'libros_recientes': request.user.libros.all()[:5],
-        'lista_deseos_count': request.user.lista_deseos.count(),
+        'lista_deseos_count': request.user.num_deseos,
+        'deseos_disponibles': list(disponibles_inicio(request.user)),
     }
     return render(request, 'biblioteca/home.html', context)
 
@@ -93,8 +110,6 @@ def bibliotecas_publicas(request):
     usuarios_publicos = Usuario.objects.filter(
         biblioteca_publica=True,
         rol='bibliotecario'
-    ).annotate(
-        num_libros=Count('libros')
     ).exclude(id=request.user.id)
     
     return render(request, 'biblioteca/bibliotecas_publicas.html', {
@@ -103,32 +118,40 @@ def bibliotecas_publicas(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_biblioteca, last_modified_func=ultima_modificacion_biblioteca)
 def ver_biblioteca(request, username):
     """Ver la biblioteca de un usuario específico"""
-    usuario = get_object_or_404(Usuario, username=username)
+    if username == request.user.username:
+        usuario = request.user
+    else:
+        usuario = get_object_or_404(Usuario, username=username)
     
     # Verificar que la biblioteca sea pública o sea el propietario
     if not usuario.biblioteca_publica and usuario != request.user:
         messages.error(request, 'Esta biblioteca es privada.')
         return redirect('bibliotecas_publicas')
     
-    # Búsqueda y filtrado
-    libros = usuario.libros.all()
+    # Búsqueda y paginación por cursor. Sin búsqueda, el total es el
+    # contador desnormalizado del usuario.
     form = BusquedaLibroForm(request.GET)
+    pagina, _ = paginar_busqueda(
+        usuario.libros.all(), form, request.GET, LIBROS_POR_PAGINA, total=usuario.num_libros,
+    )
+    
+    # Parámetros de búsqueda que se conservan al cambiar de página
+    parametros = sin_cursor(request.GET)
     
-    if form.is_valid() and form.cleaned_data.get('query'):
-        query = form.cleaned_data['query']
-        libros = libros.filter(
-            Q(titulo__icontains=query) |
-            Q(autor__icontains=query) |
-            Q(isbn__icontains=query)
-        )
+    es_propietario = usuario == request.user
     
     context = {
         'usuario_biblioteca': usuario,
-        'libros': libros,
+        'libros': pagina,
+        'tarjetas': tarjetas(request, pagina, es_propietario),
+        'pagina': pagina,
+        'parametros_busqueda': parametros.urlencode(),
         'form': form,
-        'es_propietario': usuario == request.user,
+        'es_propietario': es_propietario,
     }
     
     return render(request, 'biblioteca/ver_biblioteca.html', context)
@@ -140,20 +163,68 @@ def mi_biblioteca(request):
     return ver_biblioteca(request, request.user.username)
 
 
+@login_required
+def biblioteca_exportar(request):
+    """Descarga la biblioteca del usuario con sus reseñas y préstamos"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        raise Http404('Formato de exportación desconocido')
+    
+    respuesta = StreamingHttpResponse(
+        exportar(request.user, formato),
+        content_type=FORMATOS_EXPORTACION[formato][0],
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_fichero(request.user, formato)}"'
+    return respuesta
+
+
+@login_required
+def busqueda_global(request):
+    """Búsqueda en todas las bibliotecas públicas, agrupada por propietario"""
+    libros = Libro.objects.filter(publico=True).select_related('propietario')
+    form = BusquedaLibroForm(request.GET)
+    pagina, query = paginar_busqueda(libros, form, request.GET, LIBROS_POR_PAGINA)
+    
+    # Agrupar por propietario conservando el orden de relevancia
+    grupos = {}
+    for libro in pagina:
+        grupos.setdefault(libro.propietario_id, {
+            'propietario': libro.propietario,
+            'libros': [],
+        })['libros'].append(libro)
+    
+    parametros = sin_cursor(request.GET)
+    
+    return render(request, 'biblioteca/busqueda_global.html', {
+        'form': form,
+        'query': query,
+        'pagina': pagina,
+        'grupos': list(grupos.values()),
+        'parametros_busqueda': parametros.urlencode(),
+    })
+
+
 # ====== VISTAS DE LIBROS ======
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_libro, last_modified_func=ultima_modificacion_libro)
 def libro_detalle(request, pk):
     """Vista detallada de un libro"""
-    libro = get_object_or_404(Libro, pk=pk)
+    libro = get_object_or_404(Libro.objects.select_related('propietario', 'resena'), pk=pk)
+    es_propietario = libro.propietario_id == request.user.pk
     
     # Verificar acceso
-    if libro.propietario != request.user and not libro.propietario.biblioteca_publica:
+    if not es_propietario and not libro.propietario.biblioteca_publica:
         return HttpResponseForbidden('No tienes permiso para ver este libro.')
     
+    if es_propietario:
+        # El historial de préstamos solo lo ve el propietario
+        prefetch_related_objects([libro], 'prestamos')
+    
     # Formulario de solicitud de contacto solo para visitantes
     solicitud_form = None
-    if libro.propietario != request.user:
+    if not es_propietario:
         if request.method == 'POST':
             solicitud_form = SolicitudContactoForm(request.POST)
             if solicitud_form.is_valid():
@@ -161,7 +232,7 @@ def libro_detalle(request, pk):
                 solicitud.visitante = request.user
                 solicitud.bibliotecario = libro.propietario
                 solicitud.libro = libro
-                solicitud.save()
+                guardar_solicitud(solicitud)
                 messages.success(request, 'Solicitud de contacto enviada.')
                 return redirect('libro_detalle', pk=pk)
         else:
@@ -169,8 +240,9 @@ def libro_detalle(request, pk):
     
     context = {
         'libro': libro,
-        'es_propietario': libro.propietario == request.user,
+        'es_propietario': es_propietario,
         'solicitud_form': solicitud_form,
+        'recomendaciones': list(Recomendacion.de_libro(libro)),
     }
     
     return render(request, 'biblioteca/libro_detalle.html', context)
@@ -185,6 +257,9 @@ def libro_crear(request):
             libro = form.save(commit=False)
             libro.propietario = request.user
             libro.save()
+            if libro.portada:
+                # Las miniaturas se generan en segundo plano (procesar_tareas)
+                encolar_miniaturas(libro)
             messages.success(request, f'Libro "{libro.titulo}" añadido correctamente.')
             return redirect('libro_detalle', pk=libro.pk)
     else:
@@ -196,18 +271,49 @@ def libro_crear(request):
     })
 
 
+@login_required
+def libro_importar(request):
+    """Importar libros en bloque desde un fichero CSV o JSON"""
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarLibrosForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            formato = detectar_formato(form.cleaned_data['formato'], archivo.name)
+            try:
+                resultado = importar(request.user, abrir_texto(archivo.file), formato)
+            except (ErrorImportacion, UnicodeDecodeError) as exc:
+                messages.error(request, f'No se ha podido leer el archivo: {exc}')
+            else:
+                if resultado.creados:
+                    messages.success(request, f'{resultado.creados} libros importados correctamente.')
+                elif not resultado.num_errores:
+                    messages.info(request, 'No había libros nuevos que importar.')
+    else:
+        form = ImportarLibrosForm()
+    
+    return render(request, 'biblioteca/libro_importar.html', {
+        'form': form,
+        'resultado': resultado,
+    })
+
+
 @login_required
 def libro_editar(request, pk):
     """Editar un libro existente"""
     libro = get_object_or_404(Libro, pk=pk)
     
-    if libro.propietario != request.user:
+    if libro.propietario_id != request.user.pk:
         return HttpResponseForbidden('No tienes permiso para editar este libro.')
     
     if request.method == 'POST':
+        # is_valid() ya asigna la portada nueva al libro
+        portada_anterior = libro.portada.name
         form = LibroForm(request.POST, request.FILES, instance=libro)
         if form.is_valid():
-            form.save()
+            libro = form.save()
+            if 'portada' in form.changed_data:
+                encolar_miniaturas(libro, anterior=portada_anterior)
             messages.success(request, 'Libro actualizado correctamente.')
             return redirect('libro_detalle', pk=pk)
     else:
@@ -225,7 +331,7 @@ def libro_eliminar(request, pk):
     """Eliminar un libro"""
     libro = get_object_or_404(Libro, pk=pk)
     
-    if libro.propietario != request.user:
+    if libro.propietario_id != request.user.pk:
         return HttpResponseForbidden('No tienes permiso para eliminar este libro.')
     
     if request.method == 'POST':
@@ -242,9 +348,9 @@ def libro_eliminar(request, pk):
 @login_required
 def resena_crear(request, libro_pk):
     """Crear o editar reseña de un libro"""
-    libro = get_object_or_404(Libro, pk=libro_pk)
+    libro = get_object_or_404(Libro.objects.select_related('resena'), pk=libro_pk)
     
-    if libro.propietario != request.user:
+    if libro.propietario_id != request.user.pk:
         return HttpResponseForbidden('Solo puedes reseñar tus propios libros.')
     
     try:
@@ -279,7 +385,7 @@ def prestamo_crear(request, libro_pk):
     """Registrar un préstamo"""
     libro = get_object_or_404(Libro, pk=libro_pk)
     
-    if libro.propietario != request.user:
+    if libro.propietario_id != request.user.pk:
         return HttpResponseForbidden('Solo puedes registrar préstamos de tus propios libros.')
     
     if request.method == 'POST':
@@ -302,9 +408,9 @@ def prestamo_crear(request, libro_pk):
 @login_required
 def prestamo_devolver(request, pk):
     """Marcar un préstamo como devuelto"""
-    prestamo = get_object_or_404(Prestamo, pk=pk)
+    prestamo = get_object_or_404(Prestamo.objects.select_related('libro'), pk=pk)
     
-    if prestamo.libro.propietario != request.user:
+    if prestamo.libro.propietario_id != request.user.pk:
         return HttpResponseForbidden('No tienes permiso.')
     
     if request.method == 'POST':
@@ -312,11 +418,30 @@ def prestamo_devolver(request, pk):
         prestamo.fecha_devolucion_real = date.today()
         prestamo.save()
         messages.success(request, 'Préstamo marcado como devuelto.')
-        return redirect('libro_detalle', pk=prestamo.libro.pk)
+        return redirect('libro_detalle', pk=prestamo.libro_id)
     
     return render(request, 'biblioteca/prestamo_devolver.html', {'prestamo': prestamo})
 
 
+@login_required
+def prestamos_activos(request):
+    """Préstamos activos del usuario, con los vencidos primero"""
+    prestamos = Prestamo.objects.filter(
+        libro__propietario=request.user,
+        fecha_devolucion_real__isnull=True,
+    ).select_related('libro').order_by(F('fecha_devolucion_esperada').asc(nulls_last=True), 'id')
+    
+    vencidos = []
+    al_dia = []
+    for prestamo in prestamos:
+        (vencidos if prestamo.vencido else al_dia).append(prestamo)
+    
+    return render(request, 'biblioteca/prestamos_activos.html', {
+        'vencidos': vencidos,
+        'al_dia': al_dia,
+    })
+
+
 # ====== VISTAS DE LISTA DE DESEOS ======
 
 @login_required
@@ -333,7 +458,8 @@ def lista_deseos(request):
     else:
         form = ListaDeseosForm()
     
-    items = request.user.lista_deseos.all()
+    # Las bibliotecas públicas que ya tienen cada deseo, en una sola consulta
+    items = request.user.lista_deseos.prefetch_related(prefetch_disponibles())
     
     return render(request, 'biblioteca/lista_deseos.html', {
         'items': items,
@@ -362,7 +488,7 @@ def usuarios_lista(request):
     if not request.user.es_admin():
         return HttpResponseForbidden('No tienes permiso para acceder a esta página.')
     
-    usuarios = Usuario.objects.all().annotate(num_libros=Count('libros'))
+    usuarios = Usuario.objects.all()
     
     return render(request, 'biblioteca/usuarios_lista.html', {
         'usuarios': usuarios
@@ -377,7 +503,7 @@ def usuario_cambiar_privacidad(request, pk):
     
     usuario = get_object_or_404(Usuario, pk=pk)
     usuario.biblioteca_publica = not usuario.biblioteca_publica
-    usuario.save()
+    usuario.save(update_fields=['biblioteca_publica'])
     
     estado = 'pública' if usuario.biblioteca_publica else 'privada'
     messages.success(request, f'Biblioteca de {usuario.username} marcada como {estado}.')
@@ -392,7 +518,7 @@ def configuracion(request):
         # Cambiar visibilidad de la biblioteca
         if 'cambiar_privacidad' in request.POST:
             request.user.biblioteca_publica = not request.user.biblioteca_publica
-            request.user.save()
+            request.user.save(update_fields=['biblioteca_publica'])
             estado = 'pública' if request.user.biblioteca_publica else 'privada'
             messages.success(request, f'Tu biblioteca ahora es {estado}.')
     
@@ -0,0 +1,145 @@
+"""
+Versiones asíncronas de las vistas de lectura.
+
+Se sirven cuando la aplicación corre bajo ASGI (``bibliandria/asgi.py``
+resuelve con ``bibliandria/urls_asgi.py``); bajo WSGI siguen las de
+``views.py``. Las consultas usan el ORM asíncrono (``aget``, ``acount``,
+``async for``) y el render de la plantilla, que puede tocar la sesión o
+la caché, se hace en un hilo con ``sync_to_async``. Mientras una petición
+espera a la base de datos el worker atiende otras.
+
+``libro_detalle`` solo es de lectura en GET: el envío de una solicitud de
+contacto (POST) lo sigue atendiendo la vista síncrona.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import aprefetch_related_objects
+from django.http import HttpResponseForbidden
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.views.decorators.cache import cache_control
+
+from . import views
+from .busqueda import apaginar_busqueda
+from .coincidencias import disponibles_inicio
+from .condicional import avalidadores_biblioteca, avalidadores_libro, condicion_async
+from .forms import BusquedaLibroForm, SolicitudContactoForm
+from .fragmentos import tarjetas
+from .models import Libro, Recomendacion, Usuario
+from .paginacion import sin_cursor
+
+
+arender = sync_to_async(render)
+atarjetas = sync_to_async(tarjetas)
+
+
+def login_requerido(vista):
+    """
+    ``login_required`` para vistas asíncronas. Resuelve el usuario con
+    ``auser()`` y lo deja en ``request.user`` para que el resto de la
+    petición (plantillas, ETag) no vuelva a consultar.
+    """
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        usuario = await request.auser()
+        if not usuario.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = usuario
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+@login_requerido
+async def home(request):
+    """Dashboard principal - Inicio Bibliotecas"""
+    context = {
+        'total_libros': request.user.num_libros,
+        'libros_recientes': [libro async for libro in request.user.libros.all()[:5]],
+        'lista_deseos_count': request.user.num_deseos,
+        'deseos_disponibles': [coincidencia async for coincidencia in disponibles_inicio(request.user)],
+    }
+    return await arender(request, 'biblioteca/home.html', context)
+
+
+@login_requerido
+async def bibliotecas_publicas(request):
+    """Lista de bibliotecas públicas de otros usuarios"""
+    usuarios_publicos = Usuario.objects.filter(
+        biblioteca_publica=True,
+        rol='bibliotecario'
+    ).exclude(id=request.user.id)
+
+    return await arender(request, 'biblioteca/bibliotecas_publicas.html', {
+        'usuarios': [usuario async for usuario in usuarios_publicos]
+    })
+
+
+@login_requerido
+@cache_control(private=True, no_cache=True)
+@condicion_async(avalidadores_biblioteca)
+async def ver_biblioteca(request, username):
+    """Ver la biblioteca de un usuario específico"""
+    if username == request.user.username:
+        usuario = request.user
+    else:
+        usuario = await aget_object_or_404(Usuario, username=username)
+
+    if not usuario.biblioteca_publica and usuario != request.user:
+        messages.error(request, 'Esta biblioteca es privada.')
+        return redirect('bibliotecas_publicas')
+
+    form = BusquedaLibroForm(request.GET)
+    pagina, _ = await apaginar_busqueda(
+        usuario.libros.all(), form, request.GET, views.LIBROS_POR_PAGINA, total=usuario.num_libros,
+    )
+
+    parametros = sin_cursor(request.GET)
+
+    es_propietario = usuario == request.user
+
+    context = {
+        'usuario_biblioteca': usuario,
+        'libros': pagina,
+        'tarjetas': await atarjetas(request, pagina, es_propietario),
+        'pagina': pagina,
+        'parametros_busqueda': parametros.urlencode(),
+        'form': form,
+        'es_propietario': es_propietario,
+    }
+
+    return await arender(request, 'biblioteca/ver_biblioteca.html', context)
+
+
+@login_requerido
+@cache_control(private=True, no_cache=True)
+@condicion_async(avalidadores_libro)
+async def libro_detalle(request, pk):
+    """Vista detallada de un libro"""
+    if request.method == 'POST':
+        return await sync_to_async(views.libro_detalle)(request, pk)
+
+    libro = await aget_object_or_404(Libro.objects.select_related('propietario', 'resena'), pk=pk)
+    es_propietario = libro.propietario_id == request.user.pk
+
+    if not es_propietario and not libro.propietario.biblioteca_publica:
+        return HttpResponseForbidden('No tienes permiso para ver este libro.')
+
+    if es_propietario:
+        await aprefetch_related_objects([libro], 'prestamos')
+
+    context = {
+        'libro': libro,
+        'es_propietario': es_propietario,
+        'solicitud_form': None if es_propietario else SolicitudContactoForm(),
+        'recomendaciones': [recomendacion async for recomendacion in Recomendacion.de_libro(libro)],
+    }
+
+    return await arender(request, 'biblioteca/libro_detalle.html', context)
+
+
+@login_requerido
+async def mapa_web(request):
+    """Mapa del sitio web - facilita la navegación a todos los usuarios"""
+    return await arender(request, 'biblioteca/mapa_web.html')
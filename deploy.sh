@@ -20,6 +20,10 @@ REPO_URL="https://github.com/AlonsoAlmodovar2006/Bibliandria_Interfaces.git"
 DOMAIN_OR_IP="192.168.5.55"
 USER="alonso"
 VENV_PATH="$APP_DIR/venv"
+# Servidor de aplicación: "wsgi" o "asgi" (workers uvicorn, vistas de lectura asíncronas).
+# Bajo ASGI, Django acumula en memoria las respuestas en streaming con iterador
+# síncrono, como la exportación de la biblioteca.
+SERVIDOR="wsgi"
 
 echo -e "${GREEN}========================================${NC}"
 echo -e "${GREEN}  Despliegue de Bibliandria${NC}"
@@ -38,6 +42,7 @@ sudo apt install -y \
     python3-venv \
     python3-dev \
     nginx \
+    libnginx-mod-http-brotli-static \
     git \
     libjpeg-dev \
     zlib1g-dev \
@@ -89,12 +94,51 @@ SECRET_KEY = '$SECRET_KEY'
 
 # Archivos estáticos
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'biblioteca.estaticos.AlmacenEstaticos',
+    },
+}
 
 # Seguridad
 SECURE_BROWSER_XSS_FILTER = True
 X_FRAME_OPTIONS = 'DENY'
 SECURE_CONTENT_TYPE_NOSNIFF = True
 
+# Caché de fragmentos compartida por todos los procesos de gunicorn
+CACHES['fragmentos'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'cache' / 'fragmentos',
+    'TIMEOUT': 60 * 60 * 24 * 7,
+    'VERSION': 1,
+    'OPTIONS': {
+        'MAX_ENTRIES': 50000,
+    },
+}
+
+# Escrituras diferidas: las aplica el servicio procesar_escrituras
+COLA_ESCRITURAS = BASE_DIR / 'cola_escrituras'
+
+# Métricas para Prometheus (/metrics). Para un Prometheus en otra máquina hay
+# que añadir su IP aquí y en el location = /metrics de nginx
+METRICAS_DB = BASE_DIR / 'metricas.sqlite3'
+METRICAS_IPS = ['127.0.0.1', '::1']
+
+# Bytes de media servidos por nginx (log_format bibliandria_bytes)
+METRICAS_LOG_MEDIA = BASE_DIR / 'logs' / 'media-bytes.log'
+
+# Correo saliente (recordatorios de préstamos)
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '') == '1'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Bibliandria <no-responder@bibliandria.local>')
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -105,6 +149,11 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
         },
+        # Peticiones lentas (BIBLIANDRIA_PERFILADO=1), una línea JSON por petición
+        'lentas': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': BASE_DIR / 'logs' / 'peticiones_lentas.log',
+        },
     },
     'loggers': {
         'django': {
@@ -112,14 +161,23 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'biblioteca.perfilado': {
+            'handlers': ['lentas'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 EOF
     echo -e "${GREEN}✓ Archivo settings_prod.py creado${NC}"
 fi
 
-# Crear directorio de logs
+# Crear directorios de logs y caché
 mkdir -p $APP_DIR/logs
+# Lo escribe nginx y lo vacía la aplicación al leerlo para /metrics
+touch $APP_DIR/logs/media-bytes.log
+mkdir -p $APP_DIR/cache/fragmentos
+mkdir -p $APP_DIR/cola_escrituras
 
 # 8. Recopilar archivos estáticos
 echo -e "${YELLOW}[8/12] Recopilando archivos estáticos...${NC}"
@@ -134,6 +192,11 @@ deactivate
 
 # 10. Configurar servicio systemd para Gunicorn
 echo -e "${YELLOW}[10/12] Configurando servicio Gunicorn...${NC}"
+if [ "$SERVIDOR" = "asgi" ]; then
+    GUNICORN_APP="--worker-class uvicorn_worker.UvicornWorker bibliandria.asgi:application"
+else
+    GUNICORN_APP="bibliandria.wsgi:application"
+fi
 sudo tee /etc/systemd/system/$APP_NAME.service > /dev/null << EOF
 [Unit]
 Description=Bibliandria Gunicorn daemon
@@ -151,7 +214,7 @@ ExecStart=$VENV_PATH/bin/gunicorn \\
     --bind unix:/run/$APP_NAME.sock \\
     --access-logfile $APP_DIR/logs/gunicorn-access.log \\
     --error-logfile $APP_DIR/logs/gunicorn-error.log \\
-    bibliandria.wsgi:application
+    $GUNICORN_APP
 
 ExecReload=/bin/kill -s HUP \$MAINPID
 KillMode=mixed
@@ -162,9 +225,56 @@ PrivateTmp=true
 WantedBy=multi-user.target
 EOF
 
+# Servicio del trabajador de tareas en segundo plano (miniaturas de portadas)
+sudo tee /etc/systemd/system/$APP_NAME-tareas.service > /dev/null << EOF
+[Unit]
+Description=Bibliandria - trabajador de tareas en segundo plano
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=$APP_DIR
+Environment="PATH=$VENV_PATH/bin"
+Environment="DJANGO_SETTINGS_MODULE=bibliandria.settings_prod"
+ExecStart=$VENV_PATH/bin/python manage.py procesar_tareas --procesos 2
+Restart=always
+RestartSec=5
+KillMode=mixed
+TimeoutStopSec=30
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Servicio del escritor único de SQLite (escrituras diferidas)
+sudo tee /etc/systemd/system/$APP_NAME-escrituras.service > /dev/null << EOF
+[Unit]
+Description=Bibliandria - escritor de escrituras diferidas
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=$APP_DIR
+Environment="PATH=$VENV_PATH/bin"
+Environment="DJANGO_SETTINGS_MODULE=bibliandria.settings_prod"
+ExecStart=$VENV_PATH/bin/python manage.py procesar_escrituras
+Restart=always
+RestartSec=5
+KillMode=mixed
+TimeoutStopSec=30
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 # 11. Configurar Nginx
 echo -e "${YELLOW}[11/12] Configurando Nginx...${NC}"
 sudo tee /etc/nginx/sites-available/$APP_NAME > /dev/null << EOF
+# Bytes servidos de /media/, uno por línea: los suma /metrics
+log_format bibliandria_bytes '\$body_bytes_sent';
+
 server {
     listen 80;
     server_name $DOMAIN_OR_IP alonsoServer;
@@ -178,14 +288,24 @@ server {
     
     location /static/ {
         alias $APP_DIR/staticfiles/;
-        expires 30d;
-        add_header Cache-Control "public, immutable";
+        # Ficheros .gz/.br generados por collectstatic
+        gzip_static on;
+        brotli_static on;
+        expires 1h;
+
+        # Con el hash del contenido en el nombre: no cambian nunca
+        location ~ "\.[0-9a-f]{12}\.[a-z0-9]+\$" {
+            expires 1y;
+            add_header Cache-Control "public, immutable";
+        }
     }
     
     location /media/ {
         alias $APP_DIR/media/;
         expires 30d;
         add_header Cache-Control "public";
+        access_log $APP_DIR/logs/nginx-access.log;
+        access_log $APP_DIR/logs/media-bytes.log bibliandria_bytes;
     }
 
     location /videos/ {
@@ -194,6 +314,14 @@ server {
         add_header Cache-Control "public";
     }
 
+    # Métricas para Prometheus: solo desde el propio servidor
+    location = /metrics {
+        allow 127.0.0.1;
+        deny all;
+        include proxy_params;
+        proxy_pass http://unix:/run/$APP_NAME.sock;
+    }
+
     location / {
         include proxy_params;
         proxy_pass http://unix:/run/$APP_NAME.sock;
@@ -221,6 +349,7 @@ sudo chown -R $USER:www-data $APP_DIR
 sudo chmod -R 755 $APP_DIR
 sudo chmod -R 775 $APP_DIR/media
 sudo chmod -R 775 $APP_DIR/logs
+sudo chmod -R 775 $APP_DIR/cola_escrituras
 sudo chmod 664 $APP_DIR/db.sqlite3
 
 # Iniciar y habilitar servicios
@@ -228,6 +357,10 @@ echo -e "${YELLOW}Iniciando servicios...${NC}"
 sudo systemctl daemon-reload
 sudo systemctl enable $APP_NAME
 sudo systemctl restart $APP_NAME
+sudo systemctl enable $APP_NAME-tareas
+sudo systemctl restart $APP_NAME-tareas
+sudo systemctl enable $APP_NAME-escrituras
+sudo systemctl restart $APP_NAME-escrituras
 sudo systemctl restart nginx
 
 # Verificar estado de servicios
@@ -42,6 +42,7 @@ deactivate
 # 6. Reiniciar servicio
 echo -e "${YELLOW}[5/5] Reiniciando servicio...${NC}"
 sudo systemctl restart $APP_NAME
+sudo systemctl restart $APP_NAME-tareas
 
 echo -e "\n${GREEN}✓ Actualización completada${NC}"
 echo -e "Ver logs: sudo journalctl -u $APP_NAME -f\n"